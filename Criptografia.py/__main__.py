@@ -0,0 +1,11 @@
+# __main__.py
+# Permite executar a pasta diretamente: python Criptografia.py <subcomando> ...
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import executar
+
+sys.exit(executar())
\ No newline at end of file
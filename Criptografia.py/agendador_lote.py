@@ -0,0 +1,47 @@
+# agendador_lote.py
+# Agendamento do lote pelo tamanho dos arquivos, com orçamento de memória para as tarefas em andamento
+#
+# Os tamanhos são lidos (stat) antes do início e os arquivos seguem do maior para o menor: os grandes
+# começam primeiro e os pequenos preenchem os trabalhadores no final, em vez de um arquivo enorme no fim
+# da lista segurar o lote inteiro. Cada tarefa reserva a memória estimada do seu caminho (fluxo ou E/S
+# mapeada) e uma nova só começa se a soma das reservas couber no orçamento.
+
+# Soma máxima da memória estimada das tarefas em andamento
+ORCAMENTO_MEMORIA_LOTE = 512 * 1024 * 1024
+
+class AgendadorLote:
+    def __init__(self, lista_arquivos, orcamento_memoria=ORCAMENTO_MEMORIA_LOTE):
+        self.orcamento_memoria = orcamento_memoria or ORCAMENTO_MEMORIA_LOTE
+        self.tamanhos = {}
+        for arquivo in lista_arquivos:
+            try:
+                self.tamanhos[arquivo] = arquivo.stat().st_size
+            except OSError:
+                # O erro é relatado quando o arquivo for aberto
+                self.tamanhos[arquivo] = 0
+        # Do maior para o menor (a ordenação é estável: empates mantêm a ordem da varredura)
+        self.arquivos = sorted(self.tamanhos, key=self.tamanhos.get, reverse=True)
+        self.total_bytes = sum(self.tamanhos.values())
+        self.memoria_reservada = 0
+    
+    def __len__(self):
+        return len(self.arquivos)
+    
+    def __iter__(self):
+        return iter(self.arquivos)
+    
+    def tamanho(self, arquivo):
+        """Tamanho do arquivo lido no início do lote"""
+        return self.tamanhos.get(arquivo, 0)
+    
+    def cabe(self, memoria_estimada):
+        """Indica se a tarefa cabe no orçamento (sem nada em andamento, qualquer tarefa cabe)"""
+        return self.memoria_reservada == 0 or self.memoria_reservada + memoria_estimada <= self.orcamento_memoria
+    
+    def reservar(self, memoria_estimada):
+        """Reserva a memória de uma tarefa que começou"""
+        self.memoria_reservada += memoria_estimada
+    
+    def liberar(self, memoria_estimada):
+        """Devolve a memória de uma tarefa concluída"""
+        self.memoria_reservada -= memoria_estimada
\ No newline at end of file
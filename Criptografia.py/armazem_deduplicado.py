@@ -0,0 +1,334 @@
+# armazem_deduplicado.py
+# Deduplicação antes da cifra: cada bloco de conteúdo único é cifrado uma única vez num armazém
+#
+# Estrutura na pasta de backup:
+#   .blocos/armazem.json          sal, parâmetros de derivação e verificador da chave do armazém
+#   .blocos/ab/abcdef....bloco    um contêiner segmentado por bloco único
+#   <arquivo>.enc                 receita: lista cifrada dos blocos que formam o arquivo
+#
+# Arquivos pequenos formam um único bloco (o arquivo inteiro); os grandes são cortados em blocos
+# definidos pelo conteúdo (hash de uma janela curta), de modo que uma inserção no meio do arquivo só altera os
+# blocos vizinhos. O nome de cada bloco é um HMAC do conteúdo com uma chave derivada da chave do
+# armazém: sem a senha, os nomes não revelam nada sobre os dados. Na restauração e na verificação, o HMAC
+# do conteúdo aberto de cada bloco é calculado de novo e comparado com o nome (um bloco trocado por outro
+# bloco válido do mesmo armazém é recusado).
+#
+# Limitações: os arquivos são gravados em sequência (cada um consulta os blocos gravados pelos anteriores,
+# e o número de trabalhadores é ignorado), e os blocos que deixam de ser referenciados nunca são removidos
+# de .blocos/.
+#
+# Estrutura da receita:
+#   MAGIA_RECEITA (8) | versão (1) | tamanho do cabeçalho (4) | cabeçalho JSON | receita JSON cifrada + tag (16)
+
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import secrets
+import struct
+import zlib
+from pathlib import Path
+from conteiner_segmentado import ConteinerSegmentado, TAMANHO_TAG
+from gerenciador_senhas import calcular_verificador_chave
+from gravacao_atomica import gravacao_atomica
+from primitivas import ALGORITMOS_AEAD, criar_aead
+
+NOME_ARMAZEM = '.blocos'
+NOME_DESCRICAO_ARMAZEM = 'armazem.json'
+VERSAO_ARMAZEM = 1
+SUFIXO_BLOCO = '.bloco'
+CONTEXTO_VERIFICADOR_ARMAZEM = b'armazem-deduplicado'
+CONTEXTO_IDENTIFICADORES = b'identificador-blocos'
+
+MAGIA_RECEITA = b'CRIPDDP\x00'
+VERSAO_RECEITA = 1
+FORMATO_PREFIXO = '>8sBI'
+TAMANHO_PREFIXO = struct.calcsize(FORMATO_PREFIXO)
+
+# Blocos definidos pelo conteúdo entre TAMANHO_MINIMO_BLOCO e TAMANHO_MAXIMO_BLOCO
+TAMANHO_MINIMO_BLOCO = 256 * 1024
+TAMANHO_MAXIMO_BLOCO = 4 * 1024 * 1024
+# Arquivos até este tamanho formam um único bloco (deduplicação do arquivo inteiro)
+LIMITE_ARQUIVO_INTEIRO = TAMANHO_MAXIMO_BLOCO
+
+# Só os bytes âncora são candidatos a fim de bloco ('%', 'e', 0xa5 e 0xe5: frequentes em texto e em
+# binários), e o corte é decidido pelo CRC-32 da janela que termina na âncora. Poucos candidatos por
+# megabyte mantêm o laço em Python rápido; a decisão só depende de bytes locais, então uma inserção
+# não desloca os cortes seguintes. Com âncoras a cada 64 bytes (dados aleatórios), o bloco médio
+# fica em cerca de TAMANHO_MINIMO_BLOCO + 64 * 2 ** BITS_CORTE
+PADRAO_ANCORAS = re.compile(b'[\x25\x65\xa5\xe5]')
+TAMANHO_JANELA = 32
+BITS_CORTE = 14
+MASCARA_CORTE = (1 << BITS_CORTE) - 1
+
+def encontrar_corte(dados):
+    """Posição em que termina o primeiro bloco dos dados (todos os dados, se couberem num bloco)"""
+    tamanho = len(dados)
+    if tamanho <= TAMANHO_MINIMO_BLOCO:
+        return tamanho
+    limite = min(tamanho, TAMANHO_MAXIMO_BLOCO)
+    for ancora in PADRAO_ANCORAS.finditer(dados, TAMANHO_MINIMO_BLOCO, limite):
+        fim = ancora.end()
+        if not zlib.crc32(dados[fim - TAMANHO_JANELA:fim]) & MASCARA_CORTE:
+            return fim
+    return limite
+
+def gerar_blocos(leitor, tamanho_arquivo):
+    """Gera os blocos de um arquivo: o arquivo inteiro se for pequeno, senão blocos definidos pelo conteúdo"""
+    if tamanho_arquivo <= LIMITE_ARQUIVO_INTEIRO:
+        yield leitor.read()
+        return
+    
+    pendente = bytearray()
+    fim_do_arquivo = False
+    while True:
+        # Sempre um bloco máximo inteiro disponível, exceto no fim do arquivo
+        while not fim_do_arquivo and len(pendente) < TAMANHO_MAXIMO_BLOCO:
+            dados = leitor.read(TAMANHO_MAXIMO_BLOCO)
+            if not dados:
+                fim_do_arquivo = True
+            pendente += dados
+        if not pendente:
+            return
+        corte = encontrar_corte(pendente)
+        yield bytes(pendente[:corte])
+        del pendente[:corte]
+
+class _EscritorConferido:
+    """Repassa os dados abertos de um bloco ao escritor (se houver), calculando o HMAC do conteúdo"""
+    def __init__(self, chave_identificadores, escritor=None):
+        self._hmac = hmac.new(chave_identificadores, digestmod=hashlib.sha256)
+        self._escritor = escritor
+    
+    def write(self, dados):
+        self._hmac.update(dados)
+        return self._escritor.write(dados) if self._escritor is not None else len(dados)
+    
+    def identificador(self):
+        return self._hmac.hexdigest()
+
+class ArmazemDeduplicado:
+    def __init__(self, pasta_backup):
+        self.pasta_armazem = Path(pasta_backup) / NOME_ARMAZEM
+        self.caminho_descricao = self.pasta_armazem / NOME_DESCRICAO_ARMAZEM
+        self.descricao = None
+        self._chave = None
+        self._chave_identificadores = None
+        self.estatisticas = {'blocos_novos': 0, 'blocos_reaproveitados': 0, 'bytes_novos': 0, 'bytes_reaproveitados': 0}
+    
+    @staticmethod
+    def e_receita(prefixo_arquivo):
+        """Indica se os primeiros bytes de um arquivo correspondem a uma receita de arquivo deduplicado"""
+        return prefixo_arquivo[:len(MAGIA_RECEITA)] == MAGIA_RECEITA
+    
+    @classmethod
+    def localizar(cls, caminho_receita):
+        """Encontra o armazém da receita subindo pelas pastas até a raiz do backup"""
+        for pasta in Path(caminho_receita).resolve().parents:
+            if (pasta / NOME_ARMAZEM / NOME_DESCRICAO_ARMAZEM).exists():
+                armazem = cls(pasta)
+                armazem.carregar()
+                return armazem
+        raise ValueError(f"Armazém de blocos não encontrado para {Path(caminho_receita).name}")
+    
+    def existe(self):
+        """Indica se a pasta de backup já tem um armazém"""
+        return self.caminho_descricao.exists()
+    
+    def carregar(self):
+        """Lê a descrição do armazém"""
+        with open(self.caminho_descricao, 'r', encoding='utf-8') as arquivo:
+            descricao = json.load(arquivo)
+        if descricao.get('versao') != VERSAO_ARMAZEM:
+            raise ValueError(f"Versão de armazém não suportada: {descricao.get('versao')}")
+        self.descricao = descricao
+    
+    def criar(self, sal_criptografico, parametros_kdf, chave_criptografia):
+        """Cria o armazém com o sal e a chave da sessão atual"""
+        self.pasta_armazem.mkdir(parents=True, exist_ok=True)
+        self.descricao = {
+            'versao': VERSAO_ARMAZEM,
+            'sal': bytes(sal_criptografico).hex(),
+            'kdf': dict(parametros_kdf),
+            'verificador': calcular_verificador_chave(chave_criptografia, CONTEXTO_VERIFICADOR_ARMAZEM)
+        }
+        with gravacao_atomica(self.caminho_descricao) as arquivo:
+            arquivo.write(json.dumps(self.descricao, indent=1, sort_keys=True).encode('utf-8'))
+    
+    def obter_sal(self):
+        """Retorna o sal da chave do armazém"""
+        return bytes.fromhex(self.descricao['sal'])
+    
+    def obter_parametros_kdf(self):
+        """Retorna os parâmetros de derivação da chave do armazém"""
+        return self.descricao['kdf']
+    
+    def abrir(self, chave_criptografia):
+        """Confere a chave do armazém e prepara a chave dos identificadores de bloco"""
+        verificador = calcular_verificador_chave(chave_criptografia, CONTEXTO_VERIFICADOR_ARMAZEM)
+        if not hmac.compare_digest(verificador, self.descricao['verificador']):
+            raise ValueError("A senha não confere com a do armazém de blocos")
+        self._chave = chave_criptografia
+        self._chave_identificadores = hmac.new(bytes(chave_criptografia), CONTEXTO_IDENTIFICADORES, hashlib.sha256).digest()
+    
+    def identificar(self, bloco):
+        """Identificador do bloco: HMAC-SHA256 do conteúdo"""
+        return hmac.new(self._chave_identificadores, bloco, hashlib.sha256).hexdigest()
+    
+    def caminho_bloco(self, identificador):
+        """Caminho do bloco no armazém (subpastas pelos dois primeiros caracteres)"""
+        return self.pasta_armazem / identificador[:2] / f"{identificador}{SUFIXO_BLOCO}"
+    
+    def gravar_arquivo(self, caminho_origem, caminho_destino, conteiner_blocos, chave_criptografia, sal_criptografico,
+                       parametros_kdf=None):
+        """Grava os blocos ainda ausentes do armazém (com conteiner_blocos) e a receita do arquivo, cifrada com
+        a chave da sessão; retorna o tamanho original"""
+        blocos = []
+        tamanho_total = 0
+        with open(caminho_origem, 'rb') as arquivo_entrada:
+            tamanho_arquivo = os.fstat(arquivo_entrada.fileno()).st_size
+            for bloco in gerar_blocos(arquivo_entrada, tamanho_arquivo):
+                identificador = self.identificar(bloco)
+                caminho_bloco = self.caminho_bloco(identificador)
+                if caminho_bloco.exists():
+                    self.estatisticas['blocos_reaproveitados'] += 1
+                    self.estatisticas['bytes_reaproveitados'] += len(bloco)
+                else:
+                    caminho_bloco.parent.mkdir(exist_ok=True)
+                    with gravacao_atomica(caminho_bloco, buffering=0) as arquivo_bloco:
+                        conteiner_blocos.criptografar_fluxo(io.BytesIO(bloco), arquivo_bloco, self._chave, self.obter_sal())
+                    self.estatisticas['blocos_novos'] += 1
+                    self.estatisticas['bytes_novos'] += len(bloco)
+                blocos.append([identificador, len(bloco)])
+                tamanho_total += len(bloco)
+        
+        # A receita só é gravada depois de todos os seus blocos
+        receita = json.dumps({'tamanho': tamanho_total, 'blocos': blocos}, sort_keys=True).encode()
+        cabecalho = self._criar_cabecalho_receita(conteiner_blocos.algoritmo, sal_criptografico, parametros_kdf)
+        cifra = criar_aead(cabecalho['algoritmo'], chave_criptografia)
+        with gravacao_atomica(caminho_destino) as arquivo_saida:
+            arquivo_saida.write(self._serializar_cabecalho(cabecalho))
+            arquivo_saida.write(cifra.encrypt(self._nonce(cabecalho), receita, self._dados_associados(cabecalho)))
+        return tamanho_total
+    
+    def _criar_cabecalho_receita(self, algoritmo, sal_criptografico, parametros_kdf):
+        """Cria o cabeçalho de uma receita (cifrada com a chave da sessão, ligada a este armazém)"""
+        cabecalho = {
+            'algoritmo': algoritmo,
+            'prefixo_nonce': secrets.token_bytes(8).hex(),
+            'sal': bytes(sal_criptografico).hex(),
+            'armazem': self.descricao['sal']
+        }
+        if parametros_kdf is not None:
+            cabecalho['kdf'] = dict(parametros_kdf)
+        return cabecalho
+    
+    @staticmethod
+    def _serializar_cabecalho(cabecalho):
+        """Retorna o prefixo fixo seguido do cabeçalho JSON"""
+        cabecalho_serializado = json.dumps(cabecalho, sort_keys=True).encode()
+        return struct.pack(FORMATO_PREFIXO, MAGIA_RECEITA, VERSAO_RECEITA, len(cabecalho_serializado)) + cabecalho_serializado
+    
+    @staticmethod
+    def _nonce(cabecalho):
+        """Nonce de 12 bytes da receita (uma única mensagem por arquivo)"""
+        return bytes.fromhex(cabecalho['prefixo_nonce']) + bytes(4)
+    
+    @staticmethod
+    def _dados_associados(cabecalho):
+        """Dados associados da receita: formato, algoritmo e armazém de origem"""
+        return b''.join([
+            MAGIA_RECEITA,
+            bytes([VERSAO_RECEITA]),
+            cabecalho['algoritmo'].encode(),
+            bytes.fromhex(cabecalho['prefixo_nonce']),
+            bytes.fromhex(cabecalho['armazem'])
+        ])
+    
+    @staticmethod
+    def ler_cabecalho_receita(leitor):
+        """Lê o prefixo e o cabeçalho de uma receita; retorna o cabeçalho"""
+        prefixo = leitor.read(TAMANHO_PREFIXO)
+        if len(prefixo) < TAMANHO_PREFIXO:
+            raise ValueError("Cabeçalho da receita incompleto")
+        magia, versao, tamanho_cabecalho = struct.unpack(FORMATO_PREFIXO, prefixo)
+        if magia != MAGIA_RECEITA:
+            raise ValueError("Arquivo não é uma receita de arquivo deduplicado")
+        if versao != VERSAO_RECEITA:
+            raise ValueError(f"Versão de receita não suportada: {versao}")
+        cabecalho_serializado = leitor.read(tamanho_cabecalho)
+        if len(cabecalho_serializado) < tamanho_cabecalho:
+            raise ValueError("Cabeçalho da receita incompleto")
+        cabecalho = json.loads(cabecalho_serializado.decode())
+        if cabecalho.get('algoritmo') not in ALGORITMOS_AEAD:
+            raise ValueError(f"Algoritmo não suportado: {cabecalho.get('algoritmo')}")
+        return cabecalho
+    
+    def verificar_estrutura_receita(self, caminho_receita):
+        """Verifica o cabeçalho da receita e se ela pertence a este armazém, sem a chave"""
+        with open(caminho_receita, 'rb') as arquivo:
+            cabecalho = self.ler_cabecalho_receita(arquivo)
+            if len(arquivo.read(TAMANHO_TAG + 1)) <= TAMANHO_TAG:
+                raise ValueError("Receita truncada")
+        if cabecalho.get('armazem') != self.descricao['sal']:
+            raise ValueError("A receita pertence a outro armazém de blocos")
+        return cabecalho
+    
+    def ler_receita(self, caminho_receita, obter_chave):
+        """Descriptografa a receita; retorna o dicionário com o tamanho e os blocos do arquivo"""
+        with open(caminho_receita, 'rb') as arquivo:
+            cabecalho = self.ler_cabecalho_receita(arquivo)
+            receita_cifrada = arquivo.read()
+        if cabecalho.get('armazem') != self.descricao['sal']:
+            raise ValueError("A receita pertence a outro armazém de blocos")
+        
+        chave_criptografia = obter_chave(bytes.fromhex(cabecalho['sal']), cabecalho.get('kdf'))
+        try:
+            receita = criar_aead(cabecalho['algoritmo'], chave_criptografia).decrypt(
+                self._nonce(cabecalho), receita_cifrada, self._dados_associados(cabecalho)
+            )
+        except Exception:
+            raise ValueError("Falha de autenticação na receita (senha incorreta ou arquivo corrompido)")
+        receita = json.loads(receita.decode())
+        if sum(tamanho for _, tamanho in receita['blocos']) != receita['tamanho']:
+            raise ValueError("Receita inválida")
+        return receita
+    
+    def _abrir_com(self, obter_chave):
+        """Abre o armazém com a chave derivada do seu sal, se ainda não estiver aberto"""
+        if self._chave_identificadores is None:
+            self.abrir(obter_chave(self.obter_sal(), self.obter_parametros_kdf()))
+    
+    def _abrir_bloco(self, identificador, tamanho, conteiner, obter_chave, escritor=None):
+        """Descriptografa um bloco e confere o tamanho e o identificador (HMAC do conteúdo aberto)"""
+        escritor_conferido = _EscritorConferido(self._chave_identificadores, escritor)
+        with open(self.caminho_bloco(identificador), 'rb') as arquivo_bloco:
+            if conteiner.descriptografar_fluxo(arquivo_bloco, escritor_conferido, obter_chave) != tamanho:
+                raise ValueError(f"Tamanho inválido no bloco {identificador}")
+        if not hmac.compare_digest(escritor_conferido.identificador(), identificador):
+            raise ValueError(f"O conteúdo do bloco {identificador} não confere com o identificador")
+    
+    def restaurar(self, caminho_receita, escritor, obter_chave, conteiner=None):
+        """Reconstrói o arquivo a partir dos blocos da receita, conferindo cada bloco; retorna os bytes gravados"""
+        conteiner = conteiner or ConteinerSegmentado()
+        receita = self.ler_receita(caminho_receita, obter_chave)
+        self._abrir_com(obter_chave)
+        total_escrito = 0
+        for identificador, tamanho in receita['blocos']:
+            self._abrir_bloco(identificador, tamanho, conteiner, obter_chave, escritor)
+            total_escrito += tamanho
+        return total_escrito
+    
+    def autenticar(self, caminho_receita, obter_chave, conteiner=None):
+        """Autentica a receita e todos os blocos que ela referencia, conferindo os identificadores;
+        retorna o número de blocos"""
+        conteiner = conteiner or ConteinerSegmentado()
+        receita = self.ler_receita(caminho_receita, obter_chave)
+        self._abrir_com(obter_chave)
+        for identificador, tamanho in receita['blocos']:
+            if conteiner.verificar_estrutura(self.caminho_bloco(identificador))['tamanho_original'] != tamanho:
+                raise ValueError(f"Tamanho inválido no bloco {identificador}")
+            self._abrir_bloco(identificador, tamanho, conteiner, obter_chave)
+        return len(receita['blocos'])
\ No newline at end of file
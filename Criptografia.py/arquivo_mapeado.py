@@ -0,0 +1,83 @@
+# arquivo_mapeado.py
+# E/S mapeada em memória para arquivos grandes
+#
+# A entrada é mapeada somente para leitura e a saída é pré-alocada com o tamanho final
+# (posix_fallocate, evitando fragmentação) e mapeada para escrita. A cifra trabalha direto sobre
+# fatias memoryview dos dois mapeamentos: o cache de páginas do sistema faz a E/S e nenhum dado
+# passa por buffers no heap do Python. A saída segue a gravação atômica (nome temporário até o fim).
+
+import mmap
+import os
+from contextlib import contextmanager
+from gravacao_atomica import caminho_temporario, concluir_gravacao, descartar_gravacao
+
+# Arquivos a partir deste tamanho usam E/S mapeada (nos pequenos o mapeamento não compensa)
+LIMITE_ARQUIVO_MAPEADO = 64 * 1024 * 1024
+# Páginas já processadas são devolvidas ao sistema a cada janela deste tamanho: com segmentos de 1 MiB
+# ou mais, a liberação ocorre após cada segmento e a memória residente fica próxima à do caminho em fluxo
+JANELA_LIBERACAO = 1024 * 1024
+
+def _fechar_mapa(mapa):
+    """Fecha o mapeamento; se ainda houver fatias em uso (erro no meio), o fechamento fica para a coleta"""
+    try:
+        mapa.close()
+    except BufferError:
+        pass
+
+def preallocar(arquivo, tamanho):
+    """Reserva o espaço do arquivo de uma vez (posix_fallocate), com ftruncate como alternativa"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(arquivo.fileno(), 0, tamanho)
+            return
+        except OSError:
+            # Sistemas de arquivos sem suporte (alguns discos de rede): só ajustar o tamanho
+            pass
+    os.ftruncate(arquivo.fileno(), tamanho)
+
+def criar_liberador(*mapas):
+    """Retorna liberar(posição em cada mapa): descarta do processo as páginas já processadas (MADV_DONTNEED),
+    mantendo pequena a memória residente; os dados continuam no arquivo e no cache de páginas"""
+    if not hasattr(mmap, 'MADV_DONTNEED'):
+        return None
+    liberados = [0] * len(mapas)
+    
+    def liberar(*posicoes):
+        for numero_mapa, (mapa, posicao) in enumerate(zip(mapas, posicoes)):
+            fim = posicao - posicao % mmap.PAGESIZE
+            if fim - liberados[numero_mapa] >= JANELA_LIBERACAO:
+                mapa.madvise(mmap.MADV_DONTNEED, liberados[numero_mapa], fim - liberados[numero_mapa])
+                liberados[numero_mapa] = fim
+    return liberar
+
+@contextmanager
+def mapear_leitura(caminho_arquivo):
+    """Mapeia um arquivo somente para leitura, avisando o sistema de que o acesso é sequencial"""
+    with open(caminho_arquivo, 'rb') as arquivo:
+        mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if hasattr(mapa, 'madvise'):
+            mapa.madvise(mmap.MADV_SEQUENTIAL)
+        yield mapa
+    finally:
+        _fechar_mapa(mapa)
+
+@contextmanager
+def gravacao_mapeada(caminho_final, tamanho):
+    """Saída atômica pré-alocada com o tamanho final e mapeada para escrita"""
+    # Leitura e escrita: o mapeamento gravável exige as duas permissões
+    arquivo = open(caminho_temporario(caminho_final), 'w+b', buffering=0)
+    try:
+        preallocar(arquivo, tamanho)
+        mapa = mmap.mmap(arquivo.fileno(), tamanho, access=mmap.ACCESS_WRITE)
+        try:
+            if hasattr(mapa, 'madvise'):
+                mapa.madvise(mmap.MADV_SEQUENTIAL)
+            yield mapa
+            mapa.flush()
+        finally:
+            _fechar_mapa(mapa)
+        concluir_gravacao(arquivo, caminho_final)
+    except BaseException:
+        descartar_gravacao(arquivo, caminho_final)
+        raise
\ No newline at end of file
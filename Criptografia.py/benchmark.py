@@ -0,0 +1,253 @@
+# benchmark.py
+# Medição de desempenho: motor de criptografia, derivação de chave e processamento em lote
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: sem medição de pico de memória
+    resource = None
+
+SENHA_BENCHMARK = 'senha-de-benchmark'
+# Derivações medidas, como (algoritmo, custo): iterações do PBKDF2 ou n do scrypt (None: custo padrão)
+DERIVACOES_BENCHMARK = (
+    ('pbkdf2-sha256', 10000), ('pbkdf2-sha256', None), ('pbkdf2-sha256', 300000),
+    ('scrypt', 2 ** 14), ('scrypt', None)
+)
+
+# Conjuntos sintéticos: (quantidade de arquivos, tamanho de cada arquivo em bytes), multiplicados pela escala
+CONJUNTOS_PADRAO = {
+    'pequenos': [(2000, 2 * 1024)],
+    'grandes': [(2, 64 * 1024 * 1024)],
+    'misto': [(500, 4 * 1024), (50, 256 * 1024), (2, 32 * 1024 * 1024)]
+}
+
+# Orçamento de inicialização por invocação (ms): executores de tarefas chamam a ferramenta milhares de
+# vezes, e comandos curtos não devem pagar a importação da pilha de cifras
+ORCAMENTO_INICIALIZACAO_MS = {'version': 100, 'verify': 120}
+REPETICOES_INICIALIZACAO = 15
+
+def _pico_rss_kb():
+    """Pico de memória residente do processo atual e de seus filhos, em KB"""
+    if resource is None:
+        return None
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # No macOS ru_maxrss é medido em bytes; no Linux, em KB
+    divisor = 1024 if sys.platform == 'darwin' else 1
+    return max(proprio, filhos) // divisor
+
+def _executar_cenario(operacao, pasta_origem, pasta_destino, numero_trabalhadores):
+    """Executa uma operação em lote num processo isolado e mede tempo e memória"""
+    from main import SistemaCriptografiaArquivos
+    sistema = SistemaCriptografiaArquivos()
+    
+    inicio = time.perf_counter()
+    # A saída de progresso não faz parte da medição
+    with contextlib.redirect_stdout(io.StringIO()):
+        if operacao == 'encrypt':
+            resultado = sistema.criptografar_pasta(
+                pasta_origem, SENHA_BENCHMARK, pasta_destino, numero_trabalhadores=numero_trabalhadores
+            )
+        elif operacao == 'decrypt':
+            resultado = sistema.descriptografar_pasta(pasta_origem, SENHA_BENCHMARK, pasta_destino)
+        else:
+            resultado = sistema.verificar_pasta(pasta_origem)
+            resultado = {'sucessos': resultado['validos'], 'erros': len(resultado['invalidos'])}
+    duracao = time.perf_counter() - inicio
+    
+    return {
+        'segundos': duracao,
+        'sucessos': resultado['sucessos'],
+        'erros': resultado['erros'],
+        'pico_rss_kb': _pico_rss_kb()
+    }
+
+def _medir_derivacao(gerenciador_senhas, parametros_kdf, repeticoes):
+    """Mede a latência média de derivar_chave_da_senha (o mesmo caminho do motor) com os parâmetros informados"""
+    from gerenciador_senhas import descrever_parametros_kdf
+    
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        gerenciador_senhas.derivar_chave_da_senha(SENHA_BENCHMARK, os.urandom(32), parametros_kdf=parametros_kdf)
+        duracoes.append(time.perf_counter() - inicio)
+    return {
+        'parametros': parametros_kdf,
+        'descricao': descrever_parametros_kdf(parametros_kdf),
+        'milissegundos_media': 1000 * sum(duracoes) / len(duracoes),
+        'milissegundos_minimo': 1000 * min(duracoes)
+    }
+
+def _medir_derivacoes(derivacoes, repeticoes=3):
+    """Mede cada derivação fixa e as escolhidas pela calibração (tempo alvo padrão) de cada algoritmo"""
+    from gerenciador_senhas import ALGORITMOS_KDF, GerenciadorSenhas, criar_parametros_kdf
+    
+    gerenciador_senhas = GerenciadorSenhas()
+    medicoes = [_medir_derivacao(gerenciador_senhas, criar_parametros_kdf(algoritmo, custo), repeticoes)
+                for algoritmo, custo in derivacoes]
+    calibradas = []
+    for algoritmo in ALGORITMOS_KDF:
+        inicio = time.perf_counter()
+        parametros_kdf = gerenciador_senhas.calibrar_kdf(algoritmo)
+        medicao = _medir_derivacao(gerenciador_senhas, parametros_kdf, repeticoes)
+        medicao['segundos_calibracao'] = time.perf_counter() - inicio
+        calibradas.append(medicao)
+    return {'fixas': medicoes, 'calibradas': calibradas}
+
+def _medir_inicializacao(nome, argumentos, repeticoes=REPETICOES_INICIALIZACAO):
+    """Mede a mediana do tempo de uma invocação completa da linha de comando num processo novo e
+    confere, com -X importtime, se a biblioteca cryptography foi importada"""
+    comando = [sys.executable, str(Path(__file__).resolve().parent)] + list(argumentos)
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        duracoes.append(time.perf_counter() - inicio)
+    importacoes = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + comando[1:], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    ).stderr.splitlines()
+    
+    mediana_ms = 1000 * statistics.median(duracoes)
+    return {
+        'milissegundos_mediana': mediana_ms,
+        'orcamento_ms': ORCAMENTO_INICIALIZACAO_MS[nome],
+        'dentro_do_orcamento': mediana_ms <= ORCAMENTO_INICIALIZACAO_MS[nome],
+        'modulos_importados': sum(1 for linha in importacoes if linha.startswith('import time:')) - 1,
+        'carrega_cryptography': any(linha.rsplit('|', 1)[-1].strip() == 'cryptography' for linha in importacoes)
+    }
+
+class BenchmarkCriptografia:
+    def __init__(self, pasta_trabalho=None, escala=1.0, conjuntos=None):
+        self.pasta_trabalho = Path(pasta_trabalho) if pasta_trabalho else None
+        self.escala = escala
+        self.conjuntos = conjuntos or CONJUNTOS_PADRAO
+    
+    def gerar_conjunto(self, pasta, especificacao):
+        """Gera arquivos sintéticos (dados aleatórios) e retorna (quantidade, total de bytes)"""
+        pasta.mkdir(parents=True, exist_ok=True)
+        quantidade_total = 0
+        bytes_totais = 0
+        for quantidade, tamanho in especificacao:
+            # A escala reduz/aumenta a quantidade de arquivos e o tamanho dos arquivos grandes (> 1 MB)
+            quantidade = max(1, int(quantidade * self.escala))
+            if tamanho > 1024 * 1024:
+                tamanho = max(1, int(tamanho * self.escala))
+            for numero in range(quantidade):
+                with open(pasta / f"arquivo_{tamanho}_{numero:06d}.bin", 'wb') as arquivo:
+                    restante = tamanho
+                    while restante:
+                        bloco = min(restante, 1024 * 1024)
+                        arquivo.write(os.urandom(bloco))
+                        restante -= bloco
+            quantidade_total += quantidade
+            bytes_totais += quantidade * tamanho
+        return quantidade_total, bytes_totais
+    
+    def _medir_isolado(self, operacao, pasta_origem, pasta_destino, numero_trabalhadores=1):
+        """Roda o cenário num processo novo para que o pico de memória seja só dele"""
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(_executar_cenario, operacao, str(pasta_origem),
+                                   pasta_destino and str(pasta_destino), numero_trabalhadores).result()
+    
+    def _taxas(self, medicao, quantidade, bytes_totais):
+        """Acrescenta MB/s e arquivos/s a uma medição"""
+        segundos = max(medicao['segundos'], 1e-9)
+        medicao['mb_por_segundo'] = bytes_totais / segundos / (1024 * 1024)
+        medicao['arquivos_por_segundo'] = quantidade / segundos
+        return medicao
+    
+    def executar(self, derivacoes=DERIVACOES_BENCHMARK, trabalhadores=None):
+        """Executa todos os cenários e retorna o relatório (serializável em JSON)"""
+        trabalhadores = trabalhadores or self._curva_trabalhadores()
+        pasta_base = self.pasta_trabalho or Path(tempfile.mkdtemp(prefix='benchmark_criptografia_'))
+        relatorio = {
+            'sistema': {
+                'python': platform.python_version(),
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count()
+            },
+            'escala': self.escala,
+            'derivacao_chave': _medir_derivacoes(derivacoes),
+            'inicializacao': {},
+            'conjuntos': {},
+            'escalabilidade': []
+        }
+        
+        try:
+            pasta_vazia = pasta_base / 'inicializacao'
+            pasta_vazia.mkdir(parents=True, exist_ok=True)
+            relatorio['inicializacao'] = {
+                'version': _medir_inicializacao('version', ['--version']),
+                'verify': _medir_inicializacao('verify', ['verify', str(pasta_vazia)])
+            }
+            
+            for nome, especificacao in self.conjuntos.items():
+                pasta_origem = pasta_base / nome
+                quantidade, bytes_totais = self.gerar_conjunto(pasta_origem, especificacao)
+                pasta_criptografada = pasta_base / f"{nome}_enc"
+                pasta_recuperada = pasta_base / f"{nome}_dec"
+                
+                relatorio['conjuntos'][nome] = {
+                    'arquivos': quantidade,
+                    'bytes': bytes_totais,
+                    'encrypt': self._taxas(self._medir_isolado('encrypt', pasta_origem, pasta_criptografada, max(trabalhadores)), quantidade, bytes_totais),
+                    'decrypt': self._taxas(self._medir_isolado('decrypt', pasta_criptografada, pasta_recuperada), quantidade, bytes_totais),
+                    'verify': self._taxas(self._medir_isolado('verify', pasta_criptografada, None), quantidade, bytes_totais)
+                }
+                shutil.rmtree(pasta_recuperada, ignore_errors=True)
+                
+                # Curva de escalabilidade medida sobre o conjunto misto
+                if nome == 'misto':
+                    for numero_trabalhadores in trabalhadores:
+                        shutil.rmtree(pasta_criptografada, ignore_errors=True)
+                        medicao = self._medir_isolado('encrypt', pasta_origem, pasta_criptografada, numero_trabalhadores)
+                        medicao['trabalhadores'] = numero_trabalhadores
+                        relatorio['escalabilidade'].append(self._taxas(medicao, quantidade, bytes_totais))
+                shutil.rmtree(pasta_criptografada, ignore_errors=True)
+        finally:
+            if self.pasta_trabalho is None:
+                shutil.rmtree(pasta_base, ignore_errors=True)
+        
+        return relatorio
+    
+    def _curva_trabalhadores(self):
+        """Potências de 2 até o número de CPUs (1, 2, 4, ..., n)"""
+        total_cpus = os.cpu_count() or 1
+        curva = []
+        numero_trabalhadores = 1
+        while numero_trabalhadores < total_cpus:
+            curva.append(numero_trabalhadores)
+            numero_trabalhadores *= 2
+        curva.append(total_cpus)
+        return curva
+
+def executar_benchmark(escala=1.0, conjuntos=None, caminho_saida=None, pasta_trabalho=None):
+    """Executa o benchmark e grava o relatório JSON (arquivo ou saída padrão)"""
+    conjuntos_escolhidos = CONJUNTOS_PADRAO
+    if conjuntos:
+        conjuntos_escolhidos = {nome: CONJUNTOS_PADRAO[nome] for nome in conjuntos}
+    
+    relatorio = BenchmarkCriptografia(pasta_trabalho, escala, conjuntos_escolhidos).executar()
+    relatorio_json = json.dumps(relatorio, indent=2)
+    if caminho_saida:
+        with open(caminho_saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(relatorio_json + '\n')
+    else:
+        print(relatorio_json)
+    return relatorio
+
+if __name__ == "__main__":
+    executar_benchmark(escala=float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
\ No newline at end of file
@@ -0,0 +1,298 @@
+# cli.py
+# Interface de linha de comando não interativa (automação, cron, filas de tarefas)
+
+import argparse
+import contextlib
+import os
+import sys
+
+VERSAO_PROGRAMA = '2.0.0'
+VARIAVEL_SENHA_PADRAO = 'CRIPTOGRAFIA_SENHA'
+VARIAVEL_NOVA_SENHA_PADRAO = 'CRIPTOGRAFIA_NOVA_SENHA'
+# Origem ou destino '-': entrada ou saída padrão (modo fluxo, um único arquivo)
+FLUXO_PADRAO = '-'
+
+def ler_senha(argumentos):
+    """Lê a senha de um descritor de arquivo, de uma variável de ambiente ou do terminal"""
+    return _ler_segredo(argumentos.senha_fd, argumentos.senha_env or VARIAVEL_SENHA_PADRAO, "Senha: ", '--senha-fd')
+
+def ler_nova_senha(argumentos):
+    """Lê a nova senha da troca de senha (no terminal, digitada duas vezes)"""
+    nome_variavel = argumentos.nova_senha_env or VARIAVEL_NOVA_SENHA_PADRAO
+    nova_senha = _ler_segredo(argumentos.nova_senha_fd, nome_variavel, "Nova senha: ", '--nova-senha-fd')
+    if argumentos.nova_senha_fd is None and nome_variavel not in os.environ:
+        import getpass
+        if getpass.getpass("Confirme a nova senha: ") != nova_senha:
+            raise ValueError("As senhas não coincidem")
+    return nova_senha
+
+def _ler_segredo(descritor, nome_variavel, pergunta, opcao_descritor):
+    """Lê uma senha do descritor (primeira linha), da variável de ambiente ou do terminal, nessa ordem"""
+    if descritor is not None:
+        with os.fdopen(descritor, 'r', closefd=False) as arquivo_senha:
+            return arquivo_senha.readline().rstrip('\r\n')
+    
+    if nome_variavel in os.environ:
+        return os.environ[nome_variavel]
+    
+    if sys.stdin.isatty():
+        import getpass
+        return getpass.getpass(pergunta)
+    
+    raise ValueError(f"Senha não informada: use {opcao_descritor} ou a variável de ambiente {nome_variavel}")
+
+def criar_analisador():
+    """Cria o analisador de argumentos com os subcomandos encrypt, decrypt e verify"""
+    analisador = argparse.ArgumentParser(
+        prog='criptografia',
+        description='Sistema de criptografia de arquivos (modo não interativo)'
+    )
+    analisador.add_argument('--version', action='version', version=f'%(prog)s {VERSAO_PROGRAMA}')
+    subcomandos = analisador.add_subparsers(dest='comando', required=True)
+    
+    def adicionar_opcoes_senha(subanalisador):
+        subanalisador.add_argument('--senha-fd', type=int, help='descritor de arquivo de onde ler a senha (primeira linha)')
+        subanalisador.add_argument('--senha-env', help=f'variável de ambiente com a senha (padrão: {VARIAVEL_SENHA_PADRAO})')
+    
+    criptografar = subcomandos.add_parser('encrypt', help='criptografa uma pasta')
+    criptografar.add_argument('origem', help="pasta com os arquivos originais, ou '-' para criptografar a entrada padrão")
+    criptografar.add_argument('destino', nargs='?',
+                              help="pasta de saída (padrão: <origem>_backup_criptografado), ou '-' para a saída padrão")
+    adicionar_opcoes_senha(criptografar)
+    criptografar.add_argument('--trabalhadores', type=int, help='número de trabalhadores em paralelo')
+    criptografar.add_argument('--modo-paralelo', choices=['auto', 'threads', 'processos', 'assincrono'],
+                              help='threads, processos, auto (por tamanho) ou assincrono (leitura, cifra e escrita sobrepostas)')
+    criptografar.add_argument('--tamanho-bloco', type=int, help='tamanho de cada bloco/segmento em bytes')
+    criptografar.add_argument('--memoria-lote', type=int,
+                              help='memória máxima, em MB, das tarefas em andamento no lote (padrão: 512)')
+    criptografar.add_argument('--formato', choices=['conteiner', 'legado'], help='formato dos arquivos .enc')
+    criptografar.add_argument('--incremental', action='store_true', help='criptografa apenas arquivos novos/alterados')
+    criptografar.add_argument('--retomar', '--resume', dest='retomar', action='store_true',
+                              help='continua uma execução interrompida, pulando os arquivos já concluídos')
+    criptografar.add_argument('--incluir', action='append', default=None, help='padrão glob de inclusão (repetível)')
+    criptografar.add_argument('--excluir', action='append', default=None, help='padrão glob de exclusão (repetível)')
+    criptografar.add_argument('--empacotar', action='store_true', help='agrupa arquivos pequenos em pacotes indexados')
+    criptografar.add_argument('--deduplicar', action='store_true',
+                              help='cifra uma única vez cada bloco de conteúdo repetido entre arquivos (formato contêiner; '
+                                   'processa os arquivos em sequência e não remove blocos que deixaram de ser usados)')
+    criptografar.add_argument('--compressao', choices=['zlib', 'lzma'], help='comprime os dados antes da cifra (formato contêiner)')
+    criptografar.add_argument('--nivel-compressao', type=int, help='nível de compressão de 0 a 9 (padrão: 6)')
+    criptografar.add_argument('--kdf', choices=['pbkdf2-sha256', 'scrypt'], help='derivação da chave (padrão: pbkdf2-sha256)')
+    criptografar.add_argument('--custo-kdf', type=int, help='iterações do PBKDF2 ou parâmetro n do scrypt')
+    criptografar.add_argument('--tempo-kdf', type=float,
+                              help='calibra o custo para que uma derivação leve este tempo (segundos) neste computador')
+    
+    descriptografar = subcomandos.add_parser('decrypt', help='descriptografa uma pasta de arquivos .enc')
+    descriptografar.add_argument('origem', help="pasta com os arquivos .enc, ou '-' para descriptografar a entrada padrão")
+    descriptografar.add_argument('destino', nargs='?',
+                                 help="pasta de saída (padrão: <origem>_descriptografado), ou '-' para a saída padrão")
+    adicionar_opcoes_senha(descriptografar)
+    descriptografar.add_argument('--tamanho-bloco', type=int, help='tamanho de cada leitura em bytes')
+    
+    verificar = subcomandos.add_parser('verify', help='verifica a estrutura dos arquivos .enc de uma pasta')
+    verificar.add_argument('origem', help='pasta com os arquivos .enc')
+    verificar.add_argument('--profundo', action='store_true',
+                           help='autentica também o conteúdo (lê os arquivos inteiros; pede a senha)')
+    verificar.add_argument('--trabalhadores', type=int, help='número de arquivos verificados em paralelo')
+    verificar.add_argument('--silencioso', action='store_true', help='exibe somente os arquivos inválidos')
+    adicionar_opcoes_senha(verificar)
+    
+    recriptografar = subcomandos.add_parser('rekey', help='troca a senha de uma pasta de arquivos .enc sem descriptografá-la em disco')
+    recriptografar.add_argument('origem', help='pasta com os arquivos .enc')
+    adicionar_opcoes_senha(recriptografar)
+    recriptografar.add_argument('--nova-senha-fd', type=int, help='descritor de arquivo de onde ler a nova senha (primeira linha)')
+    recriptografar.add_argument('--nova-senha-env', help=f'variável de ambiente com a nova senha (padrão: {VARIAVEL_NOVA_SENHA_PADRAO})')
+    recriptografar.add_argument('--trabalhadores', type=int, help='número de arquivos processados em paralelo')
+    recriptografar.add_argument('--completo', action='store_true',
+                                help='cifra de novo também os arquivos com envelope (nova chave de dados em cada arquivo)')
+    recriptografar.add_argument('--kdf', choices=['pbkdf2-sha256', 'scrypt'], help='derivação da nova chave (padrão: pbkdf2-sha256)')
+    recriptografar.add_argument('--custo-kdf', type=int, help='iterações do PBKDF2 ou parâmetro n do scrypt')
+    recriptografar.add_argument('--tempo-kdf', type=float,
+                                help='calibra o custo para que uma derivação leve este tempo (segundos) neste computador')
+    recriptografar.add_argument('--silencioso', action='store_true', help='não exibe progresso nem mensagens por arquivo')
+    
+    listar = subcomandos.add_parser('list', help='lista os arquivos de um pacote sem descriptografar os dados')
+    listar.add_argument('pacote', help='arquivo de pacote (.pacote_*.enc)')
+    adicionar_opcoes_senha(listar)
+    
+    extrair = subcomandos.add_parser('extract', help='descriptografa um único arquivo de um pacote')
+    extrair.add_argument('pacote', help='arquivo de pacote (.pacote_*.enc)')
+    extrair.add_argument('membro', help='caminho do arquivo dentro do pacote (como mostrado por list)')
+    extrair.add_argument('destino', nargs='?', help='arquivo de saída (padrão: nome do membro na pasta atual)')
+    adicionar_opcoes_senha(extrair)
+    
+    for subanalisador in (criptografar, descriptografar):
+        subanalisador.add_argument('--silencioso', action='store_true', help='não exibe progresso nem mensagens por arquivo')
+        subanalisador.add_argument('--metricas-json', help='grava as métricas (tempo por etapa, bytes, filas) em JSON')
+        subanalisador.add_argument('--metricas-prometheus', help='grava as métricas no formato texto do Prometheus')
+        subanalisador.add_argument('--eventos', help='grava eventos estruturados (JSON por linha) neste arquivo')
+        subanalisador.add_argument('--sem-mmap', action='store_true',
+                                   help='lê e grava arquivos grandes em fluxo, sem E/S mapeada em memória')
+    
+    medir = subcomandos.add_parser('bench', help='mede o desempenho com arquivos sintéticos e emite JSON')
+    medir.add_argument('--escala', type=float, default=1.0, help='fator de tamanho dos conjuntos sintéticos')
+    medir.add_argument('--conjunto', action='append', choices=['pequenos', 'grandes', 'misto'], help='conjunto a medir (repetível)')
+    medir.add_argument('--saida', help='arquivo JSON de saída (padrão: saída padrão)')
+    medir.add_argument('--pasta-trabalho', help='pasta para os arquivos sintéticos (padrão: temporária)')
+    
+    return analisador
+
+def executar(argumentos_linha=None):
+    """Executa a linha de comando; retorna o código de saída"""
+    argumentos = criar_analisador().parse_args(argumentos_linha)
+    
+    if argumentos.comando == 'bench':
+        from benchmark import executar_benchmark
+        executar_benchmark(argumentos.escala, argumentos.conjunto, argumentos.saida, argumentos.pasta_trabalho)
+        return 0
+    
+    from main import SistemaCriptografiaArquivos
+    instrumentacao = criar_instrumentacao(argumentos)
+    sistema = SistemaCriptografiaArquivos(
+        instrumentacao, getattr(argumentos, 'silencioso', False), not getattr(argumentos, 'sem_mmap', False)
+    )
+    
+    try:
+        if argumentos.comando == 'verify':
+            def exibir_resultado(arquivo_criptografado, valido, mensagem):
+                """Exibe cada arquivo assim que é verificado"""
+                if not valido:
+                    print(f"INVÁLIDO {arquivo_criptografado}: {mensagem}", flush=True)
+                elif not argumentos.silencioso:
+                    print(f"OK {arquivo_criptografado}: {mensagem}", flush=True)
+            
+            senha = ler_senha(argumentos) if argumentos.profundo else None
+            resultado = sistema.verificar_pasta(argumentos.origem, senha, argumentos.trabalhadores, exibir_resultado)
+            print(f"Válidos: {resultado['validos']} | Inválidos: {len(resultado['invalidos'])}")
+            return 1 if resultado['invalidos'] else 0
+        
+        senha = ler_senha(argumentos)
+        if argumentos.comando == 'rekey':
+            resultado = sistema.recriptografar_pasta(
+                argumentos.origem, senha, ler_nova_senha(argumentos),
+                numero_trabalhadores=argumentos.trabalhadores,
+                kdf=argumentos.kdf,
+                custo_kdf=argumentos.custo_kdf,
+                tempo_alvo_kdf=argumentos.tempo_kdf,
+                completo=argumentos.completo
+            )
+            print(f"Sucessos: {resultado['sucessos']} | Erros: {resultado['erros']} | Pasta: {resultado['pasta_saida']}")
+            return 1 if resultado['erros'] else 0
+        if argumentos.comando == 'list':
+            for membro in sistema.listar_pacote(argumentos.pacote, senha):
+                print(f"{membro['tamanho']:>12}  {membro['caminho']}")
+            return 0
+        if argumentos.comando == 'extract':
+            destino = argumentos.destino or os.path.basename(argumentos.membro)
+            print(f"Extraído: {sistema.extrair_membro_pacote(argumentos.pacote, argumentos.membro, senha, destino)}")
+            return 0
+        
+        opcoes = {}
+        if argumentos.tamanho_bloco:
+            opcoes['tamanho_bloco'] = argumentos.tamanho_bloco
+        
+        if FLUXO_PADRAO in (argumentos.origem, argumentos.destino):
+            return executar_fluxo(sistema, argumentos, senha, opcoes)
+        
+        if argumentos.comando == 'encrypt':
+            if argumentos.formato:
+                opcoes['formato'] = argumentos.formato
+            if argumentos.modo_paralelo:
+                opcoes['modo_paralelo'] = argumentos.modo_paralelo
+            if argumentos.memoria_lote:
+                opcoes['orcamento_memoria'] = argumentos.memoria_lote * 1024 * 1024
+            resultado = sistema.criptografar_pasta(
+                argumentos.origem, senha, argumentos.destino,
+                incremental=argumentos.incremental,
+                retomar=argumentos.retomar,
+                numero_trabalhadores=argumentos.trabalhadores,
+                padroes_inclusao=argumentos.incluir,
+                padroes_exclusao=argumentos.excluir,
+                empacotar=argumentos.empacotar,
+                deduplicar=argumentos.deduplicar,
+                compressao=argumentos.compressao,
+                nivel_compressao=argumentos.nivel_compressao,
+                kdf=argumentos.kdf,
+                custo_kdf=argumentos.custo_kdf,
+                tempo_alvo_kdf=argumentos.tempo_kdf,
+                **opcoes
+            )
+        else:
+            resultado = sistema.descriptografar_pasta(argumentos.origem, senha, argumentos.destino, **opcoes)
+        
+        print(f"Sucessos: {resultado['sucessos']} | Erros: {resultado['erros']} | Saída: {resultado['pasta_saida']}")
+        return 1 if resultado['erros'] else 0
+    
+    except (ValueError, OSError) as erro:
+        print(f"Erro: {str(erro)}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("\nOperação cancelada pelo usuário.", file=sys.stderr)
+        return 130
+    finally:
+        if instrumentacao is not None:
+            exportar_metricas(instrumentacao, argumentos)
+
+def executar_fluxo(sistema, argumentos, senha, opcoes):
+    """Criptografa ou descriptografa um único fluxo ('-' é a entrada ou a saída padrão); mensagens vão para stderr"""
+    if argumentos.comando == 'encrypt':
+        if argumentos.incremental or argumentos.retomar or argumentos.empacotar or argumentos.deduplicar:
+            raise ValueError("Incremental, retomada, pacotes e deduplicação valem só para pastas, não para fluxos")
+        if argumentos.formato:
+            opcoes['formato'] = argumentos.formato
+    
+    # Origem '-' sem destino: o resultado vai para a saída padrão
+    destino = argumentos.destino or FLUXO_PADRAO
+    with contextlib.ExitStack() as pilha:
+        if argumentos.origem == FLUXO_PADRAO:
+            leitor = sys.stdin.buffer
+        else:
+            leitor = pilha.enter_context(open(argumentos.origem, 'rb'))
+        if destino == FLUXO_PADRAO:
+            escritor = sys.stdout.buffer
+        else:
+            # Arquivo de saída com nome final só se o fluxo terminar íntegro
+            from gravacao_atomica import gravacao_atomica
+            escritor = pilha.enter_context(gravacao_atomica(destino))
+        
+        if argumentos.comando == 'encrypt':
+            resultado = sistema.criptografar_fluxo(
+                leitor, escritor, senha,
+                compressao=argumentos.compressao,
+                nivel_compressao=argumentos.nivel_compressao,
+                kdf=argumentos.kdf,
+                custo_kdf=argumentos.custo_kdf,
+                tempo_alvo_kdf=argumentos.tempo_kdf,
+                **opcoes
+            )
+            resumo = f"Criptografados: {resultado['bytes_originais']} bytes"
+        else:
+            resultado = sistema.descriptografar_fluxo(leitor, escritor, senha, **opcoes)
+            resumo = f"Descriptografados: {resultado['bytes_escritos']} bytes"
+        escritor.flush()
+    
+    if not argumentos.silencioso:
+        print(resumo, file=sys.stderr)
+    return 0
+
+def criar_instrumentacao(argumentos):
+    """Cria a instrumentação somente se alguma saída de métricas ou eventos foi pedida"""
+    if not any(getattr(argumentos, opcao, None) for opcao in ('metricas_json', 'metricas_prometheus', 'eventos')):
+        return None
+    from instrumentacao import Instrumentacao
+    return Instrumentacao(argumentos.eventos)
+
+def exportar_metricas(instrumentacao, argumentos):
+    """Grava as métricas pedidas na linha de comando e fecha o arquivo de eventos"""
+    try:
+        if argumentos.metricas_json:
+            instrumentacao.exportar_json(argumentos.metricas_json)
+        if argumentos.metricas_prometheus:
+            instrumentacao.exportar_prometheus(argumentos.metricas_prometheus)
+    except OSError as erro:
+        print(f"Erro ao gravar métricas: {str(erro)}", file=sys.stderr)
+    finally:
+        instrumentacao.fechar()
+
+if __name__ == "__main__":
+    sys.exit(executar())
\ No newline at end of file
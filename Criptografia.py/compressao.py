@@ -0,0 +1,66 @@
+# compressao.py
+# Compressão opcional antes da cifra (zlib ou lzma da biblioteca padrão), segmento a segmento
+
+import lzma
+import math
+import zlib
+from collections import Counter
+
+COMPRESSAO_ZLIB = 'zlib'
+COMPRESSAO_LZMA = 'lzma'
+ALGORITMOS_COMPRESSAO = (COMPRESSAO_ZLIB, COMPRESSAO_LZMA)
+# zlib: níveis 0 a 9; lzma: presets 0 a 9
+NIVEL_COMPRESSAO_PADRAO = 6
+
+# Amostra do início do arquivo: acima deste limite (bits por byte) os dados já estão comprimidos
+TAMANHO_AMOSTRA_ENTROPIA = 64 * 1024
+LIMITE_ENTROPIA = 7.5
+
+# Primeiro byte de cada segmento aberto, quando o contêiner usa compressão
+SEGMENTO_ORIGINAL = 0
+SEGMENTO_COMPRIMIDO = 1
+
+def calcular_entropia(amostra):
+    """Entropia de Shannon da amostra, em bits por byte (0 a 8)"""
+    total = len(amostra)
+    if not total:
+        return 0.0
+    return -sum(quantidade / total * math.log2(quantidade / total) for quantidade in Counter(amostra).values())
+
+def parece_comprimido(amostra):
+    """Indica, pela entropia de uma amostra, se os dados já estão comprimidos (ou cifrados)"""
+    return calcular_entropia(amostra[:TAMANHO_AMOSTRA_ENTROPIA]) >= LIMITE_ENTROPIA
+
+class CompressorSegmentos:
+    def __init__(self, algoritmo=COMPRESSAO_ZLIB, nivel=None):
+        if algoritmo not in ALGORITMOS_COMPRESSAO:
+            raise ValueError(f"Compressão não suportada: {algoritmo}")
+        self.algoritmo = algoritmo
+        self.nivel = NIVEL_COMPRESSAO_PADRAO if nivel is None else nivel
+        if not 0 <= self.nivel <= 9:
+            raise ValueError(f"Nível de compressão inválido: {self.nivel} (use 0 a 9)")
+    
+    def descrever(self):
+        """Retorna a descrição gravada no cabeçalho do contêiner"""
+        return {'algoritmo': self.algoritmo, 'nivel': self.nivel}
+    
+    def comprimir(self, dados):
+        """Comprime um segmento inteiro"""
+        if self.algoritmo == COMPRESSAO_LZMA:
+            # A integridade já é garantida pela tag AEAD: sem verificação extra do xz
+            return lzma.compress(dados, format=lzma.FORMAT_XZ, check=lzma.CHECK_NONE, preset=self.nivel)
+        return zlib.compress(dados, self.nivel)
+
+def descomprimir_segmento(algoritmo, dados, tamanho_maximo):
+    """Descomprime um segmento, recusando saídas maiores que tamanho_maximo (bombas de compressão)"""
+    if algoritmo == COMPRESSAO_LZMA:
+        descompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    elif algoritmo == COMPRESSAO_ZLIB:
+        descompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"Compressão não suportada: {algoritmo}")
+    
+    dados_originais = descompressor.decompress(dados, tamanho_maximo + 1)
+    if len(dados_originais) > tamanho_maximo or not descompressor.eof:
+        raise ValueError("Segmento comprimido inválido")
+    return dados_originais
\ No newline at end of file
@@ -0,0 +1,604 @@
+# conteiner_segmentado.py
+# Formato de contêiner segmentado (.enc versionado) com acesso aleatório
+#
+# Estrutura do arquivo:
+#   MAGIA (8) | versão (1) | tamanho do cabeçalho (4) | cabeçalho JSON
+#   segmentos: [tamanho armazenado (4) | dados cifrados + tag (16)] ...
+#   índice: [deslocamento relativo (8) | tamanho armazenado (4)] por segmento
+#   rodapé: deslocamento do índice (8) | nº de segmentos (4) | tamanho original (8) | MAGIA_RODAPE (8)
+#
+# Cada segmento é cifrado de forma independente com um modo AEAD (AES-256-GCM quando
+# a CPU tem instruções AES, ChaCha20-Poly1305 caso contrário), usando o nonce
+# prefixo_nonce (8 bytes) + número do segmento (4 bytes). O número do segmento e a
+# marca de último segmento entram nos dados associados, impedindo reordenação e truncamento.
+#
+# Com compressão (registrada no cabeçalho), cada segmento aberto começa com uma marca:
+# 0 = dados originais, 1 = dados comprimidos. Os segmentos continuam cobrindo intervalos
+# fixos do arquivo original, preservando o acesso aleatório.
+#
+# O cabeçalho também registra os parâmetros de derivação da chave ('kdf'); contêineres
+# sem esse campo foram gravados com PBKDF2-SHA256 e 100.000 iterações.
+#
+# Envelope de chave ('envelope' no cabeçalho): os segmentos são cifrados com uma chave de dados
+# aleatória do arquivo, e o cabeçalho guarda essa chave cifrada (AEAD) pela chave derivada da senha.
+# O cabeçalho com envelope é completado com espaços até uma vaga fixa (TAMANHO_VAGA_CABECALHO), e trocar
+# a senha regrava só essa vaga, no lugar. Se o novo cabeçalho não cabe na vaga (contêineres sem ela,
+# parâmetros da derivação maiores) ou o arquivo tem outros nomes (hardlinks), o arquivo inteiro é copiado
+# com o novo cabeçalho; os deslocamentos do índice são relativos ao fim do cabeçalho. Sem o campo, os
+# segmentos usam direto a chave derivada da senha.
+
+import json
+import mmap
+import os
+import platform
+import secrets
+import struct
+from functools import lru_cache
+from compressao import ALGORITMOS_COMPRESSAO, SEGMENTO_COMPRIMIDO, SEGMENTO_ORIGINAL, descomprimir_segmento, parece_comprimido
+from fluxo_buffers import copiar_trecho, escrever_partes, ler_em, obter_buffer
+from gravacao_atomica import gravacao_atomica
+from instrumentacao import ETAPA_CIFRA, ETAPA_COMPRESSAO, InstrumentacaoNula
+from primitivas import ALGORITMO_AES_GCM, ALGORITMO_CHACHA20, ALGORITMOS_AEAD, criar_aead
+
+MAGIA_CONTEINER = b'CRIPTPY\x00'
+MAGIA_RODAPE = b'CRPTIDX\x00'
+VERSAO_CONTEINER = 1
+TAMANHO_SEGMENTO_PADRAO = 1024 * 1024
+TAMANHO_TAG = 16
+TAMANHO_CHAVE_DADOS = 32
+TAMANHO_NONCE_ENVELOPE = 12
+# Prefixo + cabeçalho JSON com envelope; cabe no primeiro bloco de 4 KiB, gravado no disco numa única operação
+TAMANHO_VAGA_CABECALHO = 1024
+
+FORMATO_PREFIXO = '>8sBI'
+FORMATO_TAMANHO_SEGMENTO = '>I'
+FORMATO_ENTRADA_INDICE = '>QI'
+FORMATO_RODAPE = '>QIQ8s'
+TAMANHO_PREFIXO = struct.calcsize(FORMATO_PREFIXO)
+TAMANHO_ENTRADA_INDICE = struct.calcsize(FORMATO_ENTRADA_INDICE)
+TAMANHO_RODAPE = struct.calcsize(FORMATO_RODAPE)
+
+@lru_cache(maxsize=None)
+def detectar_aceleracao_aes():
+    """Indica se a CPU possui instruções AES (AES-NI no x86, extensão AES no ARM)"""
+    try:
+        with open('/proc/cpuinfo') as informacoes_cpu:
+            for linha in informacoes_cpu:
+                if linha.startswith(('flags', 'Features')):
+                    return 'aes' in linha.split(':', 1)[1].split()
+    except OSError:
+        pass
+    # Sem /proc/cpuinfo: x86-64 e ARM64 modernos praticamente sempre têm AES em hardware
+    return platform.machine().lower() in ('x86_64', 'amd64', 'arm64', 'aarch64')
+
+def escolher_algoritmo_aead():
+    """Escolhe AES-256-GCM com aceleração por hardware, senão ChaCha20-Poly1305"""
+    return ALGORITMO_AES_GCM if detectar_aceleracao_aes() else ALGORITMO_CHACHA20
+
+class ConteinerSegmentado:
+    def __init__(self, tamanho_segmento=TAMANHO_SEGMENTO_PADRAO, algoritmo=None, instrumentacao=None, compressor=None,
+                 parametros_kdf=None, envelope=True):
+        self.tamanho_segmento = tamanho_segmento
+        # None: escolher automaticamente conforme a CPU
+        self.algoritmo = algoritmo or escolher_algoritmo_aead()
+        if self.algoritmo not in ALGORITMOS_AEAD:
+            raise ValueError(f"Algoritmo não suportado: {self.algoritmo}")
+        self.instrumentacao = instrumentacao or InstrumentacaoNula()
+        # CompressorSegmentos aplicado antes da cifra (None: sem compressão)
+        self.compressor = compressor
+        # Com compressão, o primeiro byte de cada buffer de segmento fica reservado para a marca
+        self.reserva_segmento = 1 if compressor is not None else 0
+        # Parâmetros de derivação da chave gravados no cabeçalho (None: não gravar)
+        self.parametros_kdf = parametros_kdf
+        # Envelope: chave de dados aleatória por arquivo, protegida pela chave derivada da senha
+        self.envelope = envelope
+    
+    @staticmethod
+    def e_conteiner(prefixo_arquivo):
+        """Indica se os primeiros bytes de um arquivo correspondem ao contêiner segmentado"""
+        return prefixo_arquivo[:len(MAGIA_CONTEINER)] == MAGIA_CONTEINER
+    
+    def _dados_associados(self, cabecalho, numero_segmento, ultimo_segmento):
+        """Monta os dados associados (autenticados, não cifrados) de um segmento"""
+        return b''.join([
+            MAGIA_CONTEINER,
+            bytes([VERSAO_CONTEINER]),
+            cabecalho['algoritmo'].encode(),
+            bytes.fromhex(cabecalho['prefixo_nonce']),
+            struct.pack('>IIB', cabecalho['tamanho_segmento'], numero_segmento, 1 if ultimo_segmento else 0),
+            # A compressão também é autenticada (ausente nos contêineres sem compressão)
+            cabecalho['compressao']['algoritmo'].encode() if 'compressao' in cabecalho else b''
+        ])
+    
+    def _nonce(self, cabecalho, numero_segmento):
+        """Gera o nonce de 12 bytes de um segmento"""
+        return bytes.fromhex(cabecalho['prefixo_nonce']) + struct.pack('>I', numero_segmento)
+    
+    def criar_cabecalho(self, sal_criptografico):
+        """Cria o cabeçalho de um novo contêiner"""
+        cabecalho = {
+            'algoritmo': self.algoritmo,
+            'tamanho_segmento': self.tamanho_segmento,
+            'prefixo_nonce': secrets.token_bytes(8).hex(),
+            'sal': bytes(sal_criptografico).hex()
+        }
+        if self.parametros_kdf is not None:
+            cabecalho['kdf'] = dict(self.parametros_kdf)
+        return cabecalho
+    
+    def serializar_cabecalho(self, cabecalho, tamanho_vaga=TAMANHO_VAGA_CABECALHO):
+        """Retorna o prefixo fixo seguido do cabeçalho JSON (com envelope, completado com espaços até a vaga)"""
+        cabecalho_serializado = json.dumps(cabecalho, sort_keys=True).encode()
+        if 'envelope' in cabecalho:
+            # Espaços depois do JSON são ignorados na leitura e deixam a troca de senha regravar o cabeçalho no lugar
+            cabecalho_serializado = cabecalho_serializado.ljust(tamanho_vaga - TAMANHO_PREFIXO, b' ')
+        return struct.pack(FORMATO_PREFIXO, MAGIA_CONTEINER, VERSAO_CONTEINER, len(cabecalho_serializado)) + cabecalho_serializado
+    
+    def escrever_cabecalho(self, escritor, cabecalho):
+        """Grava o prefixo fixo e o cabeçalho JSON"""
+        return escritor.write(self.serializar_cabecalho(cabecalho))
+    
+    def ler_cabecalho(self, leitor):
+        """Lê o prefixo e o cabeçalho JSON; retorna (cabeçalho, bytes lidos)"""
+        prefixo = leitor.read(TAMANHO_PREFIXO)
+        if len(prefixo) < TAMANHO_PREFIXO:
+            raise ValueError("Cabeçalho do contêiner incompleto")
+        return self._interpretar_cabecalho(prefixo, leitor.read)
+    
+    def _interpretar_cabecalho(self, prefixo, ler):
+        """Valida o prefixo fixo e decodifica o cabeçalho JSON"""
+        magia, versao, tamanho_cabecalho = struct.unpack(FORMATO_PREFIXO, prefixo)
+        if magia != MAGIA_CONTEINER:
+            raise ValueError("Arquivo não é um contêiner segmentado")
+        if versao != VERSAO_CONTEINER:
+            raise ValueError(f"Versão de contêiner não suportada: {versao}")
+        
+        cabecalho_serializado = ler(tamanho_cabecalho)
+        if len(cabecalho_serializado) < tamanho_cabecalho:
+            raise ValueError("Cabeçalho do contêiner incompleto")
+        cabecalho = json.loads(cabecalho_serializado.decode())
+        if cabecalho.get('algoritmo') not in ALGORITMOS_AEAD:
+            raise ValueError(f"Algoritmo não suportado: {cabecalho.get('algoritmo')}")
+        if 'compressao' in cabecalho and cabecalho['compressao'].get('algoritmo') not in ALGORITMOS_COMPRESSAO:
+            raise ValueError(f"Compressão não suportada: {cabecalho['compressao'].get('algoritmo')}")
+        return cabecalho, TAMANHO_PREFIXO + tamanho_cabecalho
+    
+    def _criar_cifra(self, cabecalho, chave_criptografia):
+        """Cria a cifra AEAD indicada no cabeçalho (com envelope, abre antes a chave de dados)"""
+        if 'envelope' in cabecalho:
+            chave_criptografia = self._abrir_envelope(cabecalho, chave_criptografia)
+        return criar_aead(cabecalho['algoritmo'], chave_criptografia)
+    
+    def _dados_associados_envelope(self, cabecalho):
+        """Dados associados do envelope: a chave de dados fica presa a este arquivo e a este sal"""
+        return b''.join([
+            MAGIA_CONTEINER,
+            bytes([VERSAO_CONTEINER]),
+            b'envelope',
+            cabecalho['algoritmo'].encode(),
+            bytes.fromhex(cabecalho['prefixo_nonce']),
+            bytes.fromhex(cabecalho['sal'])
+        ])
+    
+    def _envelopar_chave(self, cabecalho, chave_dados, chave_criptografia):
+        """Grava no cabeçalho a chave de dados cifrada pela chave derivada da senha"""
+        nonce = secrets.token_bytes(TAMANHO_NONCE_ENVELOPE)
+        chave_envelopada = criar_aead(cabecalho['algoritmo'], chave_criptografia).encrypt(
+            nonce, bytes(chave_dados), self._dados_associados_envelope(cabecalho)
+        )
+        cabecalho['envelope'] = {'nonce': nonce.hex(), 'chave': chave_envelopada.hex()}
+    
+    def _abrir_envelope(self, cabecalho, chave_criptografia):
+        """Retorna a chave de dados do envelope do cabeçalho"""
+        envelope = cabecalho['envelope']
+        try:
+            chave_dados = criar_aead(cabecalho['algoritmo'], chave_criptografia).decrypt(
+                bytes.fromhex(envelope['nonce']), bytes.fromhex(envelope['chave']), self._dados_associados_envelope(cabecalho)
+            )
+        except Exception:
+            raise ValueError("Falha de autenticação da chave do arquivo (senha incorreta ou cabeçalho corrompido)")
+        if len(chave_dados) != TAMANHO_CHAVE_DADOS:
+            raise ValueError("Chave do arquivo inválida")
+        return chave_dados
+    
+    def reenvelopar(self, caminho_arquivo, obter_chave, chave_criptografia, sal_criptografico, parametros_kdf=None):
+        """Protege a chave de dados de um contêiner com outra chave derivada, sem descriptografar os segmentos:
+        se o novo cabeçalho cabe na vaga reservada, só ela é regravada no lugar (com fsync); senão o arquivo
+        inteiro é copiado com o novo cabeçalho (gravação atômica, custo de E/S proporcional ao tamanho)"""
+        with open(caminho_arquivo, 'rb') as arquivo_entrada:
+            estrutura = self.ler_estrutura_arquivo(arquivo_entrada)
+            cabecalho = estrutura['cabecalho']
+            if 'envelope' not in cabecalho:
+                raise ValueError("Contêiner sem envelope de chave")
+            chave_dados = self._abrir_envelope(cabecalho, obter_chave(bytes.fromhex(cabecalho['sal']), cabecalho.get('kdf')))
+            
+            cabecalho['sal'] = bytes(sal_criptografico).hex()
+            cabecalho.pop('kdf', None)
+            if parametros_kdf is not None:
+                cabecalho['kdf'] = dict(parametros_kdf)
+            self._envelopar_chave(cabecalho, chave_dados, chave_criptografia)
+            
+            inicio_segmentos = estrutura['inicio_segmentos']
+            cabecalho_serializado = self.serializar_cabecalho(cabecalho, inicio_segmentos)
+            informacoes = os.fstat(arquivo_entrada.fileno())
+            # Com outros nomes para o mesmo arquivo, a cópia separa este nome (os demais são trocados por conta própria)
+            if (len(cabecalho_serializado) == inicio_segmentos and informacoes.st_nlink == 1
+                    and os.access(caminho_arquivo, os.W_OK)):
+                with open(caminho_arquivo, 'r+b', buffering=0) as arquivo_saida:
+                    escrever_partes(arquivo_saida, [cabecalho_serializado])
+                    os.fsync(arquivo_saida.fileno())
+                self.instrumentacao.contar('cabecalhos_regravados_no_lugar')
+            else:
+                with gravacao_atomica(caminho_arquivo, buffering=0) as arquivo_saida:
+                    escrever_partes(arquivo_saida, [cabecalho_serializado])
+                    copiar_trecho(arquivo_entrada, arquivo_saida, inicio_segmentos, informacoes.st_size - inicio_segmentos)
+        return cabecalho
+
+    def _cifrar_segmento(self, cifra, nonce, dados, dados_associados, destino):
+        """Cifra um segmento direto no buffer de destino (quando informado e a biblioteca permite); retorna os dados cifrados"""
+        if destino is not None and hasattr(cifra, 'encrypt_into'):
+            destino = destino[:len(dados) + TAMANHO_TAG]
+            cifra.encrypt_into(nonce, dados, dados_associados, destino)
+            return destino
+        return cifra.encrypt(nonce, bytes(dados), dados_associados)
+    
+    def _comprimir_segmento(self, compressor, segmento, quantidade):
+        """Comprime um segmento lido após o byte reservado; mantém o original se a compressão não reduzir"""
+        with self.instrumentacao.medir(ETAPA_COMPRESSAO, quantidade):
+            dados_comprimidos = compressor.comprimir(segmento[1:1 + quantidade])
+        if len(dados_comprimidos) < quantidade:
+            return bytes([SEGMENTO_COMPRIMIDO]) + dados_comprimidos
+        segmento[0] = SEGMENTO_ORIGINAL
+        return segmento[:1 + quantidade]
+    
+    def _expandir_segmento(self, cabecalho, dados_abertos):
+        """Retorna os dados originais de um segmento aberto, descomprimindo-o se for o caso"""
+        compressao = cabecalho.get('compressao')
+        if compressao is None:
+            return dados_abertos
+        if not len(dados_abertos):
+            raise ValueError("Segmento sem marca de compressão")
+        if dados_abertos[0] == SEGMENTO_ORIGINAL:
+            return dados_abertos[1:]
+        if dados_abertos[0] == SEGMENTO_COMPRIMIDO:
+            with self.instrumentacao.medir(ETAPA_COMPRESSAO, len(dados_abertos)):
+                return descomprimir_segmento(compressao['algoritmo'], dados_abertos[1:], cabecalho['tamanho_segmento'])
+        raise ValueError("Marca de segmento inválida")
+    
+    def iniciar_cifragem(self, chave_criptografia, sal_criptografico, amostra):
+        """Prepara a cifragem segmento a segmento de um fluxo; a amostra (início dos dados) decide a compressão"""
+        cabecalho = self.criar_cabecalho(sal_criptografico)
+        if self.envelope:
+            # Cada arquivo com a sua chave de dados; a chave derivada da senha só a protege
+            chave_dados = secrets.token_bytes(TAMANHO_CHAVE_DADOS)
+            self._envelopar_chave(cabecalho, chave_dados, chave_criptografia)
+            chave_criptografia = chave_dados
+        
+        # Dados já comprimidos (amostra inicial de alta entropia) são gravados sem compressão
+        compressor = self.compressor
+        if compressor is not None:
+            if parece_comprimido(amostra):
+                compressor = None
+                self.instrumentacao.contar('arquivos_sem_compressao')
+            else:
+                cabecalho['compressao'] = compressor.descrever()
+        
+        return {
+            'cabecalho': cabecalho,
+            'cifra': criar_aead(cabecalho['algoritmo'], chave_criptografia),
+            'compressor': compressor,
+            'indice': bytearray(),
+            'deslocamento': 0,
+            'total_lido': 0,
+            'numero_segmento': 0,
+            # O cabeçalho sai junto com o primeiro segmento (um arquivo pequeno inteiro numa única gravação)
+            'pendentes': [self.serializar_cabecalho(cabecalho)]
+        }
+    
+    def cifrar_segmento(self, estado, numero_segmento, segmento, quantidade, ultimo_segmento, saida=None):
+        """Comprime (se for o caso) e cifra um segmento lido após o byte reservado; não altera o estado"""
+        dados_segmento = segmento[self.reserva_segmento:self.reserva_segmento + quantidade]
+        if estado['compressor'] is not None:
+            dados_segmento = self._comprimir_segmento(estado['compressor'], segmento, quantidade)
+        cabecalho = estado['cabecalho']
+        with self.instrumentacao.medir(ETAPA_CIFRA, quantidade):
+            return self._cifrar_segmento(
+                estado['cifra'],
+                self._nonce(cabecalho, numero_segmento),
+                dados_segmento,
+                self._dados_associados(cabecalho, numero_segmento, ultimo_segmento),
+                saida
+            )
+    
+    def partes_segmento(self, estado, dados_cifrados, quantidade, ultimo_segmento):
+        """Registra um segmento cifrado no índice (na ordem do arquivo); retorna as partes a gravar"""
+        partes = estado['pendentes'] + [struct.pack(FORMATO_TAMANHO_SEGMENTO, len(dados_cifrados)), dados_cifrados]
+        estado['pendentes'] = []
+        
+        estado['indice'] += struct.pack(FORMATO_ENTRADA_INDICE, estado['deslocamento'], len(dados_cifrados))
+        estado['deslocamento'] += struct.calcsize(FORMATO_TAMANHO_SEGMENTO) + len(dados_cifrados)
+        estado['total_lido'] += quantidade
+        estado['numero_segmento'] += 1
+        
+        if ultimo_segmento:
+            # Índice e rodapé permitem localizar qualquer segmento sem ler os anteriores
+            partes += [estado['indice'], struct.pack(
+                FORMATO_RODAPE, estado['deslocamento'], estado['numero_segmento'], estado['total_lido'], MAGIA_RODAPE
+            )]
+        return partes
+    
+    def criptografar_fluxo(self, leitor, escritor, chave_criptografia, sal_criptografico):
+        """Criptografa um fluxo no formato segmentado; retorna o tamanho original"""
+        reserva = self.reserva_segmento
+        saida = obter_buffer('segmento_cifrado', reserva + self.tamanho_segmento + TAMANHO_TAG)
+        
+        # Ler um segmento adiantado para saber qual é o último (dois buffers alternados)
+        nomes_buffers = ('segmento_a', 'segmento_b')
+        atual = 0
+        segmento_atual = obter_buffer(nomes_buffers[atual], reserva + self.tamanho_segmento)
+        quantidade_atual = ler_em(leitor, segmento_atual[reserva:])
+        estado = self.iniciar_cifragem(chave_criptografia, sal_criptografico, segmento_atual[reserva:reserva + quantidade_atual])
+        while True:
+            quantidade_proxima = 0
+            if quantidade_atual == self.tamanho_segmento:
+                proximo_segmento = obter_buffer(nomes_buffers[1 - atual], reserva + self.tamanho_segmento)
+                quantidade_proxima = ler_em(leitor, proximo_segmento[reserva:])
+            ultimo_segmento = quantidade_proxima == 0
+            
+            dados_cifrados = self.cifrar_segmento(
+                estado, estado['numero_segmento'], segmento_atual, quantidade_atual, ultimo_segmento, saida
+            )
+            escrever_partes(escritor, self.partes_segmento(estado, dados_cifrados, quantidade_atual, ultimo_segmento))
+            if ultimo_segmento:
+                break
+            atual = 1 - atual
+            segmento_atual = proximo_segmento
+            quantidade_atual = quantidade_proxima
+        
+        return estado['total_lido']
+    
+    def tamanho_cifrado(self, estado, tamanho_original):
+        """Tamanho final do contêiner (sem compressão), para pré-alocar a saída antes da cifra"""
+        numero_segmentos = max(1, -(-tamanho_original // self.tamanho_segmento))
+        bytes_por_segmento = struct.calcsize(FORMATO_TAMANHO_SEGMENTO) + TAMANHO_TAG + TAMANHO_ENTRADA_INDICE
+        return sum(len(parte) for parte in estado['pendentes']) + numero_segmentos * bytes_por_segmento + tamanho_original + TAMANHO_RODAPE
+    
+    def cifrar_mapeado(self, estado, entrada, saida, liberar=None):
+        """Cifra os dados de entrada (mapeados) direto na saída mapeada, pré-alocada com tamanho_cifrado;
+        liberar(posição na entrada, posição na saída) recebe o avanço a cada segmento. Retorna o tamanho original"""
+        if estado['compressor'] is not None:
+            raise ValueError("A E/S mapeada não suporta compressão")
+        bytes_tamanho = struct.calcsize(FORMATO_TAMANHO_SEGMENTO)
+        numero_segmentos = max(1, -(-len(entrada) // self.tamanho_segmento))
+        posicao = 0
+        for numero_segmento in range(numero_segmentos):
+            inicio = numero_segmento * self.tamanho_segmento
+            dados_segmento = entrada[inicio:inicio + self.tamanho_segmento]
+            ultimo_segmento = numero_segmento == numero_segmentos - 1
+            # Cifrado no lugar definitivo: depois do cabeçalho pendente e do tamanho do segmento
+            inicio_cifrado = posicao + sum(len(parte) for parte in estado['pendentes']) + bytes_tamanho
+            dados_cifrados = self.cifrar_segmento(
+                estado, numero_segmento, dados_segmento, len(dados_segmento), ultimo_segmento, saida[inicio_cifrado:]
+            )
+            for parte in self.partes_segmento(estado, dados_cifrados, len(dados_segmento), ultimo_segmento):
+                if parte is not dados_cifrados:
+                    saida[posicao:posicao + len(parte)] = parte
+                posicao += len(parte)
+            if liberar is not None:
+                liberar(inicio + len(dados_segmento), posicao)
+        if posicao != len(saida):
+            raise ValueError("Tamanho do contêiner diferente do pré-alocado")
+        return estado['total_lido']
+    
+    def descriptografar_fluxo(self, leitor, escritor, obter_chave):
+        """Descriptografa um contêiner sequencialmente; obter_chave(sal, parâmetros de derivação) fornece a chave"""
+        cabecalho, _ = self.ler_cabecalho(leitor)
+        cifra = self._criar_cifra(cabecalho, obter_chave(bytes.fromhex(cabecalho['sal']), cabecalho.get('kdf')))
+        
+        total_escrito = 0
+        numero_segmento = 0
+        bytes_tamanho = struct.calcsize(FORMATO_TAMANHO_SEGMENTO)
+        # Com compressão, cada segmento aberto tem um byte de marca a mais
+        tamanho_maximo = cabecalho['tamanho_segmento'] + TAMANHO_TAG + (1 if 'compressao' in cabecalho else 0)
+        while True:
+            prefixo_segmento = leitor.read(bytes_tamanho)
+            if len(prefixo_segmento) < bytes_tamanho:
+                raise ValueError("Contêiner truncado")
+            tamanho_armazenado, = struct.unpack(FORMATO_TAMANHO_SEGMENTO, prefixo_segmento)
+            if not TAMANHO_TAG <= tamanho_armazenado <= tamanho_maximo:
+                raise ValueError(f"Tamanho inválido no segmento {numero_segmento}")
+            
+            # Segmento lido e aberto em buffers reaproveitados
+            dados_cifrados = obter_buffer('segmento_cifrado', tamanho_armazenado)
+            if ler_em(leitor, dados_cifrados) < tamanho_armazenado:
+                raise ValueError("Contêiner truncado")
+            destino = obter_buffer('segmento_aberto', tamanho_armazenado - TAMANHO_TAG)
+            
+            # Sem o índice não se sabe qual é o último: a marca autenticada decide
+            ultimo_segmento = False
+            with self.instrumentacao.medir(ETAPA_CIFRA, tamanho_armazenado):
+                dados_originais = self._abrir_segmento(cifra, cabecalho, numero_segmento, dados_cifrados, False, destino)
+                if dados_originais is None:
+                    ultimo_segmento = True
+                    dados_originais = self._abrir_segmento(cifra, cabecalho, numero_segmento, dados_cifrados, True, destino)
+            if dados_originais is None:
+                raise ValueError(f"Falha de autenticação no segmento {numero_segmento} (senha incorreta ou arquivo corrompido)")
+            
+            total_escrito += escritor.write(self._expandir_segmento(cabecalho, dados_originais))
+            numero_segmento += 1
+            if ultimo_segmento:
+                return total_escrito
+    
+    def _abrir_segmento(self, cifra, cabecalho, numero_segmento, dados_cifrados, ultimo_segmento, destino=None):
+        """Descriptografa e autentica um segmento (no destino, se informado); retorna None se a tag não confere"""
+        nonce = self._nonce(cabecalho, numero_segmento)
+        dados_associados = self._dados_associados(cabecalho, numero_segmento, ultimo_segmento)
+        try:
+            if destino is not None and hasattr(cifra, 'decrypt_into'):
+                cifra.decrypt_into(nonce, dados_cifrados, dados_associados, destino)
+                return destino
+            return cifra.decrypt(nonce, bytes(dados_cifrados), dados_associados)
+        except Exception:
+            return None
+    
+    def ler_estrutura(self, dados_arquivo):
+        """Interpreta cabeçalho, rodapé e índice de um contêiner mapeado em memória"""
+        return self._ler_estrutura_de(lambda inicio, quantidade: bytes(dados_arquivo[inicio:inicio + quantidade]), len(dados_arquivo))
+    
+    def ler_estrutura_arquivo(self, arquivo):
+        """Interpreta cabeçalho, rodapé e índice lendo só esses trechos do arquivo aberto (tamanho pelo fstat)"""
+        def ler_trecho(inicio, quantidade):
+            arquivo.seek(inicio)
+            return arquivo.read(quantidade)
+        
+        return self._ler_estrutura_de(ler_trecho, os.fstat(arquivo.fileno()).st_size)
+    
+    def _ler_estrutura_de(self, ler_trecho, tamanho_arquivo):
+        """Interpreta a estrutura a partir de ler_trecho(início, quantidade) e do tamanho total do arquivo"""
+        deslocamento_cabecalho = [TAMANHO_PREFIXO]
+        
+        def ler(quantidade):
+            inicio = deslocamento_cabecalho[0]
+            deslocamento_cabecalho[0] += quantidade
+            return ler_trecho(inicio, quantidade)
+        
+        prefixo = ler_trecho(0, TAMANHO_PREFIXO)
+        if len(prefixo) < TAMANHO_PREFIXO:
+            raise ValueError("Cabeçalho do contêiner incompleto")
+        cabecalho, inicio_segmentos = self._interpretar_cabecalho(prefixo, ler)
+        if tamanho_arquivo < inicio_segmentos + TAMANHO_RODAPE:
+            raise ValueError("Contêiner truncado")
+        
+        deslocamento_indice, numero_segmentos, tamanho_original, magia_rodape = struct.unpack(
+            FORMATO_RODAPE, ler_trecho(tamanho_arquivo - TAMANHO_RODAPE, TAMANHO_RODAPE)
+        )
+        inicio_indice = inicio_segmentos + deslocamento_indice
+        if magia_rodape != MAGIA_RODAPE or inicio_indice + numero_segmentos * TAMANHO_ENTRADA_INDICE + TAMANHO_RODAPE != tamanho_arquivo:
+            raise ValueError("Índice do contêiner inválido")
+        
+        indice_serializado = ler_trecho(inicio_indice, numero_segmentos * TAMANHO_ENTRADA_INDICE)
+        if len(indice_serializado) != numero_segmentos * TAMANHO_ENTRADA_INDICE:
+            raise ValueError("Contêiner truncado")
+        indice = list(struct.iter_unpack(FORMATO_ENTRADA_INDICE, indice_serializado))
+        return {
+            'cabecalho': cabecalho,
+            'inicio_segmentos': inicio_segmentos,
+            'indice': indice,
+            'tamanho_original': tamanho_original
+        }
+    
+    def ler_intervalo(self, caminho_arquivo, inicio, tamanho, obter_chave):
+        """Descriptografa apenas os segmentos que cobrem o intervalo [inicio, inicio + tamanho)"""
+        with open(caminho_arquivo, 'rb') as arquivo:
+            dados_arquivo = self._mapear_arquivo(arquivo)
+            try:
+                return self._ler_intervalo_mapeado(dados_arquivo, inicio, tamanho, obter_chave)
+            finally:
+                if isinstance(dados_arquivo, mmap.mmap):
+                    dados_arquivo.close()
+    
+    def _mapear_arquivo(self, arquivo):
+        """Mapeia o arquivo em memória (somente leitura), com leitura comum como alternativa"""
+        try:
+            return mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Arquivos vazios ou sistemas sem suporte a mmap
+            return arquivo.read()
+    
+    def _ler_intervalo_mapeado(self, dados_arquivo, inicio, tamanho, obter_chave):
+        """Lê um intervalo a partir de um contêiner já mapeado em memória"""
+        if inicio < 0 or tamanho < 0:
+            raise ValueError("Intervalo inválido")
+        
+        estrutura = self.ler_estrutura(dados_arquivo)
+        cabecalho = estrutura['cabecalho']
+        indice = estrutura['indice']
+        fim = min(inicio + tamanho, estrutura['tamanho_original'])
+        if inicio >= fim:
+            return b''
+        
+        cifra = self._criar_cifra(cabecalho, obter_chave(bytes.fromhex(cabecalho['sal']), cabecalho.get('kdf')))
+        tamanho_segmento = cabecalho['tamanho_segmento']
+        primeiro_segmento = inicio // tamanho_segmento
+        ultimo_segmento_intervalo = (fim - 1) // tamanho_segmento
+        
+        # Os segmentos são abertos direto num único buffer de resultado
+        inicio_resultado = primeiro_segmento * tamanho_segmento
+        fim_resultado = min((ultimo_segmento_intervalo + 1) * tamanho_segmento, estrutura['tamanho_original'])
+        resultado = bytearray(fim_resultado - inicio_resultado)
+        with memoryview(resultado) as visao_resultado, memoryview(dados_arquivo) as visao_arquivo:
+            self._abrir_segmentos(cifra, estrutura, visao_arquivo, range(primeiro_segmento, ultimo_segmento_intervalo + 1), visao_resultado)
+            inicio_relativo = inicio - inicio_resultado
+            return bytes(visao_resultado[inicio_relativo:inicio_relativo + (fim - inicio)])
+    
+    def _abrir_segmentos(self, cifra, estrutura, visao_arquivo, segmentos, visao_resultado, liberar=None):
+        """Abre os segmentos (intervalo contíguo) direto no resultado, que começa no primeiro deles
+        (com compressão, via buffer intermediário); liberar(posição no arquivo, posição no resultado) recebe o avanço"""
+        cabecalho = estrutura['cabecalho']
+        indice = estrutura['indice']
+        tamanho_segmento = cabecalho['tamanho_segmento']
+        bytes_tamanho = struct.calcsize(FORMATO_TAMANHO_SEGMENTO)
+        comprimido = 'compressao' in cabecalho
+        for numero_segmento in segmentos:
+            deslocamento, tamanho_armazenado = indice[numero_segmento]
+            posicao_resultado = (numero_segmento - segmentos[0]) * tamanho_segmento
+            destino_final = visao_resultado[posicao_resultado:posicao_resultado + tamanho_segmento]
+            tamanho_aberto = tamanho_armazenado - TAMANHO_TAG
+            if tamanho_aberto < 0 or (not comprimido and tamanho_aberto != len(destino_final)):
+                raise ValueError("Índice do contêiner inválido")
+            posicao = estrutura['inicio_segmentos'] + deslocamento + bytes_tamanho
+            destino = obter_buffer('segmento_aberto', tamanho_aberto) if comprimido else destino_final
+            with self.instrumentacao.medir(ETAPA_CIFRA, tamanho_armazenado):
+                dados_abertos = self._abrir_segmento(
+                    cifra, cabecalho, numero_segmento, visao_arquivo[posicao:posicao + tamanho_armazenado],
+                    numero_segmento == len(indice) - 1, destino
+                )
+            if dados_abertos is None:
+                raise ValueError(f"Falha de autenticação no segmento {numero_segmento} (senha incorreta ou arquivo corrompido)")
+            dados_originais = self._expandir_segmento(cabecalho, dados_abertos)
+            if dados_originais is not destino_final:
+                if len(dados_originais) != len(destino_final):
+                    raise ValueError(f"Tamanho inválido no segmento {numero_segmento}")
+                destino_final[:] = dados_originais
+            if liberar is not None:
+                liberar(posicao + tamanho_armazenado, posicao_resultado + len(destino_final))
+        
+    def descriptografar_mapeado(self, dados_arquivo, estrutura, saida, obter_chave, liberar=None):
+        """Descriptografa um contêiner mapeado em memória direto na saída mapeada, pré-alocada com o
+        tamanho original da estrutura (já conferida por conferir_indice); retorna o tamanho original"""
+        if len(saida) != estrutura['tamanho_original']:
+            raise ValueError("Saída com tamanho diferente do tamanho original")
+        cabecalho = estrutura['cabecalho']
+        cifra = self._criar_cifra(cabecalho, obter_chave(bytes.fromhex(cabecalho['sal']), cabecalho.get('kdf')))
+        with memoryview(dados_arquivo) as visao_arquivo:
+            self._abrir_segmentos(cifra, estrutura, visao_arquivo, range(len(estrutura['indice'])), saida, liberar)
+        return estrutura['tamanho_original']
+    
+    def verificar_estrutura(self, caminho_arquivo):
+        """Verifica cabeçalho, índice e rodapé de um contêiner sem descriptografar (os segmentos não são lidos)"""
+        with open(caminho_arquivo, 'rb') as arquivo:
+            estrutura = self.ler_estrutura_arquivo(arquivo)
+        return self.conferir_indice(estrutura)
+        
+    def conferir_indice(self, estrutura):
+        """Confere se os segmentos do índice são contíguos e coerentes com o tamanho original"""
+        deslocamento_esperado = 0
+        for deslocamento, tamanho_armazenado in estrutura['indice']:
+            if deslocamento != deslocamento_esperado or tamanho_armazenado < TAMANHO_TAG:
+                raise ValueError("Índice do contêiner inválido")
+            deslocamento_esperado += struct.calcsize(FORMATO_TAMANHO_SEGMENTO) + tamanho_armazenado
+        
+        tamanho_segmento = estrutura['cabecalho']['tamanho_segmento']
+        segmentos_esperados = max(1, -(-estrutura['tamanho_original'] // tamanho_segmento))
+        if len(estrutura['indice']) != segmentos_esperados:
+            raise ValueError("Número de segmentos incompatível com o tamanho original")
+        return estrutura
+    
+    def autenticar(self, caminho_arquivo, obter_chave):
+        """Verifica a estrutura e autentica todos os segmentos (tags AEAD), descartando os dados abertos"""
+        estrutura = self.verificar_estrutura(caminho_arquivo)
+        with open(caminho_arquivo, 'rb') as arquivo, open(os.devnull, 'wb') as descarte:
+            total_aberto = self.descriptografar_fluxo(arquivo, descarte, obter_chave)
+        if total_aberto != estrutura['tamanho_original']:
+            raise ValueError("Tamanho original incompatível com os segmentos")
+        return estrutura
\ No newline at end of file
@@ -2,13 +2,69 @@
 # Parte 3: Criptografia AES dos arquivos  
 # Parte 5: Descriptografia dos arquivos
 
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+import os
 import secrets
+import threading
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from agendador_lote import ORCAMENTO_MEMORIA_LOTE, AgendadorLote
+from armazem_deduplicado import ArmazemDeduplicado
+from compressao import CompressorSegmentos
+from arquivo_mapeado import JANELA_LIBERACAO, LIMITE_ARQUIVO_MAPEADO, criar_liberador, gravacao_mapeada, mapear_leitura
+from conteiner_segmentado import ConteinerSegmentado, MAGIA_CONTEINER
+from fluxo_buffers import LeitorComPrefixo, escrever_partes, ler_em, obter_buffer
+from gerenciador_senhas import PARAMETROS_KDF_LEGADO, CacheChavesDerivadas
+from gravacao_atomica import gravacao_atomica
+from indice_sessoes import IndiceSessoes
+from instrumentacao import ETAPA_CIFRA, Instrumentacao, InstrumentacaoNula
+from pacote_criptografado import LIMITE_MEMBRO_PACOTE, MAGIA_PACOTE, TAMANHO_MAXIMO_PACOTE, PacoteCriptografado
+from primitivas import criar_cifra_aes_cbc
+from progresso_lote import ProgressoLote
+
+# Tamanho de cada leitura no modo em fluxo (memória constante por arquivo)
+TAMANHO_BLOCO_FLUXO = 1024 * 1024
+TAMANHO_SAL = 32
+TAMANHO_VETOR_INICIALIZACAO = 16
+TAMANHO_BLOCO_AES = 16
+
+# Processamento paralelo: arquivos a partir deste tamanho vão para processos no modo 'auto'
+LIMITE_ARQUIVO_GRANDE = 64 * 1024 * 1024
+# 'assincrono': pipeline asyncio com leitura, cifra e escrita sobrepostas (formato contêiner)
+MODO_ASSINCRONO = 'assincrono'
+MODOS_PARALELOS = ('threads', 'processos', 'auto', MODO_ASSINCRONO)
+# Blocos em memória por arquivo no caminho em fluxo (leitura, segmento cifrado e compressão)
+BLOCOS_EM_MEMORIA_FLUXO = 3
+
+# Formatos de arquivo .enc: legado (sal + IV + CBC) e contêiner segmentado autenticado (AEAD)
+FORMATO_LEGADO = 'legado'
+FORMATO_CONTEINER = 'conteiner'
+FORMATOS_ARQUIVO = (FORMATO_LEGADO, FORMATO_CONTEINER)
+FORMATO_PADRAO = FORMATO_CONTEINER
+
+# Troca de chave: só o envelope do cabeçalho (contêiner com envelope) ou os dados cifrados de novo
+RECHAVE_ENVELOPE = 'envelope'
+RECHAVE_RECIFRADO = 'recifrado'
 
 class MotorCriptografia:
-    def __init__(self):
-        self.backend_criptografia = default_backend()
+    def __init__(self, algoritmo_aead=None, instrumentacao=None, silencioso=False, limite_mapeamento=LIMITE_ARQUIVO_MAPEADO):
+        # Algoritmo AEAD do contêiner (None: AES-GCM com AES-NI, senão ChaCha20-Poly1305)
+        self.algoritmo_aead = algoritmo_aead
+        self.instrumentacao = instrumentacao or InstrumentacaoNula()
+        # Modo silencioso: sem progresso nem mensagens por arquivo (os erros viram eventos)
+        self.silencioso = silencioso
+        # Contêineres a partir deste tamanho usam E/S mapeada em memória (None: nunca)
+        self.limite_mapeamento = limite_mapeamento
+    
+    def _exibir(self, mensagem):
+        """Exibe uma mensagem, exceto no modo silencioso"""
+        if not self.silencioso:
+            print(mensagem)
+    
+    def _relatar_erro(self, arquivo, mensagem):
+        """Registra o erro de um arquivo como evento e o exibe fora do modo silencioso"""
+        self.instrumentacao.contar('erros')
+        self.instrumentacao.evento('erro', arquivo=arquivo, mensagem=mensagem)
+        self._exibir(mensagem)
     
     def gerar_sal_criptografico(self):
         """Gera um sal criptográfico aleatório de 32 bytes"""
@@ -37,21 +93,28 @@ class MotorCriptografia:
             vetor_inicializacao = self.gerar_vetor_inicializacao()
             
             # Criar cifrador AES em modo CBC
-            cifrador = Cipher(
-                algorithms.AES(chave_criptografia),
-                modes.CBC(vetor_inicializacao),
-                backend=self.backend_criptografia
-            )
+            cifrador = criar_cifra_aes_cbc(chave_criptografia, vetor_inicializacao)
             criptografador = cifrador.encryptor()
             
-            # Aplicar preenchimento PKCS7 (necessário para CBC)
-            dados_com_preenchimento = self.aplicar_preenchimento_pkcs7(dados_arquivo)
+            # Saída pré-alocada: vetor de inicialização + dados com preenchimento PKCS7 (necessário para CBC)
+            dados_arquivo = memoryview(dados_arquivo)
+            tamanho_preenchimento = TAMANHO_BLOCO_AES - (len(dados_arquivo) % TAMANHO_BLOCO_AES)
+            resultado = bytearray(TAMANHO_VETOR_INICIALIZACAO + len(dados_arquivo) + tamanho_preenchimento + TAMANHO_BLOCO_AES - 1)
+            resultado[:TAMANHO_VETOR_INICIALIZACAO] = vetor_inicializacao
+            destino = memoryview(resultado)
             
-            # Criptografar
-            dados_criptografados = criptografador.update(dados_com_preenchimento) + criptografador.finalize()
+            # Criptografar no próprio buffer de saída; só o último bloco (com preenchimento) é montado à parte
+            tamanho_completo = len(dados_arquivo) - (len(dados_arquivo) % TAMANHO_BLOCO_AES)
+            escritos = TAMANHO_VETOR_INICIALIZACAO
+            escritos += criptografador.update_into(dados_arquivo[:tamanho_completo], destino[escritos:])
+            ultimo_bloco = bytes(dados_arquivo[tamanho_completo:]) + bytes([tamanho_preenchimento] * tamanho_preenchimento)
+            escritos += criptografador.update_into(ultimo_bloco, destino[escritos:])
+            criptografador.finalize()
+            destino.release()
             
             # Retornar vetor de inicialização + dados criptografados
-            return vetor_inicializacao + dados_criptografados
+            del resultado[escritos:]
+            return resultado
             
         except Exception as erro:
             print(f"Erro durante criptografia: {str(erro)}")
@@ -64,8 +127,9 @@ class MotorCriptografia:
             if len(dados_criptografados) < 16:
                 raise ValueError("Dados insuficientes para descriptografia")
             
-            # Extrair vetor de inicialização (primeiros 16 bytes)
-            vetor_inicializacao = dados_criptografados[:16]
+            # Extrair vetor de inicialização (primeiros 16 bytes) sem copiar os dados
+            dados_criptografados = memoryview(dados_criptografados)
+            vetor_inicializacao = bytes(dados_criptografados[:16])
             dados_cifrados = dados_criptografados[16:]
             
             # Verificar se há dados para descriptografar
@@ -73,18 +137,18 @@ class MotorCriptografia:
                 raise ValueError("Nenhum dado para descriptografar")
             
             # Criar cifrador para descriptografia
-            cifrador = Cipher(
-                algorithms.AES(chave_criptografia),
-                modes.CBC(vetor_inicializacao),
-                backend=self.backend_criptografia
-            )
+            cifrador = criar_cifra_aes_cbc(chave_criptografia, vetor_inicializacao)
             descriptografador = cifrador.decryptor()
             
-            # Descriptografar
-            dados_com_preenchimento = descriptografador.update(dados_cifrados) + descriptografador.finalize()
+            # Descriptografar direto num buffer pré-alocado
+            dados_originais = bytearray(len(dados_cifrados) + TAMANHO_BLOCO_AES - 1)
+            with memoryview(dados_originais) as destino:
+                escritos = descriptografador.update_into(dados_cifrados, destino)
+            descriptografador.finalize()
             
-            # Remover preenchimento PKCS7
-            dados_originais = self.remover_preenchimento_pkcs7(dados_com_preenchimento)
+            # Remover preenchimento PKCS7 (truncando o próprio buffer)
+            tamanho_preenchimento = dados_originais[escritos - 1] if escritos else 0
+            del dados_originais[escritos - tamanho_preenchimento:]
             
             return dados_originais
             
@@ -92,107 +156,794 @@ class MotorCriptografia:
             print(f"Erro durante descriptografia: {str(erro)}")
             return None
     
-    def processar_criptografia_em_lote(self, lista_arquivos, chave_criptografia, gerenciador_arquivos):
-        """Processa criptografia de múltiplos arquivos"""
-        sucessos = 0
-        erros = 0
-        sal_usado = self.gerar_sal_criptografico()
+    def criptografar_fluxo(self, leitor, escritor, chave_criptografia, tamanho_bloco=TAMANHO_BLOCO_FLUXO, prefixo=b''):
+        """Criptografa um fluxo em blocos, gravando prefixo + vetor de inicialização + dados AES-CBC"""
+        vetor_inicializacao = self.gerar_vetor_inicializacao()
+        cifrador = criar_cifra_aes_cbc(chave_criptografia, vetor_inicializacao)
+        criptografador = cifrador.encryptor()
         
-        print(f"\nCriptografando {len(lista_arquivos)} arquivos...")
+        # Buffers reaproveitados: a entrada tem espaço para o preenchimento, a saída para o bloco retido pelo CBC
+        entrada = obter_buffer('entrada', tamanho_bloco + TAMANHO_BLOCO_AES)
+        saida = obter_buffer('saida', tamanho_bloco + 2 * TAMANHO_BLOCO_AES)
+        # O cabeçalho sai junto com o primeiro bloco de dados
+        pendentes = [prefixo, vetor_inicializacao]
+        total_lido = 0
         
-        for arquivo in lista_arquivos:
-            print(f"Processando: {arquivo.name}")
+        # O modo CBC guarda internamente o bloco incompleto entre as chamadas de update_into()
+        while True:
+            quantidade = ler_em(leitor, entrada[:tamanho_bloco])
+            total_lido += quantidade
+            fim_do_fluxo = quantidade < tamanho_bloco
+            if fim_do_fluxo:
+                # Preenchimento PKCS7 aplicado somente ao final do fluxo
+                tamanho_preenchimento = TAMANHO_BLOCO_AES - (total_lido % TAMANHO_BLOCO_AES)
+                entrada[quantidade:quantidade + tamanho_preenchimento] = bytes([tamanho_preenchimento] * tamanho_preenchimento)
+                quantidade += tamanho_preenchimento
             
-            # Ler arquivo
-            dados_arquivo = gerenciador_arquivos.ler_conteudo_arquivo(arquivo)
-            if dados_arquivo is None:
-                erros += 1
-                continue
+            with self.instrumentacao.medir(ETAPA_CIFRA, quantidade):
+                tamanho_cifrado = criptografador.update_into(entrada[:quantidade], saida)
+            escrever_partes(escritor, pendentes + [saida[:tamanho_cifrado]])
+            pendentes = []
+            if fim_do_fluxo:
+                break
+        
+        criptografador.finalize()
+        return total_lido
+    
+    def descriptografar_fluxo(self, leitor, escritor, chave_criptografia, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
+        """Descriptografa um fluxo (vetor de inicialização + dados AES-CBC) em blocos"""
+        vetor_inicializacao = leitor.read(TAMANHO_VETOR_INICIALIZACAO)
+        if len(vetor_inicializacao) < TAMANHO_VETOR_INICIALIZACAO:
+            raise ValueError("Dados insuficientes para descriptografia")
+        
+        cifrador = criar_cifra_aes_cbc(chave_criptografia, vetor_inicializacao)
+        descriptografador = cifrador.decryptor()
+        
+        # O último bloco é retido no início do buffer de saída até o fim, para remover o preenchimento
+        entrada = obter_buffer('entrada', tamanho_bloco)
+        saida = obter_buffer('saida', tamanho_bloco + 2 * TAMANHO_BLOCO_AES)
+        tamanho_retido = 0
+        total_escrito = 0
+        while True:
+            quantidade = ler_em(leitor, entrada)
+            if not quantidade:
+                break
+            with self.instrumentacao.medir(ETAPA_CIFRA, quantidade):
+                disponivel = tamanho_retido + descriptografador.update_into(entrada[:quantidade], saida[tamanho_retido:])
+            if disponivel > TAMANHO_BLOCO_AES:
+                total_escrito += escritor.write(saida[:disponivel - TAMANHO_BLOCO_AES])
+                saida[:TAMANHO_BLOCO_AES] = saida[disponivel - TAMANHO_BLOCO_AES:disponivel]
+                disponivel = TAMANHO_BLOCO_AES
+            tamanho_retido = disponivel
+            if quantidade < tamanho_bloco:
+                break
+        
+        bloco_retido = bytes(saida[:tamanho_retido]) + descriptografador.finalize()
+        if len(bloco_retido) != TAMANHO_BLOCO_AES:
+            raise ValueError("Nenhum dado para descriptografar")
+        
+        tamanho_preenchimento = bloco_retido[-1]
+        preenchimento_esperado = bytes([tamanho_preenchimento] * tamanho_preenchimento)
+        if not 1 <= tamanho_preenchimento <= TAMANHO_BLOCO_AES or not bloco_retido.endswith(preenchimento_esperado):
+            raise ValueError("Preenchimento inválido (senha incorreta ou arquivo corrompido)")
+        
+        total_escrito += escritor.write(bloco_retido[:-tamanho_preenchimento])
+        return total_escrito
+    
+    def criptografar_arquivo_em_fluxo(self, caminho_origem, caminho_destino, chave_criptografia, sal_criptografico,
+                                      tamanho_bloco=TAMANHO_BLOCO_FLUXO, formato=FORMATO_PADRAO, compressor=None, parametros_kdf=None):
+        """Criptografa um arquivo em blocos no formato .enc escolhido (compressor e parametros_kdf: só no formato contêiner)"""
+        try:
+            # Arquivos grandes sem compressão: o tamanho final é conhecido e a saída pode ser pré-alocada e mapeada
+            if formato == FORMATO_CONTEINER and compressor is None and self._usar_mapeamento(os.stat(caminho_origem).st_size):
+                self._criptografar_conteiner_mapeado(caminho_origem, caminho_destino, chave_criptografia, sal_criptografico,
+                                                     tamanho_bloco, parametros_kdf)
+                return True
+            
+            # Saída sem buffer: cabeçalho e dados de cada bloco saem numa única chamada writev
+            # (gravada com nome temporário: uma interrupção nunca deixa um .enc truncado)
+            with open(caminho_origem, 'rb') as arquivo_entrada, gravacao_atomica(caminho_destino, buffering=0) as arquivo_saida:
+                self.criptografar_entre_fluxos(
+                    self.instrumentacao.medir_leitor(arquivo_entrada), self.instrumentacao.medir_escritor(arquivo_saida),
+                    chave_criptografia, sal_criptografico, tamanho_bloco, formato, compressor, parametros_kdf
+                )
+            return True
+            
+        except Exception as erro:
+            self._relatar_erro(caminho_origem, f"Erro durante criptografia de {caminho_origem.name}: {str(erro)}")
+            return False
+    
+    def criptografar_entre_fluxos(self, leitor, escritor, chave_criptografia, sal_criptografico,
+                                  tamanho_bloco=TAMANHO_BLOCO_FLUXO, formato=FORMATO_PADRAO, compressor=None, parametros_kdf=None):
+        """Criptografa um fluxo binário qualquer (arquivo, pipe, stdin, socket) para outro em memória constante,
+        sem seek; retorna o tamanho original"""
+        if formato == FORMATO_CONTEINER:
+            conteiner = ConteinerSegmentado(tamanho_bloco, self.algoritmo_aead, self.instrumentacao, compressor, parametros_kdf)
+            return conteiner.criptografar_fluxo(leitor, escritor, chave_criptografia, sal_criptografico)
+        if formato == FORMATO_LEGADO:
+            if compressor is not None:
+                raise ValueError("A compressão exige o formato contêiner")
+            if parametros_kdf is not None and parametros_kdf != PARAMETROS_KDF_LEGADO:
+                raise ValueError("O formato legado só grava chaves derivadas com o PBKDF2 padrão")
+            # Formato legado: sal + vetor de inicialização + dados
+            return self.criptografar_fluxo(leitor, escritor, chave_criptografia, tamanho_bloco, prefixo=bytes(sal_criptografico))
+        raise ValueError(f"Formato de arquivo inválido: {formato}")
+    
+    def descriptografar_entre_fluxos(self, leitor, escritor, obter_chave, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
+        """Descriptografa um .enc lido em sequência de um fluxo qualquer (contêiner ou legado), sem seek;
+        retorna os bytes gravados. Numa falha de autenticação, o que já foi gravado deve ser descartado"""
+        # A assinatura é lida e devolvida ao fluxo: pipes não voltam atrás
+        prefixo = bytearray(len(MAGIA_CONTEINER))
+        del prefixo[ler_em(leitor, memoryview(prefixo)):]
+        if ArmazemDeduplicado.e_receita(prefixo):
+            raise ValueError("Arquivos deduplicados dependem dos blocos do backup: descriptografe a pasta")
+        if prefixo == MAGIA_PACOTE:
+            raise ValueError("Pacotes exigem acesso aleatório: use list e extract")
+        leitor = LeitorComPrefixo(prefixo, leitor)
+        
+        if ConteinerSegmentado.e_conteiner(prefixo):
+            return ConteinerSegmentado(instrumentacao=self.instrumentacao).descriptografar_fluxo(leitor, escritor, obter_chave)
+        sal_criptografico = leitor.read(TAMANHO_SAL)
+        if len(sal_criptografico) < TAMANHO_SAL:
+            raise ValueError("Fluxo corrompido ou muito pequeno")
+        return self.descriptografar_fluxo(leitor, escritor, obter_chave(sal_criptografico), tamanho_bloco)
+    
+    def estimar_memoria(self, tamanho_arquivo, tamanho_bloco=TAMANHO_BLOCO_FLUXO, formato=FORMATO_PADRAO, compressor=None):
+        """Memória estimada para criptografar um arquivo: alguns blocos no caminho em fluxo ou, na E/S mapeada,
+        a janela ainda não liberada e o segmento em andamento na entrada e na saída, nunca mais que o próprio arquivo"""
+        if formato == FORMATO_CONTEINER and compressor is None and self._usar_mapeamento(tamanho_arquivo):
+            return min(tamanho_arquivo, 2 * (JANELA_LIBERACAO + tamanho_bloco))
+        return min(tamanho_arquivo, BLOCOS_EM_MEMORIA_FLUXO * tamanho_bloco)
+    
+    def _usar_mapeamento(self, tamanho_arquivo):
+        """Indica se um arquivo deste tamanho usa E/S mapeada em memória"""
+        return self.limite_mapeamento is not None and tamanho_arquivo >= max(1, self.limite_mapeamento)
+    
+    def _criptografar_conteiner_mapeado(self, caminho_origem, caminho_destino, chave_criptografia, sal_criptografico,
+                                        tamanho_bloco, parametros_kdf):
+        """Criptografa um arquivo grande entre mapeamentos: entrada só leitura e saída pré-alocada"""
+        conteiner = ConteinerSegmentado(tamanho_bloco, self.algoritmo_aead, self.instrumentacao, None, parametros_kdf)
+        with mapear_leitura(caminho_origem) as mapa_entrada, memoryview(mapa_entrada) as entrada:
+            estado = conteiner.iniciar_cifragem(chave_criptografia, sal_criptografico, entrada[:0])
+            with gravacao_mapeada(caminho_destino, conteiner.tamanho_cifrado(estado, len(entrada))) as mapa_saida, \
+                    memoryview(mapa_saida) as saida:
+                conteiner.cifrar_mapeado(estado, entrada, saida, criar_liberador(mapa_entrada, mapa_saida))
+        self.instrumentacao.contar('arquivos_mapeados')
+    
+    def _descriptografar_conteiner_mapeado(self, caminho_origem, caminho_destino, obter_chave):
+        """Descriptografa um contêiner grande entre mapeamentos: a saída é pré-alocada com o tamanho original do rodapé"""
+        conteiner = ConteinerSegmentado(instrumentacao=self.instrumentacao)
+        with mapear_leitura(caminho_origem) as mapa_entrada:
+            estrutura = conteiner.conferir_indice(conteiner.ler_estrutura(mapa_entrada))
+            if not estrutura['tamanho_original']:
+                raise ValueError("Contêiner vazio não usa E/S mapeada")
+            with gravacao_mapeada(caminho_destino, estrutura['tamanho_original']) as mapa_saida, memoryview(mapa_saida) as saida:
+                conteiner.descriptografar_mapeado(mapa_entrada, estrutura, saida, obter_chave, criar_liberador(mapa_entrada, mapa_saida))
+        self.instrumentacao.contar('arquivos_mapeados')
+    
+    def criptografar_arquivo_deduplicado(self, caminho_origem, caminho_destino, chave_criptografia, sal_criptografico,
+                                         armazem, conteiner_blocos, parametros_kdf=None):
+        """Grava no armazém só os blocos ainda não conhecidos e a receita do arquivo no destino"""
+        try:
+            armazem.gravar_arquivo(caminho_origem, caminho_destino, conteiner_blocos, chave_criptografia, sal_criptografico, parametros_kdf)
+            return True
+        
+        except Exception as erro:
+            self._relatar_erro(caminho_origem, f"Erro durante criptografia de {caminho_origem.name}: {str(erro)}")
+            return False
+    
+    def descriptografar_arquivo_em_fluxo(self, caminho_origem, caminho_destino, obter_chave, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
+        """Descriptografa um arquivo .enc em blocos; obter_chave(sal, parâmetros de derivação) fornece a chave do arquivo"""
+        try:
+            with open(caminho_origem, 'rb') as arquivo_entrada:
+                # Verificar se há dados suficientes (sal + vetor de inicialização mínimo)
+                if os.fstat(arquivo_entrada.fileno()).st_size < TAMANHO_SAL + TAMANHO_VETOR_INICIALIZACAO:
+                    self._relatar_erro(caminho_origem, f"Arquivo {caminho_origem.name} corrompido ou muito pequeno")
+                    return False
+                entrada = self.instrumentacao.medir_leitor(arquivo_entrada)
+                
+                # Contêiner segmentado: identificado pela assinatura no início do arquivo
+                prefixo = entrada.read(len(MAGIA_CONTEINER))
+                if ConteinerSegmentado.e_conteiner(prefixo) and self._usar_mapeamento(os.fstat(arquivo_entrada.fileno()).st_size):
+                    self._descriptografar_conteiner_mapeado(caminho_origem, caminho_destino, obter_chave)
+                    return True
+                if ConteinerSegmentado.e_conteiner(prefixo):
+                    entrada.seek(0)
+                    with gravacao_atomica(caminho_destino) as arquivo_saida:
+                        ConteinerSegmentado(instrumentacao=self.instrumentacao).descriptografar_fluxo(
+                            entrada, self.instrumentacao.medir_escritor(arquivo_saida), obter_chave
+                        )
+                    return True
+                # Receita de arquivo deduplicado: o conteúdo está nos blocos do armazém do backup
+                if ArmazemDeduplicado.e_receita(prefixo):
+                    with gravacao_atomica(caminho_destino) as arquivo_saida:
+                        ArmazemDeduplicado.localizar(caminho_origem).restaurar(
+                            caminho_origem, self.instrumentacao.medir_escritor(arquivo_saida), obter_chave,
+                            ConteinerSegmentado(instrumentacao=self.instrumentacao)
+                        )
+                    return True
+                entrada.seek(0)
+                
+                sal_criptografico = entrada.read(TAMANHO_SAL)
+                chave_derivada = obter_chave(sal_criptografico)
+                
+                with gravacao_atomica(caminho_destino) as arquivo_saida:
+                    self.descriptografar_fluxo(entrada, self.instrumentacao.medir_escritor(arquivo_saida), chave_derivada, tamanho_bloco)
+            return True
             
-            # Criptografar arquivo
-            dados_criptografados = self.criptografar_arquivo(dados_arquivo, chave_criptografia)
+        except Exception as erro:
+            self._relatar_erro(caminho_origem, f"Erro durante descriptografia de {caminho_origem.name}: {str(erro)}")
+            return False
+    
+    def _registrar_arquivo(self, arquivo, sucesso):
+        """Contabiliza um arquivo processado e emite o evento correspondente"""
+        self.instrumentacao.contar('arquivos_processados' if sucesso else 'arquivos_com_erro')
+        self.instrumentacao.evento('arquivo', arquivo=arquivo, sucesso=sucesso)
+    
+    def descriptografar_intervalo(self, caminho_arquivo, inicio, tamanho, obter_chave):
+        """Descriptografa somente o intervalo de bytes pedido de um contêiner segmentado"""
+        return ConteinerSegmentado().ler_intervalo(caminho_arquivo, inicio, tamanho, obter_chave)
+    
+    def _registrar_concluido(self, arquivo, arquivo_backup, gerenciador_arquivos, manifesto, diario):
+        """Registra um arquivo criptografado com sucesso no manifesto e no diário de retomada"""
+        if manifesto is not None:
+            manifesto.registrar(arquivo, gerenciador_arquivos.pasta_origem, arquivo_backup)
+        if diario is not None:
+            diario.registrar(arquivo, gerenciador_arquivos.pasta_origem, arquivo_backup)
+    
+    def processar_criptografia_em_lote(self, lista_arquivos, chave_criptografia, gerenciador_arquivos, sal_criptografico=None,
+                                       numero_trabalhadores=1, modo_paralelo='auto', tamanho_bloco=TAMANHO_BLOCO_FLUXO,
+                                       formato=FORMATO_PADRAO, manifesto=None, empacotar=False, compressor=None, diario=None,
+                                       parametros_kdf=None, armazem=None, orcamento_memoria=ORCAMENTO_MEMORIA_LOTE):
+        """Processa criptografia de múltiplos arquivos, do maior para o menor (empacotar: arquivos pequenos vão para
+        pacotes; armazem: arquivos deduplicados em blocos, sempre em sequência; orcamento_memoria: limite da
+        memória estimada das tarefas em andamento)"""
+        sucessos = 0
+        erros = 0
+        # O sal gravado nos arquivos deve ser o mesmo usado para derivar a chave
+        sal_usado = sal_criptografico if sal_criptografico is not None else self.gerar_sal_criptografico()
+        
+        # A lista pode ser um iterador sob demanda, sem tamanho conhecido
+        total_arquivos = len(lista_arquivos) if hasattr(lista_arquivos, '__len__') else None
+        self._exibir("\nCriptografando arquivos..." if total_arquivos is None else f"\nCriptografando {total_arquivos} arquivos...")
+        progresso = ProgressoLote("Criptografados", total_arquivos, silencioso=self.silencioso)
+        
+        resultado_pacotes = {'sucessos': 0, 'erros': 0, 'pacotes': []}
+        if empacotar:
+            # Arquivos pequenos são gravados em pacotes; os demais seguem para o lote comum
+            lista_arquivos = self._empacotar_arquivos_pequenos(
+                lista_arquivos, chave_criptografia, sal_usado, gerenciador_arquivos, resultado_pacotes, progresso,
+                parametros_kdf=parametros_kdf
+            )
+        
+        conteiner_blocos = None
+        if armazem is not None:
+            # Os blocos usam a chave do armazém, que pode ser de uma sessão anterior
+            conteiner_blocos = ConteinerSegmentado(tamanho_bloco, self.algoritmo_aead, self.instrumentacao, compressor,
+                                                   armazem.obter_parametros_kdf())
+        
+        try:
+            # Tamanhos lidos antes de começar: ordem pelo tamanho, orçamento de memória e tempo restante
+            agenda = AgendadorLote(lista_arquivos, orcamento_memoria)
+            if progresso.total is None:
+                progresso.total = progresso.processados + len(agenda)
+            progresso.definir_total_bytes(agenda.total_bytes)
             
-            if dados_criptografados:
-                # Salvar na pasta de backup
-                if gerenciador_arquivos.salvar_arquivo_criptografado(arquivo, dados_criptografados, sal_usado):
+            # Com o armazém, cada arquivo consulta os blocos gravados pelos anteriores: processamento sequencial
+            if armazem is None and modo_paralelo == MODO_ASSINCRONO:
+                sucessos, erros = self._processar_criptografia_assincrona(
+                    agenda, chave_criptografia, gerenciador_arquivos, sal_usado,
+                    numero_trabalhadores, tamanho_bloco, formato, manifesto, progresso, compressor, diario, parametros_kdf
+                )
+            elif armazem is None and numero_trabalhadores > 1:
+                sucessos, erros = self._processar_criptografia_em_paralelo(
+                    agenda, chave_criptografia, gerenciador_arquivos, sal_usado,
+                    numero_trabalhadores, modo_paralelo, tamanho_bloco, formato, manifesto, progresso, compressor, diario,
+                    parametros_kdf
+                )
+            else:
+                for arquivo in agenda:
+                    # Criptografar em fluxo direto para a pasta de backup
+                    arquivo_backup = gerenciador_arquivos.obter_caminho_criptografado(arquivo)
+                    if armazem is not None:
+                        sucesso = self.criptografar_arquivo_deduplicado(
+                            arquivo, arquivo_backup, chave_criptografia, sal_usado, armazem, conteiner_blocos, parametros_kdf
+                        )
+                    else:
+                        sucesso = self.criptografar_arquivo_em_fluxo(
+                            arquivo, arquivo_backup, chave_criptografia, sal_usado, tamanho_bloco, formato, compressor, parametros_kdf
+                        )
+                    if sucesso:
+                        self._registrar_concluido(arquivo, arquivo_backup, gerenciador_arquivos, manifesto, diario)
+                        sucessos += 1
+                    else:
+                        erros += 1
+                    self._registrar_arquivo(arquivo, sucesso)
+                    progresso.registrar(sucesso, agenda.tamanho(arquivo))
+        finally:
+            if empacotar:
+                # Fecha o pacote em aberto mesmo se o lote for interrompido
+                lista_arquivos.close()
+        
+        progresso.finalizar()
+        if armazem is not None:
+            estatisticas = armazem.estatisticas
+            self._exibir(
+                f"Deduplicação: {estatisticas['blocos_novos']} blocos novos | {estatisticas['blocos_reaproveitados']} reaproveitados | "
+                f"{estatisticas['bytes_novos'] / (1024 * 1024):.1f} MB únicos de "
+                f"{(estatisticas['bytes_novos'] + estatisticas['bytes_reaproveitados']) / (1024 * 1024):.1f} MB"
+            )
+        return sucessos + resultado_pacotes['sucessos'], erros + resultado_pacotes['erros'], sal_usado
+    
+    def _empacotar_arquivos_pequenos(self, lista_arquivos, chave_criptografia, sal_criptografico, gerenciador_arquivos,
+                                     resultado_pacotes, progresso, limite_membro=LIMITE_MEMBRO_PACOTE,
+                                     tamanho_maximo_pacote=TAMANHO_MAXIMO_PACOTE, parametros_kdf=None):
+        """Grava os arquivos pequenos em pacotes e gera, sob demanda, os demais arquivos"""
+        pacote = None
+        try:
+            for arquivo in lista_arquivos:
+                try:
+                    arquivo_pequeno = arquivo.stat().st_size <= limite_membro
+                except OSError:
+                    # O erro é relatado pelo lote comum
+                    arquivo_pequeno = False
+                if not arquivo_pequeno:
+                    yield arquivo
+                    continue
+                
+                if pacote is None:
+                    numero_pacote = len(resultado_pacotes['pacotes']) + 1
+                    pacote = PacoteCriptografado(
+                        gerenciador_arquivos.obter_caminho_pacote(numero_pacote), self.algoritmo_aead, parametros_kdf
+                    )
+                    pacote.criar(chave_criptografia, sal_criptografico)
+                    resultado_pacotes['pacotes'].append(pacote.caminho_pacote)
+                
+                sucesso = False
+                try:
+                    pacote.adicionar(arquivo, Path(arquivo).relative_to(gerenciador_arquivos.pasta_origem).as_posix())
+                    sucesso = True
+                except (OSError, ValueError) as erro:
+                    self._relatar_erro(arquivo, f"Erro ao empacotar {arquivo.name}: {str(erro)}")
+                resultado_pacotes['sucessos' if sucesso else 'erros'] += 1
+                self._registrar_arquivo(arquivo, sucesso)
+                progresso.registrar(sucesso)
+                
+                # Pacote cheio: fechar e começar outro no próximo arquivo pequeno
+                if pacote.tamanho_atual >= tamanho_maximo_pacote:
+                    pacote.finalizar()
+                    pacote = None
+        finally:
+            if pacote is not None:
+                pacote.finalizar()
+    
+    def _processar_criptografia_em_paralelo(self, agenda, chave_criptografia, gerenciador_arquivos, sal_usado,
+                                            numero_trabalhadores, modo_paralelo, tamanho_bloco, formato, manifesto, progresso,
+                                            compressor=None, diario=None, parametros_kdf=None):
+        """Criptografa os arquivos da agenda em paralelo, com um número limitado de tarefas em andamento
+        e a memória estimada delas dentro do orçamento"""
+        if modo_paralelo not in MODOS_PARALELOS:
+            raise ValueError(f"Modo paralelo inválido: {modo_paralelo}")
+        
+        sucessos = 0
+        erros = 0
+        # Cada tarefa em fluxo ocupa poucos blocos em memória: limitar as tarefas limita a memória
+        limite_em_andamento = numero_trabalhadores * 2
+        chave_compartilhada = bytes(chave_criptografia)
+        executores = {}
+        em_andamento = {}
+        
+        def obter_executor(tamanho_arquivo):
+            """Escolhe threads (arquivos pequenos, E/S) ou processos (arquivos grandes, CPU)"""
+            tipo_executor = modo_paralelo
+            if modo_paralelo == 'auto':
+                tipo_executor = 'processos' if tamanho_arquivo >= LIMITE_ARQUIVO_GRANDE else 'threads'
+            if tipo_executor not in executores:
+                classe_executor = ThreadPoolExecutor
+                if tipo_executor == 'processos':
+                    # multiprocessing só é importado quando algum arquivo vai para processos
+                    from concurrent.futures import ProcessPoolExecutor
+                    classe_executor = ProcessPoolExecutor
+                executores[tipo_executor] = classe_executor(max_workers=numero_trabalhadores)
+            return tipo_executor, executores[tipo_executor]
+        
+        def coletar_concluidas(condicao_espera):
+            """Contabiliza as tarefas concluídas"""
+            nonlocal sucessos, erros
+            concluidas, _ = wait(list(em_andamento), return_when=condicao_espera)
+            for tarefa in concluidas:
+                arquivo, arquivo_backup, tipo_executor, memoria_estimada = em_andamento.pop(tarefa)
+                agenda.liberar(memoria_estimada)
+                try:
+                    sucesso = tarefa.result()
+                    if tipo_executor == 'processos':
+                        # O processo trabalhador devolve também as métricas que coletou
+                        sucesso, metricas_parciais = sucesso
+                        self.instrumentacao.mesclar(metricas_parciais)
+                except Exception as erro:
+                    self._relatar_erro(arquivo, f"Erro ao processar {arquivo.name}: {str(erro)}")
+                    sucesso = False
+                if sucesso:
+                    self._registrar_concluido(arquivo, arquivo_backup, gerenciador_arquivos, manifesto, diario)
                     sucessos += 1
                 else:
                     erros += 1
+                self._registrar_arquivo(arquivo, sucesso)
+                progresso.registrar(sucesso, agenda.tamanho(arquivo))
+            self.instrumentacao.registrar_fila('tarefas_em_andamento', len(em_andamento))
+            self.instrumentacao.registrar_fila('memoria_em_andamento', agenda.memoria_reservada)
+        
+        try:
+            for arquivo in agenda:
+                tamanho_arquivo = agenda.tamanho(arquivo)
+                memoria_estimada = self.estimar_memoria(tamanho_arquivo, tamanho_bloco, formato, compressor)
+                # Aguardar vaga: limite de tarefas e orçamento de memória
+                while em_andamento and (len(em_andamento) >= limite_em_andamento or not agenda.cabe(memoria_estimada)):
+                    coletar_concluidas(FIRST_COMPLETED)
+                try:
+                    arquivo_backup = gerenciador_arquivos.obter_caminho_criptografado(arquivo)
+                    tipo_executor, executor = obter_executor(tamanho_arquivo)
+                except OSError as erro:
+                    self._relatar_erro(arquivo, f"Erro ao ler arquivo {arquivo.name}: {str(erro)}")
+                    erros += 1
+                    self._registrar_arquivo(arquivo, False)
+                    progresso.registrar(False)
+                    continue
+                
+                if tipo_executor == 'processos':
+                    tarefa = executor.submit(
+                        _criptografar_arquivo_em_processo, arquivo, arquivo_backup,
+                        chave_compartilhada, sal_usado, tamanho_bloco, formato, self.algoritmo_aead,
+                        self.instrumentacao.ativa, self.silencioso, compressor, parametros_kdf, self.limite_mapeamento
+                    )
+                else:
+                    tarefa = executor.submit(
+                        self.criptografar_arquivo_em_fluxo, arquivo, arquivo_backup,
+                        chave_compartilhada, sal_usado, tamanho_bloco, formato, compressor, parametros_kdf
+                    )
+                em_andamento[tarefa] = (arquivo, arquivo_backup, tipo_executor, memoria_estimada)
+                agenda.reservar(memoria_estimada)
+                self.instrumentacao.registrar_fila('tarefas_em_andamento', len(em_andamento))
+                self.instrumentacao.registrar_fila('memoria_em_andamento', agenda.memoria_reservada)
+            
+            while em_andamento:
+                coletar_concluidas(FIRST_COMPLETED)
+        finally:
+            for executor in executores.values():
+                executor.shutdown(wait=True)
+        
+        return sucessos, erros
+    
+    def _processar_criptografia_assincrona(self, agenda, chave_criptografia, gerenciador_arquivos, sal_usado,
+                                           numero_trabalhadores, tamanho_bloco, formato, manifesto, progresso, compressor=None,
+                                           diario=None, parametros_kdf=None):
+        """Criptografa os arquivos no pipeline assíncrono, com vários arquivos em andamento ao mesmo tempo"""
+        if formato != FORMATO_CONTEINER:
+            raise ValueError("O pipeline assíncrono exige o formato contêiner")
+        
+        contagem = {'sucessos': 0, 'erros': 0}
+        
+        def ao_concluir(arquivo, arquivo_backup, erro):
+            """Contabiliza um arquivo finalizado pelo pipeline"""
+            sucesso = erro is None
+            if sucesso:
+                self._registrar_concluido(arquivo, arquivo_backup, gerenciador_arquivos, manifesto, diario)
             else:
-                erros += 1
+                self._relatar_erro(arquivo, f"Erro durante criptografia de {arquivo.name}: {str(erro)}")
+            contagem['sucessos' if sucesso else 'erros'] += 1
+            self._registrar_arquivo(arquivo, sucesso)
+            progresso.registrar(sucesso, agenda.tamanho(arquivo))
         
-        return sucessos, erros, sal_usado
+        # asyncio só é importado quando o pipeline é usado
+        from pipeline_assincrono import PipelineAssincrono
+        conteiner = ConteinerSegmentado(tamanho_bloco, self.algoritmo_aead, self.instrumentacao, compressor, parametros_kdf)
+        PipelineAssincrono(conteiner, numero_trabalhadores, instrumentacao=self.instrumentacao).executar(
+            agenda, gerenciador_arquivos.obter_caminho_criptografado, chave_criptografia, sal_usado, ao_concluir
+        )
+        return contagem['sucessos'], contagem['erros']
     
-    def processar_descriptografia_em_lote(self, pasta_criptografada, arquivos_criptografados, senha_usuario, gerenciador_senhas, gerenciador_arquivos):
+    def processar_descriptografia_em_lote(self, pasta_criptografada, arquivos_criptografados, senha_usuario, gerenciador_senhas, gerenciador_arquivos,
+                                          cache_chaves=None, pasta_destino=None, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
         """Processa descriptografia de múltiplos arquivos"""
         sucessos = 0
         erros = 0
         
+        # Arquivos da mesma sessão compartilham o sal: derivar a chave uma vez por sal
+        cache_do_lote = cache_chaves if cache_chaves is not None else CacheChavesDerivadas()
+        
+        # Deriva (ou reaproveita do cache) a chave para o sal e os parâmetros do cabeçalho
+        obter_chave = gerenciador_senhas.criar_obter_chave(senha_usuario, cache_do_lote)
+        # Com o índice de sessões, cada chave é derivada uma vez aqui e a senha é conferida antes dos arquivos
+        try:
+            self.derivar_chaves_das_sessoes(pasta_criptografada, obter_chave, cache_do_lote)
+        except ValueError:
+            if cache_chaves is None:
+                cache_do_lote.limpar()
+            raise
+        
         # Criar pasta para arquivos descriptografados
-        pasta_descriptografada = gerenciador_arquivos.criar_pasta_descriptografada(pasta_criptografada)
+        pasta_descriptografada = gerenciador_arquivos.criar_pasta_descriptografada(pasta_criptografada, pasta_destino)
         
-        print(f"\nDescriptografando {len(arquivos_criptografados)} arquivos...")
+        total_arquivos = len(arquivos_criptografados) if hasattr(arquivos_criptografados, '__len__') else None
+        self._exibir("\nDescriptografando arquivos..." if total_arquivos is None else f"\nDescriptografando {total_arquivos} arquivos...")
+        progresso = ProgressoLote("Descriptografados", total_arquivos, silencioso=self.silencioso)
         
-        for arquivo_criptografado in arquivos_criptografados:
-            print(f"Processando: {arquivo_criptografado.name}")
-            
-            try:
-                # Ler arquivo criptografado
-                dados_arquivo = gerenciador_arquivos.ler_conteudo_arquivo(arquivo_criptografado)
-                if dados_arquivo is None:
-                    erros += 1
-                    continue
-                
-                # Verificar se há dados suficientes (sal + vetor de inicialização mínimo)
-                if len(dados_arquivo) < 48:  # 32 bytes sal + 16 bytes vetor de inicialização
-                    print(f"Arquivo {arquivo_criptografado.name} corrompido ou muito pequeno")
-                    erros += 1
+        try:
+            for arquivo_criptografado in arquivos_criptografados:
+                if PacoteCriptografado.e_pacote(arquivo_criptografado):
+                    # Pacote: cada membro conta como um arquivo
+                    sucessos_pacote, erros_pacote = self._extrair_pacote(
+                        arquivo_criptografado, pasta_descriptografada, obter_chave, gerenciador_arquivos
+                    )
+                    sucessos += sucessos_pacote
+                    erros += erros_pacote
+                    progresso.registrar(True, quantidade=sucessos_pacote)
+                    progresso.registrar(False, quantidade=erros_pacote)
                     continue
                 
-                # Extrair sal criptográfico (primeiros 32 bytes)
-                sal_criptografico = dados_arquivo[:32]
-                dados_criptografados = dados_arquivo[32:]
-                
-                # Derivar chave com sal
-                chave_derivada = gerenciador_senhas.derivar_chave_da_senha(senha_usuario, sal_criptografico)
-                
-                # Descriptografar
-                dados_originais = self.descriptografar_arquivo(dados_criptografados, chave_derivada)
+                sucesso = False
+                try:
+                    # Descriptografar em fluxo direto para a pasta de saída, mantendo as subpastas
+                    arquivo_saida = gerenciador_arquivos.obter_caminho_descriptografado(
+                        pasta_descriptografada, pasta_criptografada, arquivo_criptografado
+                    )
+                    sucesso = self.descriptografar_arquivo_em_fluxo(arquivo_criptografado, arquivo_saida, obter_chave, tamanho_bloco)
+                    
+                except Exception as erro:
+                    self._relatar_erro(arquivo_criptografado, f"Erro ao processar {arquivo_criptografado.name}: {str(erro)}")
                 
-                if dados_originais is not None:
-                    # Salvar arquivo descriptografado
-                    nome_original = arquivo_criptografado.stem  # Remove .enc
-                    if gerenciador_arquivos.salvar_arquivo_descriptografado(
-                        pasta_descriptografada, nome_original, dados_originais
-                    ):
-                        sucessos += 1
-                    else:
-                        erros += 1
+                if sucesso:
+                    sucessos += 1
                 else:
                     erros += 1
-                    
-            except Exception as erro:
-                print(f"Erro ao processar {arquivo_criptografado.name}: {str(erro)}")
-                erros += 1
+                self._registrar_arquivo(arquivo_criptografado, sucesso)
+                progresso.registrar(sucesso)
+        finally:
+            progresso.finalizar()
+            estatisticas_cache = cache_do_lote.obter_estatisticas()
+            self._exibir(f"Chaves derivadas: {estatisticas_cache['falhas']} | Reutilizadas do cache: {estatisticas_cache['acertos']}")
+            # Zerar as chaves ao fim do lote (somente se o cache pertence a este lote)
+            if cache_chaves is None:
+                cache_do_lote.limpar()
         
         return sucessos, erros, pasta_descriptografada
     
-    def verificar_integridade_arquivo_criptografado(self, arquivo_criptografado):
-        """Verifica se um arquivo criptografado tem estrutura válida"""
+    def derivar_chaves_das_sessoes(self, pasta_criptografada, obter_chave, cache_chaves):
+        """Deriva de uma vez as chaves das sessões do índice da pasta (os arquivos depois só consultam o cache);
+        retorna o número de sessões"""
+        indice_sessoes = IndiceSessoes(pasta_criptografada)
+        if not indice_sessoes.existe():
+            return 0
+        try:
+            indice_sessoes.carregar()
+        except (OSError, ValueError) as erro:
+            self._exibir(f"Índice de sessões ilegível, as chaves serão derivadas por arquivo: {str(erro)}")
+            return 0
+        
+        # Todas as chaves das sessões devem caber no cache durante o lote
+        cache_chaves.capacidade_maxima = max(cache_chaves.capacidade_maxima, len(indice_sessoes.sessoes))
+        _, invalidas = indice_sessoes.derivar_chaves(obter_chave)
+        if invalidas:
+            self._exibir(f"Aviso: {invalidas} sessões do backup foram criptografadas com outra senha")
+        return len(indice_sessoes.sessoes)
+    
+    def _extrair_pacote(self, caminho_pacote, pasta_descriptografada, obter_chave, gerenciador_arquivos):
+        """Extrai todos os membros de um pacote para a pasta de saída; retorna (sucessos, erros)"""
         try:
+            sucessos, erros = PacoteCriptografado(caminho_pacote).extrair_todos(
+                lambda caminho_membro: gerenciador_arquivos.obter_caminho_membro(pasta_descriptografada, caminho_membro),
+                obter_chave,
+                self._relatar_erro
+            )
+        except Exception as erro:
+            self._relatar_erro(caminho_pacote, f"Erro ao extrair pacote {caminho_pacote.name}: {str(erro)}")
+            self._registrar_arquivo(caminho_pacote, False)
+            return 0, 1
+        
+        self.instrumentacao.contar('arquivos_processados', sucessos)
+        self.instrumentacao.contar('arquivos_com_erro', erros)
+        self.instrumentacao.evento('pacote', arquivo=caminho_pacote, sucessos=sucessos, erros=erros)
+        return sucessos, erros
+    
+    def recriptografar_arquivo(self, arquivo_criptografado, obter_chave, chave_criptografia, sal_criptografico,
+                               parametros_kdf=None, completo=False):
+        """Protege um .enc com outra chave sem gravar texto claro em disco: num contêiner com envelope só o
+        cabeçalho é trocado (no lugar quando cabe na vaga reservada, senão com cópia do arquivo); no legado, no contêiner sem envelope, no pacote ou com completo=True os dados são
+        descriptografados e cifrados de novo em memória (o legado vira contêiner). Retorna o tipo de troca"""
+        if PacoteCriptografado.e_pacote(arquivo_criptografado):
+            PacoteCriptografado(arquivo_criptografado).recifrar(obter_chave, chave_criptografia, sal_criptografico, parametros_kdf)
+            return RECHAVE_RECIFRADO
+        
+        cabecalho = None
+        with open(arquivo_criptografado, 'rb') as arquivo:
+            prefixo = arquivo.read(len(MAGIA_CONTEINER))
+            if ArmazemDeduplicado.e_receita(prefixo):
+                raise ValueError("Arquivos deduplicados dependem dos blocos do armazém")
+            if ConteinerSegmentado.e_conteiner(prefixo):
+                cabecalho = ConteinerSegmentado().ler_estrutura_arquivo(arquivo)['cabecalho']
+        
+        if cabecalho is not None and 'envelope' in cabecalho and not completo:
+            ConteinerSegmentado(instrumentacao=self.instrumentacao).reenvelopar(
+                arquivo_criptografado, obter_chave, chave_criptografia, sal_criptografico, parametros_kdf
+            )
+            return RECHAVE_ENVELOPE
+        
+        # Cifrar de novo mantendo o algoritmo, os segmentos e a compressão do original
+        if cabecalho is None:
+            conteiner = ConteinerSegmentado(TAMANHO_BLOCO_FLUXO, self.algoritmo_aead, self.instrumentacao, None, parametros_kdf)
+        else:
+            compressao = cabecalho.get('compressao')
+            conteiner = ConteinerSegmentado(
+                cabecalho['tamanho_segmento'], cabecalho['algoritmo'], self.instrumentacao,
+                CompressorSegmentos(compressao['algoritmo'], compressao.get('nivel')) if compressao else None, parametros_kdf
+            )
+        with open(arquivo_criptografado, 'rb') as arquivo_entrada, gravacao_atomica(arquivo_criptografado, buffering=0) as arquivo_saida:
+            self._recifrar_fluxo(arquivo_entrada, arquivo_saida, obter_chave, chave_criptografia, sal_criptografico, conteiner)
+        return RECHAVE_RECIFRADO
+    
+    def _recifrar_fluxo(self, leitor, escritor, obter_chave, chave_criptografia, sal_criptografico, conteiner):
+        """Descriptografa numa thread auxiliar e cifra de novo no contêiner, as duas ligadas por um pipe:
+        o texto claro só passa pela memória; retorna o tamanho original"""
+        descritor_leitura, descritor_escrita = os.pipe()
+        entrada_pipe = open(descritor_leitura, 'rb')
+        saida_pipe = open(descritor_escrita, 'wb')
+        falhas = []
+        
+        def descriptografar():
+            try:
+                with saida_pipe:
+                    self.descriptografar_entre_fluxos(leitor, saida_pipe, obter_chave)
+            except Exception as erro:
+                falhas.append(erro)
+        
+        auxiliar = threading.Thread(target=descriptografar, daemon=True)
+        auxiliar.start()
+        try:
+            with entrada_pipe:
+                tamanho_original = conteiner.criptografar_fluxo(entrada_pipe, escritor, chave_criptografia, sal_criptografico)
+        finally:
+            # Com a entrada do pipe fechada, a thread auxiliar não fica presa numa escrita
+            auxiliar.join()
+        if falhas:
+            # Descriptografia incompleta: a nova versão não pode substituir o original
+            raise falhas[0]
+        return tamanho_original
+    
+    def processar_recriptografia_em_lote(self, arquivos_criptografados, obter_chave, chave_criptografia, sal_criptografico,
+                                         parametros_kdf=None, numero_trabalhadores=1, completo=False):
+        """Troca a chave de vários arquivos em paralelo (cada um substituído só quando completo);
+        retorna (sucessos, erros, quantidade por tipo de troca)"""
+        sucessos = 0
+        erros = 0
+        contagem = {RECHAVE_ENVELOPE: 0, RECHAVE_RECIFRADO: 0}
+        total_arquivos = len(arquivos_criptografados) if hasattr(arquivos_criptografados, '__len__') else None
+        self._exibir("\nTrocando a chave dos arquivos..." if total_arquivos is None else f"\nTrocando a chave de {total_arquivos} arquivos...")
+        progresso = ProgressoLote("Recriptografados", total_arquivos, silencioso=self.silencioso)
+        # Cada tarefa ocupa no máximo alguns segmentos em memória
+        limite_em_andamento = numero_trabalhadores * 2
+        em_andamento = {}
+        
+        def coletar_concluidas():
+            """Contabiliza as tarefas concluídas"""
+            nonlocal sucessos, erros
+            concluidas, _ = wait(list(em_andamento), return_when=FIRST_COMPLETED)
+            for tarefa in concluidas:
+                arquivo = em_andamento.pop(tarefa)
+                try:
+                    contagem[tarefa.result()] += 1
+                    sucesso = True
+                except Exception as erro:
+                    self._relatar_erro(arquivo, f"Erro ao trocar a chave de {arquivo.name}: {str(erro)}")
+                    sucesso = False
+                if sucesso:
+                    sucessos += 1
+                else:
+                    erros += 1
+                self._registrar_arquivo(arquivo, sucesso)
+                progresso.registrar(sucesso)
+        
+        with ThreadPoolExecutor(max_workers=numero_trabalhadores) as executor:
+            for arquivo_criptografado in arquivos_criptografados:
+                tarefa = executor.submit(
+                    self.recriptografar_arquivo, arquivo_criptografado, obter_chave,
+                    chave_criptografia, sal_criptografico, parametros_kdf, completo
+                )
+                em_andamento[tarefa] = arquivo_criptografado
+                if len(em_andamento) >= limite_em_andamento:
+                    coletar_concluidas()
+            
+            while em_andamento:
+                coletar_concluidas()
+        
+        progresso.finalizar()
+        self._exibir(
+            f"Troca de chave: {contagem[RECHAVE_ENVELOPE]} só no cabeçalho | {contagem[RECHAVE_RECIFRADO]} cifrados de novo"
+        )
+        return sucessos, erros, contagem
+    
+    def verificar_integridade_arquivo_criptografado(self, arquivo_criptografado, obter_chave=None):
+        """Verifica a estrutura de um arquivo criptografado lendo só cabeçalho, índice e rodapé;
+        com obter_chave(sal), autentica também todo o conteúdo pelas tags AEAD (modo profundo)"""
+        try:
+            if PacoteCriptografado.e_pacote(arquivo_criptografado):
+                pacote = PacoteCriptografado(arquivo_criptografado)
+                if obter_chave is None:
+                    # Pacote: cabeçalho e rodapé coerentes (o diretório só se abre com a chave)
+                    pacote.verificar_estrutura()
+                    return True, "Pacote válido"
+                return True, f"Pacote autenticado ({pacote.autenticar(obter_chave)} membros)"
+            
             with open(arquivo_criptografado, 'rb') as arquivo:
-                dados = arquivo.read()
+                # Contêiner segmentado: cabeçalho, índice e rodapé coerentes com o tamanho do arquivo
+                prefixo = arquivo.read(len(MAGIA_CONTEINER))
+                if ConteinerSegmentado.e_conteiner(prefixo):
+                    conteiner = ConteinerSegmentado(instrumentacao=self.instrumentacao)
+                    if obter_chave is None:
+                        conteiner.verificar_estrutura(arquivo_criptografado)
+                        return True, "Arquivo válido"
+                    conteiner.autenticar(arquivo_criptografado, obter_chave)
+                    return True, "Arquivo autenticado"
+                # Receita deduplicada: sem a chave, só o cabeçalho e o armazém; com ela, a receita e todos os seus blocos
+                if ArmazemDeduplicado.e_receita(prefixo):
+                    armazem = ArmazemDeduplicado.localizar(arquivo_criptografado)
+                    if obter_chave is None:
+                        armazem.verificar_estrutura_receita(arquivo_criptografado)
+                        return True, "Receita válida"
+                    numero_blocos = armazem.autenticar(arquivo_criptografado, obter_chave, ConteinerSegmentado(instrumentacao=self.instrumentacao))
+                    return True, f"Receita autenticada ({numero_blocos} blocos)"
+                tamanho_arquivo = os.fstat(arquivo.fileno()).st_size
             
-            # Verificar tamanho mínimo (sal + vetor de inicialização + pelo menos um bloco)
-            if len(dados) < 48:  # 32 + 16 + 0
-                return False, "Arquivo muito pequeno"
+                # Verificar tamanho mínimo (sal + vetor de inicialização + pelo menos um bloco)
+                if tamanho_arquivo < TAMANHO_SAL + TAMANHO_VETOR_INICIALIZACAO:
+                    return False, "Arquivo muito pequeno"
             
-            # Verificar se o tamanho dos dados criptografados é múltiplo de 16
-            dados_criptografados = dados[32:]  # Remove sal
-            if (len(dados_criptografados) - 16) % 16 != 0:  # Remove vetor de inicialização, verifica blocos
-                return False, "Tamanho inválido para AES"
+                # Verificar se o tamanho dos dados criptografados é múltiplo de 16
+                if (tamanho_arquivo - TAMANHO_SAL - TAMANHO_VETOR_INICIALIZACAO) % TAMANHO_BLOCO_AES != 0:
+                    return False, "Tamanho inválido para AES"
             
-            return True, "Arquivo válido"
+                if obter_chave is None:
+                    return True, "Arquivo válido"
+                
+                # Formato legado não tem tag: o máximo possível é descriptografar tudo e conferir o preenchimento
+                arquivo.seek(0)
+                chave_derivada = obter_chave(arquivo.read(TAMANHO_SAL))
+                with open(os.devnull, 'wb') as descarte:
+                    self.descriptografar_fluxo(arquivo, descarte, chave_derivada)
+                return True, "Preenchimento válido (formato legado, sem autenticação)"
             
         except Exception as erro:
-            return False, f"Erro ao verificar: {str(erro)}"
\ No newline at end of file
+            return False, f"Erro ao verificar: {str(erro)}"
+    
+    def verificar_em_lote(self, arquivos_criptografados, numero_trabalhadores=1, obter_chave=None):
+        """Verifica os arquivos em paralelo, gerando (arquivo, válido, mensagem) à medida que cada um termina"""
+        # A verificação rápida é quase só latência de E/S: mais tarefas em andamento que trabalhadores
+        limite_em_andamento = numero_trabalhadores * 4
+        em_andamento = {}
+        
+        def coletar_concluidas():
+            """Gera os resultados das tarefas concluídas"""
+            concluidas, _ = wait(list(em_andamento), return_when=FIRST_COMPLETED)
+            for tarefa in concluidas:
+                arquivo = em_andamento.pop(tarefa)
+                valido, mensagem = tarefa.result()
+                yield arquivo, valido, mensagem
+        
+        with ThreadPoolExecutor(max_workers=numero_trabalhadores) as executor:
+            for arquivo_criptografado in arquivos_criptografados:
+                tarefa = executor.submit(self.verificar_integridade_arquivo_criptografado, arquivo_criptografado, obter_chave)
+                em_andamento[tarefa] = arquivo_criptografado
+                if len(em_andamento) >= limite_em_andamento:
+                    yield from coletar_concluidas()
+            
+            while em_andamento:
+                yield from coletar_concluidas()
+
+def _criptografar_arquivo_em_processo(caminho_origem, caminho_destino, chave_criptografia, sal_criptografico, tamanho_bloco,
+                                      formato, algoritmo_aead, coletar_metricas=False, silencioso=False, compressor=None,
+                                      parametros_kdf=None, limite_mapeamento=LIMITE_ARQUIVO_MAPEADO):
+    """Executa a criptografia em fluxo de um arquivo dentro de um processo trabalhador; retorna (sucesso, métricas)"""
+    instrumentacao = Instrumentacao() if coletar_metricas else InstrumentacaoNula()
+    sucesso = MotorCriptografia(algoritmo_aead, instrumentacao, silencioso, limite_mapeamento).criptografar_arquivo_em_fluxo(
+        caminho_origem, caminho_destino, chave_criptografia, sal_criptografico, tamanho_bloco, formato, compressor, parametros_kdf
+    )
+    return sucesso, instrumentacao.obter_metricas_parciais()
\ No newline at end of file
@@ -0,0 +1,146 @@
+# diario_lote.py
+# Diário de execução: registra cada arquivo concluído para que um lote interrompido possa ser retomado
+#
+# Uma linha JSON por registro: a primeira descreve a sessão (sal, derivação e verificador da chave), as demais
+# os arquivos concluídos. Uma linha cortada no fim (queda durante a gravação) é ignorada.
+
+import hmac
+import json
+import os
+from pathlib import Path
+from gerenciador_senhas import calcular_verificador_chave
+
+NOME_DIARIO = '.diario_lote.jsonl'
+VERSAO_DIARIO = 1
+# Registros gravados entre duas sincronizações com o disco
+INTERVALO_SINCRONIZACAO = 256
+
+class DiarioLote:
+    def __init__(self, pasta_backup, silencioso=False):
+        self.caminho_diario = Path(pasta_backup) / NOME_DIARIO
+        self.silencioso = silencioso
+        self.sessao = None
+        self.concluidos = {}
+        self._arquivo = None
+        self._registros_sem_sincronizar = 0
+    
+    def existe(self):
+        """Indica se há um diário de uma execução interrompida"""
+        return self.caminho_diario.exists()
+    
+    def carregar(self):
+        """Lê o diário de uma execução interrompida"""
+        with open(self.caminho_diario, 'r', encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                if registro.get('tipo') == 'sessao':
+                    if registro.get('versao') != VERSAO_DIARIO:
+                        raise ValueError(f"Versão de diário não suportada: {registro.get('versao')}")
+                    self.sessao = registro
+                elif registro.get('tipo') == 'arquivo':
+                    self.concluidos[registro['origem']] = registro
+        if self.sessao is None:
+            raise ValueError("Diário sem o registro da sessão")
+    
+    @staticmethod
+    def calcular_verificador(chave_criptografia):
+        """Valor derivado da chave que confirma a senha na retomada sem revelá-la"""
+        return calcular_verificador_chave(chave_criptografia, b'diario-lote-criptografia')
+    
+    def obter_sal(self):
+        """Retorna o sal da execução interrompida"""
+        return bytes.fromhex(self.sessao['sal'])
+    
+    def obter_parametros_kdf(self):
+        """Retorna os parâmetros de derivação da execução interrompida (None: diário sem esse registro)"""
+        return self.sessao.get('kdf')
+    
+    def verificar_chave(self, chave_criptografia):
+        """Confere se a chave derivada é a mesma da execução interrompida"""
+        return hmac.compare_digest(self.sessao['verificador'], self.calcular_verificador(chave_criptografia))
+    
+    def iniciar(self, sal_criptografico, chave_criptografia, parametros_kdf=None):
+        """Abre o diário para registrar os arquivos concluídos (continua o diário carregado, se houver)"""
+        if self.sessao is not None:
+            self._arquivo = open(self.caminho_diario, 'a', encoding='utf-8')
+            return
+        self.sessao = {
+            'tipo': 'sessao',
+            'versao': VERSAO_DIARIO,
+            'sal': bytes(sal_criptografico).hex(),
+            'verificador': self.calcular_verificador(chave_criptografia)
+        }
+        if parametros_kdf is not None:
+            self.sessao['kdf'] = dict(parametros_kdf)
+        self._arquivo = open(self.caminho_diario, 'w', encoding='utf-8')
+        self._gravar(self.sessao)
+        self._sincronizar()
+    
+    def filtrar_pendentes(self, lista_arquivos, pasta_origem, verificar_saida, ao_pular=None):
+        """Gera, sob demanda, somente os arquivos sem saída íntegra registrada no diário"""
+        pasta_backup = self.caminho_diario.parent
+        pendentes = 0
+        concluidos = 0
+        
+        for arquivo in lista_arquivos:
+            caminho_relativo = Path(arquivo).relative_to(pasta_origem).as_posix()
+            registro = self.concluidos.get(caminho_relativo)
+            if registro is not None:
+                informacoes = os.stat(arquivo)
+                arquivo_saida = pasta_backup / registro['saida']
+                # Origem inalterada e saída presente e íntegra: nada a refazer
+                if (registro['tamanho'] == informacoes.st_size and registro['mtime_ns'] == informacoes.st_mtime_ns
+                        and arquivo_saida.exists() and verificar_saida(arquivo_saida)):
+                    concluidos += 1
+                    if ao_pular is not None:
+                        ao_pular(arquivo, arquivo_saida)
+                    continue
+            pendentes += 1
+            yield arquivo
+        
+        if not self.silencioso:
+            print(f"Retomada: {concluidos} arquivos já concluídos | {pendentes} pendentes")
+    
+    def registrar(self, arquivo_original, pasta_origem, arquivo_saida):
+        """Registra um arquivo criptografado com sucesso (a saída já tem o nome final)"""
+        informacoes = os.stat(arquivo_original)
+        registro = {
+            'tipo': 'arquivo',
+            'origem': Path(arquivo_original).relative_to(pasta_origem).as_posix(),
+            'saida': Path(arquivo_saida).relative_to(self.caminho_diario.parent).as_posix(),
+            'tamanho': informacoes.st_size,
+            'mtime_ns': informacoes.st_mtime_ns
+        }
+        self.concluidos[registro['origem']] = registro
+        self._gravar(registro)
+        self._registros_sem_sincronizar += 1
+        if self._registros_sem_sincronizar >= INTERVALO_SINCRONIZACAO:
+            self._sincronizar()
+    
+    def _gravar(self, registro):
+        """Acrescenta um registro ao diário"""
+        self._arquivo.write(json.dumps(registro, sort_keys=True) + '\n')
+        self._arquivo.flush()
+    
+    def _sincronizar(self):
+        """Força a gravação do diário no disco"""
+        os.fsync(self._arquivo.fileno())
+        self._registros_sem_sincronizar = 0
+    
+    def fechar(self):
+        """Sincroniza e fecha o diário"""
+        if self._arquivo is not None:
+            self._sincronizar()
+            self._arquivo.close()
+            self._arquivo = None
+    
+    def remover(self):
+        """Remove o diário de um lote concluído sem erros"""
+        self.fechar()
+        try:
+            os.remove(self.caminho_diario)
+        except FileNotFoundError:
+            pass
\ No newline at end of file
@@ -0,0 +1,120 @@
+# fluxo_buffers.py
+# E/S sem cópias: buffers reaproveitados por thread, leitura com readinto e escrita vetorizada
+
+import io
+import os
+import threading
+
+_buffers_da_thread = threading.local()
+
+def obter_buffer(nome, tamanho):
+    """Retorna uma memoryview de `tamanho` bytes sobre um buffer da thread, reaproveitado entre arquivos"""
+    buffer = getattr(_buffers_da_thread, nome, None)
+    if buffer is None or len(buffer) < tamanho:
+        buffer = bytearray(tamanho)
+        setattr(_buffers_da_thread, nome, buffer)
+    return memoryview(buffer)[:tamanho]
+
+def ler_em(leitor, destino):
+    """Preenche o destino com readinto até enchê-lo ou chegar ao fim; retorna os bytes lidos"""
+    ler_para = getattr(leitor, 'readinto', None)
+    total_lido = 0
+    while total_lido < len(destino):
+        if ler_para is not None:
+            quantidade = ler_para(destino[total_lido:])
+        else:
+            # Leitores sem readinto: uma cópia para o buffer
+            dados = leitor.read(len(destino) - total_lido)
+            quantidade = len(dados)
+            destino[total_lido:total_lido + quantidade] = dados
+        if not quantidade:
+            break
+        total_lido += quantidade
+    return total_lido
+
+def copiar_trecho(origem, destino, inicio, tamanho):
+    """Copia `tamanho` bytes da origem (a partir de `inicio`) para a posição atual do destino, ambos arquivos
+    abertos; usa copy_file_range (cópia no kernel, ou só metadados em sistemas com reflink) quando disponível"""
+    copiados = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copiados < tamanho:
+                quantidade = os.copy_file_range(origem.fileno(), destino.fileno(), tamanho - copiados, inicio + copiados)
+                if not quantidade:
+                    break
+                copiados += quantidade
+        except OSError:
+            # Sistemas de arquivos ou kernels sem suporte: cópia comum do que faltar
+            pass
+    if copiados < tamanho:
+        origem.seek(inicio + copiados)
+        buffer = obter_buffer('copia', min(tamanho - copiados, 1024 * 1024))
+        while copiados < tamanho:
+            quantidade = ler_em(origem, buffer[:tamanho - copiados])
+            if not quantidade:
+                raise ValueError("Arquivo truncado durante a cópia")
+            escrever_partes(destino, [buffer[:quantidade]])
+            copiados += quantidade
+    return copiados
+
+def escrever_partes(escritor, partes):
+    """Grava várias partes em sequência, numa única chamada writev quando o destino é um arquivo sem buffer"""
+    escrever_vetor = getattr(escritor, 'escrever_partes', None)
+    if escrever_vetor is not None:
+        return escrever_vetor(partes)
+    if isinstance(escritor, io.FileIO) and hasattr(os, 'writev'):
+        return _escrever_vetor_completo(escritor.fileno(), partes)
+    
+    total_escrito = 0
+    for parte in partes:
+        total_escrito += escritor.write(parte)
+    return total_escrito
+
+def _escrever_vetor_completo(descritor, partes):
+    """Chama os.writev até gravar todas as partes (a gravação pode ser parcial)"""
+    pendentes = [memoryview(parte).cast('B') for parte in partes if len(parte)]
+    total_escrito = 0
+    while pendentes:
+        quantidade = os.writev(descritor, pendentes)
+        total_escrito += quantidade
+        # Descartar as partes gravadas por completo e avançar na parcial
+        while pendentes and quantidade >= len(pendentes[0]):
+            quantidade -= len(pendentes[0])
+            pendentes.pop(0)
+        if quantidade:
+            pendentes[0] = pendentes[0][quantidade:]
+    return total_escrito
+
+class LeitorComPrefixo:
+    """Leitor que devolve primeiro bytes já consumidos de um fluxo sem retorno (pipe, stdin, socket)
+    e depois o restante do fluxo: permite examinar a assinatura sem seek"""
+    def __init__(self, prefixo, leitor):
+        self._prefixo = memoryview(bytes(prefixo))
+        self._leitor = leitor
+    
+    def read(self, quantidade=-1):
+        """Lê até `quantidade` bytes (todos, se negativa)"""
+        if not len(self._prefixo):
+            return self._leitor.read(quantidade)
+        if quantidade is None or quantidade < 0:
+            dados = bytes(self._prefixo) + self._leitor.read()
+            self._prefixo = self._prefixo[:0]
+            return dados
+        dados = bytes(self._prefixo[:quantidade])
+        self._prefixo = self._prefixo[len(dados):]
+        if len(dados) < quantidade:
+            dados += self._leitor.read(quantidade - len(dados))
+        return dados
+    
+    def readinto(self, destino):
+        """Preenche parte do destino; retorna os bytes copiados (0 no fim do fluxo)"""
+        if not len(self._prefixo):
+            if hasattr(self._leitor, 'readinto'):
+                return self._leitor.readinto(destino)
+            dados = self._leitor.read(len(destino))
+            destino[:len(dados)] = dados
+            return len(dados)
+        quantidade = min(len(destino), len(self._prefixo))
+        destino[:quantidade] = self._prefixo[:quantidade]
+        self._prefixo = self._prefixo[quantidade:]
+        return quantidade
\ No newline at end of file
@@ -2,14 +2,82 @@
 # Parte 2: Acesso à pasta original e leitura dos arquivos
 # Parte 4: Salvamento dos arquivos criptografados em outra pasta
 
+import fnmatch
 import os
 import shutil
+from itertools import chain
 from pathlib import Path
+from gravacao_atomica import SUFIXO_TEMPORARIO, gravacao_atomica, sincronizar_pasta
+from instrumentacao import InstrumentacaoNula
+from pacote_criptografado import PREFIXO_NOME_PACOTE
+
+# Um novo backup completo sobre um existente é montado numa pasta vizinha e só troca de lugar com o
+# anterior ao fim de um lote sem erros: uma interrupção nunca deixa o backup anterior pela metade
+SUFIXO_PASTA_NOVA = '.novo'
+SUFIXO_PASTA_ANTERIOR = '.anterior'
 
 class GerenciadorArquivos:
-    def __init__(self):
+    def __init__(self, instrumentacao=None, silencioso=False):
+        self.instrumentacao = instrumentacao or InstrumentacaoNula()
+        self.silencioso = silencioso
         self.pasta_origem = None
         self.pasta_backup = None
+        # Pasta final do backup enquanto a nova versão é montada na pasta vizinha (None: sem troca pendente)
+        self.pasta_backup_final = None
+        # Filtros glob aplicados ao caminho relativo e ao nome de cada arquivo
+        self.padroes_inclusao = []
+        self.padroes_exclusao = []
+        self._pastas_criadas = set()
+        # Pastas que não puderam ser lidas durante a varredura
+        self.erros_varredura = 0
+    
+    def _exibir(self, mensagem):
+        """Exibe uma mensagem, exceto no modo silencioso"""
+        if not self.silencioso:
+            print(mensagem)
+    
+    def _corresponde(self, caminho_relativo, nome, padroes):
+        """Verifica se o caminho relativo ou o nome corresponde a algum padrão glob"""
+        return any(fnmatch.fnmatch(caminho_relativo, padrao) or fnmatch.fnmatch(nome, padrao) for padrao in padroes)
+    
+    def iterar_arquivos(self, pasta, padroes_inclusao=None, padroes_exclusao=None):
+        """Percorre a pasta recursivamente com os.scandir, gerando os arquivos sob demanda"""
+        padroes_inclusao = self.padroes_inclusao if padroes_inclusao is None else padroes_inclusao
+        padroes_exclusao = self.padroes_exclusao if padroes_exclusao is None else padroes_exclusao
+        raiz = os.fspath(pasta)
+        tamanho_prefixo = len(os.path.join(raiz, ''))
+        pastas_pendentes = [raiz]
+        
+        while pastas_pendentes:
+            pasta_atual = pastas_pendentes.pop()
+            self.instrumentacao.contar('pastas_varridas')
+            self.instrumentacao.registrar_fila('pastas_pendentes', len(pastas_pendentes))
+            try:
+                with os.scandir(pasta_atual) as entradas:
+                    for entrada in entradas:
+                        caminho_relativo = entrada.path[tamanho_prefixo:].replace(os.sep, '/')
+                        if padroes_exclusao and self._corresponde(caminho_relativo, entrada.name, padroes_exclusao):
+                            continue
+                        
+                        # is_dir/is_file usam o tipo já lido pelo scandir, sem stat extra
+                        if entrada.is_dir(follow_symlinks=False):
+                            pastas_pendentes.append(entrada.path)
+                        elif entrada.is_file():
+                            if padroes_inclusao and not self._corresponde(caminho_relativo, entrada.name, padroes_inclusao):
+                                continue
+                            self.instrumentacao.contar('arquivos_encontrados')
+                            yield Path(entrada.path)
+            except OSError as erro:
+                self._exibir(f"Erro ao acessar pasta {pasta_atual}: {str(erro)}")
+                self.instrumentacao.evento('erro_varredura', pasta=pasta_atual, mensagem=str(erro))
+                self.erros_varredura += 1
+    
+    def _primeiro_e_restantes(self, iterador):
+        """Lê o primeiro item de um iterador sem perdê-lo; retorna None se estiver vazio"""
+        primeiro = next(iterador, None)
+        if primeiro is None:
+            return None
+        return chain([primeiro], iterador)
     
     def acessar_pasta_origem(self):
         """Parte 2: Acesso à pasta original e leitura dos arquivos"""
@@ -32,22 +100,28 @@ class GerenciadorArquivos:
                 print(f"O caminho não é uma pasta: {caminho_pasta}")
                 continue
                 
-            # Verificar se há arquivos na pasta
-            todos_arquivos = list(pasta.glob('*'))
-            arquivos_comuns = [arquivo for arquivo in todos_arquivos if arquivo.is_file()]
+            # Verificar se há arquivos na pasta (os demais são lidos sob demanda)
+            arquivos_comuns = self._primeiro_e_restantes(self.iterar_arquivos(pasta))
             
-            if not arquivos_comuns:
+            if arquivos_comuns is None:
                 print(f"Nenhum arquivo encontrado na pasta: {caminho_pasta}")
                 continue
                 
             print(f"Pasta encontrada: {pasta}")
-            print(f"Arquivos encontrados: {len(arquivos_comuns)}")
-            for arquivo in arquivos_comuns:
-                print(f"  - {arquivo.name}")
+            print("Os arquivos (incluindo subpastas) serão lidos durante o processamento")
                 
             self.pasta_origem = pasta
             return arquivos_comuns
     
+    def definir_pasta_origem(self, caminho_pasta):
+        """Define a pasta origem sem interação; retorna o iterador de arquivos"""
+        pasta = Path(caminho_pasta)
+        if not pasta.is_dir():
+            raise ValueError(f"Pasta não encontrada: {caminho_pasta}")
+        
+        self.pasta_origem = pasta
+        return self.iterar_arquivos(pasta)
+    
     def acessar_pasta_criptografada(self):
         """Acessa pasta com arquivos criptografados para descriptografia"""
         print("\n=== ACESSO À PASTA COM ARQUIVOS CRIPTOGRAFADOS ===")
@@ -60,43 +134,101 @@ class GerenciadorArquivos:
                 print("Pasta não encontrada!")
                 continue
                 
-            arquivos_criptografados = list(pasta.glob('*.enc'))
-            if not arquivos_criptografados:
+            arquivos_criptografados = self._primeiro_e_restantes(self.iterar_arquivos(pasta, ['*.enc'], []))
+            if arquivos_criptografados is None:
                 print("Nenhum arquivo .enc encontrado na pasta!")
                 continue
                 
             print(f"Pasta encontrada: {pasta}")
-            print(f"Arquivos criptografados encontrados: {len(arquivos_criptografados)}")
-            for arquivo in arquivos_criptografados:
-                print(f"  - {arquivo.name}")
                 
             return pasta, arquivos_criptografados
     
-    def criar_pasta_backup(self):
-        """Parte 4: Criar pasta de backup para arquivos criptografados"""
+    def obter_caminho_pasta_backup(self):
+        """Retorna o caminho da pasta de backup da pasta origem"""
         if not self.pasta_origem:
             raise ValueError("Pasta origem não foi definida!")
             
-        pasta_backup = self.pasta_origem.parent / f"{self.pasta_origem.name}_backup_criptografado"
+        return self.pasta_origem.parent / f"{self.pasta_origem.name}_backup_criptografado"
+    
+    def criar_pasta_backup(self, incremental=False, pasta_destino=None, retomar=False):
+        """Parte 4: Criar pasta de backup para arquivos criptografados; retorna a pasta onde gravar"""
+        pasta_backup = Path(pasta_destino) if pasta_destino else self.obter_caminho_pasta_backup()
+        pasta_nova = pasta_backup.with_name(pasta_backup.name + SUFIXO_PASTA_NOVA)
+        self.pasta_backup_final = None
         
-        # Remover pasta de backup anterior se existir
-        if pasta_backup.exists():
-            shutil.rmtree(pasta_backup)
+        if retomar and pasta_nova.exists():
+            # Retomada de um backup completo interrompido antes da troca com o anterior
+            self.pasta_backup_final = pasta_backup
+            pasta_backup = pasta_nova
+        elif pasta_backup.exists() and not (incremental or retomar):
+            # O backup anterior continua intacto até a nova versão estar completa (o modo incremental o reaproveita)
+            self._verificar_destino_informado(pasta_destino)
+            if pasta_nova.exists():
+                # Restos de uma execução interrompida que não será retomada
+                shutil.rmtree(pasta_nova)
+            self.pasta_backup_final = pasta_backup
+            pasta_backup = pasta_nova
             
-        pasta_backup.mkdir(exist_ok=True)
+        pasta_backup.mkdir(parents=True, exist_ok=True)
+        self._pastas_criadas.clear()
         self.pasta_backup = pasta_backup
-        print(f"Pasta de backup criada: {pasta_backup}")
+        if self.pasta_backup_final is not None:
+            self._exibir(f"Nova versão do backup em {pasta_backup} (substitui {self.pasta_backup_final} ao final)")
+        elif incremental or retomar:
+            self._exibir(f"Pasta de backup (incremental): {pasta_backup}")
+        else:
+            self._exibir(f"Pasta de backup criada: {pasta_backup}")
         return pasta_backup
     
-    def criar_pasta_descriptografada(self, pasta_origem):
+    def concluir_pasta_backup(self):
+        """Troca o backup anterior pela nova versão completa, se ela foi montada na pasta vizinha;
+        retorna a pasta final do backup"""
+        if self.pasta_backup_final is None:
+            return self.pasta_backup
+        pasta_anterior = self.pasta_backup_final.with_name(self.pasta_backup_final.name + SUFIXO_PASTA_ANTERIOR)
+        if pasta_anterior.exists():
+            shutil.rmtree(pasta_anterior)
+        # Duas renomeações: se algo falhar entre elas, as duas versões continuam inteiras lado a lado
+        os.replace(self.pasta_backup_final, pasta_anterior)
+        os.replace(self.pasta_backup, self.pasta_backup_final)
+        sincronizar_pasta(self.pasta_backup_final.parent)
+        shutil.rmtree(pasta_anterior)
+        
+        self.pasta_backup = self.pasta_backup_final
+        self.pasta_backup_final = None
+        self._pastas_criadas.clear()
+        return self.pasta_backup
+    
+    def remover_temporarios(self, pasta):
+        """Remove arquivos temporários deixados por uma execução interrompida; retorna quantos"""
+        removidos = 0
+        for caminho_temporario in Path(pasta).rglob(f"*{SUFIXO_TEMPORARIO}"):
+            try:
+                caminho_temporario.unlink()
+                removidos += 1
+            except OSError:
+                pass
+        return removidos
+    
+    def _verificar_destino_informado(self, pasta_destino):
+        """Impede apagar uma pasta de destino escolhida pelo usuário que já tenha conteúdo"""
+        if pasta_destino and any(Path(pasta_destino).iterdir()):
+            raise ValueError(f"A pasta de destino já existe e não está vazia: {pasta_destino}")
+    
+    def criar_pasta_descriptografada(self, pasta_origem, pasta_destino=None):
         """Criar pasta para arquivos descriptografados"""
-        pasta_descriptografada = pasta_origem.parent / f"{pasta_origem.name}_descriptografado"
+        if pasta_destino:
+            pasta_descriptografada = Path(pasta_destino)
+        else:
+            pasta_descriptografada = pasta_origem.parent / f"{pasta_origem.name}_descriptografado"
         
         if pasta_descriptografada.exists():
+            self._verificar_destino_informado(pasta_destino)
             shutil.rmtree(pasta_descriptografada)
-        pasta_descriptografada.mkdir()
+        pasta_descriptografada.mkdir(parents=True)
+        self._pastas_criadas.clear()
         
-        print(f"Pasta de descriptografia criada: {pasta_descriptografada}")
+        self._exibir(f"Pasta de descriptografia criada: {pasta_descriptografada}")
         return pasta_descriptografada
     
     def ler_conteudo_arquivo(self, caminho_arquivo):
@@ -108,16 +240,59 @@ class GerenciadorArquivos:
             print(f"Erro ao ler arquivo {caminho_arquivo.name}: {str(erro)}")
             return None
     
-    def salvar_arquivo_criptografado(self, arquivo_original, dados_criptografados, sal_criptografico):
-        """Parte 4: Salvamento dos arquivos criptografados"""
+    def _garantir_pasta(self, pasta):
+        """Cria a pasta (e as pastas acima) uma única vez por execução"""
+        if pasta not in self._pastas_criadas:
+            pasta.mkdir(parents=True, exist_ok=True)
+            self._pastas_criadas.add(pasta)
+    
+    def _caminho_relativo(self, arquivo, pasta_base):
+        """Retorna o caminho do arquivo relativo à pasta base (ou só o nome, se estiver fora dela)"""
+        try:
+            return Path(arquivo).relative_to(pasta_base)
+        except (TypeError, ValueError):
+            return Path(Path(arquivo).name)
+    
+    def obter_caminho_criptografado(self, arquivo_original):
+        """Retorna o caminho do arquivo .enc correspondente na pasta de backup, mantendo as subpastas e o nome
+        completo (a.txt e a.bin na mesma pasta geram a.txt.enc e a.bin.enc, nunca a mesma saída)"""
         if not self.pasta_backup:
             raise ValueError("Pasta de backup não foi criada!")
-            
-        nome_criptografado = f"{arquivo_original.stem}.enc"
-        arquivo_backup = self.pasta_backup / nome_criptografado
+        
+        caminho_relativo = self._caminho_relativo(arquivo_original, self.pasta_origem)
+        pasta_destino = self.pasta_backup / caminho_relativo.parent
+        self._garantir_pasta(pasta_destino)
+        return pasta_destino / f"{arquivo_original.name}.enc"
+    
+    def obter_caminho_pacote(self, numero_pacote):
+        """Retorna o caminho de um pacote de arquivos pequenos na pasta de backup"""
+        if not self.pasta_backup:
+            raise ValueError("Pasta de backup não foi criada!")
+        return self.pasta_backup / f"{PREFIXO_NOME_PACOTE}{numero_pacote:06d}.enc"
+    
+    def obter_caminho_membro(self, pasta_saida, caminho_membro):
+        """Retorna o caminho de saída de um membro de pacote, recusando caminhos fora da pasta de saída"""
+        caminho_relativo = Path(caminho_membro)
+        if caminho_relativo.is_absolute() or '..' in caminho_relativo.parts or not caminho_relativo.parts:
+            raise ValueError(f"Caminho inválido no pacote: {caminho_membro}")
+        pasta_destino = pasta_saida / caminho_relativo.parent
+        self._garantir_pasta(pasta_destino)
+        return pasta_saida / caminho_relativo
+    
+    def obter_caminho_descriptografado(self, pasta_saida, pasta_criptografada, arquivo_criptografado):
+        """Retorna o caminho de saída de um arquivo .enc, mantendo as subpastas"""
+        caminho_relativo = self._caminho_relativo(arquivo_criptografado, pasta_criptografada)
+        pasta_destino = pasta_saida / caminho_relativo.parent
+        self._garantir_pasta(pasta_destino)
+        return pasta_destino / arquivo_criptografado.stem  # Remove só o .enc (a.txt.enc -> a.txt)
+    
+    def salvar_arquivo_criptografado(self, arquivo_original, dados_criptografados, sal_criptografico):
+        """Parte 4: Salvamento dos arquivos criptografados"""
+        arquivo_backup = self.obter_caminho_criptografado(arquivo_original)
+        nome_criptografado = arquivo_backup.name
         
         try:
-            with open(arquivo_backup, 'wb') as arquivo:
+            with gravacao_atomica(arquivo_backup) as arquivo:
                 # Salvar sal (32 bytes) + dados criptografados
                 arquivo.write(sal_criptografico + dados_criptografados)
             
@@ -132,7 +307,7 @@ class GerenciadorArquivos:
         """Salva arquivo descriptografado"""
         try:
             arquivo_saida = pasta_saida / nome_arquivo
-            with open(arquivo_saida, 'wb') as arquivo:
+            with gravacao_atomica(arquivo_saida) as arquivo:
                 arquivo.write(dados_arquivo)
             
             print(f"Descriptografado: {nome_arquivo}")
@@ -147,11 +322,10 @@ class GerenciadorArquivos:
         if not pasta.exists():
             return None
             
-        todos_arquivos = list(pasta.glob('*'))
-        arquivos_comuns = [arquivo for arquivo in todos_arquivos if arquivo.is_file()]
+        total_arquivos = sum(1 for _ in self.iterar_arquivos(pasta))
         
         return {
             'caminho': pasta,
-            'total_arquivos': len(arquivos_comuns),
-            'arquivos': arquivos_comuns
+            'total_arquivos': total_arquivos,
+            'arquivos': self.iterar_arquivos(pasta)
         }
\ No newline at end of file
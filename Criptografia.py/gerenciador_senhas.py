@@ -2,13 +2,153 @@
 # Parte 1: Entrada da senha do usuário
 
 import getpass
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.backends import default_backend
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from instrumentacao import ETAPA_KDF, InstrumentacaoNula
+from primitivas import criar_pbkdf2_sha256, criar_scrypt
+
+# Algoritmos de derivação de chave (gravados no cabeçalho de cada arquivo)
+KDF_PBKDF2 = 'pbkdf2-sha256'
+KDF_SCRYPT = 'scrypt'
+ALGORITMOS_KDF = (KDF_PBKDF2, KDF_SCRYPT)
+
+# Parâmetros padrão de derivação de chave
+ALGORITMO_KDF_PADRAO = KDF_PBKDF2
+ITERACOES_PBKDF2_PADRAO = 100000
+TAMANHO_CHAVE = 32  # Chave de 256 bits para AES-256
+# Arquivos sem parâmetros no cabeçalho (formato legado e versões anteriores) usam sempre estes
+PARAMETROS_KDF_LEGADO = {'algoritmo': KDF_PBKDF2, 'iteracoes': ITERACOES_PBKDF2_PADRAO}
+
+# scrypt: custo n (potência de 2), tamanho de bloco r e paralelismo p; memória = 128 * r * n bytes
+CUSTO_SCRYPT_PADRAO = 2 ** 15
+BLOCO_SCRYPT_PADRAO = 8
+PARALELISMO_SCRYPT_PADRAO = 1
+
+# Limites aceitos (também protegem a leitura de cabeçalhos adulterados com custos absurdos)
+ITERACOES_PBKDF2_MINIMAS = 10000
+ITERACOES_PBKDF2_MAXIMAS = 100000000
+CUSTO_SCRYPT_MINIMO = 2 ** 14
+CUSTO_SCRYPT_MAXIMO = 2 ** 20
+BLOCO_SCRYPT_MAXIMO = 32
+PARALELISMO_SCRYPT_MAXIMO = 16
+
+# Calibração: tempo alvo de uma derivação no computador atual
+TEMPO_ALVO_KDF_PADRAO = 0.5
+ITERACOES_CALIBRACAO = 20000
+
+def criar_parametros_kdf(algoritmo=KDF_PBKDF2, custo=None):
+    """Monta os parâmetros de derivação (custo: iterações do PBKDF2 ou n do scrypt)"""
+    if algoritmo == KDF_PBKDF2:
+        return validar_parametros_kdf({'algoritmo': KDF_PBKDF2, 'iteracoes': custo or ITERACOES_PBKDF2_PADRAO})
+    if algoritmo == KDF_SCRYPT:
+        return validar_parametros_kdf({
+            'algoritmo': KDF_SCRYPT,
+            'n': custo or CUSTO_SCRYPT_PADRAO,
+            'r': BLOCO_SCRYPT_PADRAO,
+            'p': PARALELISMO_SCRYPT_PADRAO
+        })
+    raise ValueError(f"Algoritmo de derivação não suportado: {algoritmo}")
+
+def validar_parametros_kdf(parametros_kdf):
+    """Confere algoritmo e limites dos parâmetros; retorna uma cópia somente com os campos do algoritmo"""
+    if not isinstance(parametros_kdf, dict):
+        raise ValueError("Parâmetros de derivação inválidos")
+    algoritmo = parametros_kdf.get('algoritmo')
+    if algoritmo == KDF_PBKDF2:
+        iteracoes = parametros_kdf.get('iteracoes')
+        if not isinstance(iteracoes, int) or not ITERACOES_PBKDF2_MINIMAS <= iteracoes <= ITERACOES_PBKDF2_MAXIMAS:
+            raise ValueError(f"Iterações do PBKDF2 fora do intervalo aceito: {iteracoes}")
+        return {'algoritmo': KDF_PBKDF2, 'iteracoes': iteracoes}
+    if algoritmo == KDF_SCRYPT:
+        custo, bloco, paralelismo = (parametros_kdf.get(campo) for campo in ('n', 'r', 'p'))
+        if (not isinstance(custo, int) or custo & (custo - 1) or not CUSTO_SCRYPT_MINIMO <= custo <= CUSTO_SCRYPT_MAXIMO
+                or not isinstance(bloco, int) or not 1 <= bloco <= BLOCO_SCRYPT_MAXIMO
+                or not isinstance(paralelismo, int) or not 1 <= paralelismo <= PARALELISMO_SCRYPT_MAXIMO):
+            raise ValueError(f"Parâmetros do scrypt fora do intervalo aceito: n={custo}, r={bloco}, p={paralelismo}")
+        return {'algoritmo': KDF_SCRYPT, 'n': custo, 'r': bloco, 'p': paralelismo}
+    raise ValueError(f"Algoritmo de derivação não suportado: {algoritmo}")
+
+def calcular_verificador_chave(chave_criptografia, contexto):
+    """Valor derivado da chave que confirma a senha sem revelar a chave (um por contexto de uso)"""
+    return hmac.new(bytes(chave_criptografia), contexto, hashlib.sha256).hexdigest()
+
+def descrever_parametros_kdf(parametros_kdf):
+    """Descrição curta dos parâmetros para mensagens"""
+    if parametros_kdf['algoritmo'] == KDF_SCRYPT:
+        return f"scrypt (n={parametros_kdf['n']}, r={parametros_kdf['r']}, p={parametros_kdf['p']})"
+    return f"PBKDF2-SHA256 ({parametros_kdf['iteracoes']} iterações)"
+
+class CacheChavesDerivadas:
+    """Cache limitado em memória de chaves derivadas, válido durante um lote"""
+    def __init__(self, capacidade_maxima=64):
+        self.capacidade_maxima = capacidade_maxima
+        self.acertos = 0
+        self.falhas = 0
+        self._entradas = OrderedDict()
+        # Chave aleatória do cache: a impressão da senha não serve fora deste processo
+        self._chave_impressao = secrets.token_bytes(32)
+        self._trava = threading.Lock()
+    
+    def _gerar_identificador(self, senha, sal_criptografico, parametros_kdf):
+        """Gera o identificador (impressão da senha, sal, parâmetros) de uma entrada"""
+        impressao_senha = hmac.new(self._chave_impressao, senha.encode(), hashlib.sha256).digest()
+        return impressao_senha, bytes(sal_criptografico), parametros_kdf
+    
+    def obter(self, senha, sal_criptografico, parametros_kdf):
+        """Retorna a chave em cache ou None, atualizando os contadores"""
+        identificador = self._gerar_identificador(senha, sal_criptografico, parametros_kdf)
+        with self._trava:
+            chave = self._entradas.get(identificador)
+            if chave is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(identificador)
+            self.acertos += 1
+            return chave
+    
+    def armazenar(self, senha, sal_criptografico, parametros_kdf, chave):
+        """Armazena uma chave derivada, descartando a menos usada se o cache estiver cheio"""
+        identificador = self._gerar_identificador(senha, sal_criptografico, parametros_kdf)
+        chave_armazenada = bytearray(chave)
+        with self._trava:
+            self._entradas[identificador] = chave_armazenada
+            self._entradas.move_to_end(identificador)
+            while len(self._entradas) > self.capacidade_maxima:
+                _, chave_descartada = self._entradas.popitem(last=False)
+                self._zerar(chave_descartada)
+        return chave_armazenada
+    
+    def limpar(self):
+        """Zera e remove todas as chaves do cache (chamado ao fim do lote)"""
+        with self._trava:
+            for chave in self._entradas.values():
+                self._zerar(chave)
+            self._entradas.clear()
+    
+    def obter_estatisticas(self):
+        """Retorna os contadores de acertos e falhas do cache"""
+        with self._trava:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'entradas': len(self._entradas)
+            }
+    
+    @staticmethod
+    def _zerar(chave):
+        """Sobrescreve os bytes de uma chave com zeros"""
+        for posicao in range(len(chave)):
+            chave[posicao] = 0
 
 class GerenciadorSenhas:
-    def __init__(self):
-        self.backend_criptografia = default_backend()
+    def __init__(self, instrumentacao=None, parametros_kdf=None):
+        self.instrumentacao = instrumentacao or InstrumentacaoNula()
+        # Parâmetros usados nas novas criptografias (a descriptografia usa os do cabeçalho)
+        self.parametros_kdf = validar_parametros_kdf(parametros_kdf or PARAMETROS_KDF_LEGADO)
     
     def entrada_senha(self):
         """Parte 1: Entrada da senha do usuário"""
@@ -34,16 +174,79 @@ class GerenciadorSenhas:
         """Solicita senha para descriptografia"""
         return getpass.getpass("Digite a senha para descriptografia: ")
     
-    def derivar_chave_da_senha(self, senha, sal_criptografico):
-        """Deriva uma chave a partir da senha usando PBKDF2"""
-        derivador_chave = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,  # Chave de 256 bits para AES-256
-            salt=sal_criptografico,
-            iterations=100000,
-            backend=self.backend_criptografia
-        )
-        return derivador_chave.derive(senha.encode())
+    def obter_parametros_kdf(self, parametros_kdf=None):
+        """Retorna os parâmetros de derivação como tupla (identificam a chave no cache)"""
+        return tuple(sorted((parametros_kdf or self.parametros_kdf).items())) + (TAMANHO_CHAVE,)
+    
+    def _criar_derivador(self, parametros_kdf, sal_criptografico):
+        """Cria o derivador de chave (PBKDF2 ou scrypt) para os parâmetros"""
+        if parametros_kdf['algoritmo'] == KDF_SCRYPT:
+            return criar_scrypt(sal_criptografico, TAMANHO_CHAVE, parametros_kdf['n'], parametros_kdf['r'], parametros_kdf['p'])
+        return criar_pbkdf2_sha256(sal_criptografico, TAMANHO_CHAVE, parametros_kdf['iteracoes'])
+    
+    def derivar_chave_da_senha(self, senha, sal_criptografico, cache_chaves=None, parametros_kdf=None):
+        """Deriva uma chave a partir da senha (parametros_kdf None: os parâmetros configurados)"""
+        parametros_kdf = validar_parametros_kdf(parametros_kdf) if parametros_kdf is not None else self.parametros_kdf
+        identificador_kdf = self.obter_parametros_kdf(parametros_kdf)
+        if cache_chaves is not None:
+            chave_em_cache = cache_chaves.obter(senha, sal_criptografico, identificador_kdf)
+            if chave_em_cache is not None:
+                self.instrumentacao.contar('chaves_reutilizadas')
+                return chave_em_cache
+        
+        derivador_chave = self._criar_derivador(parametros_kdf, sal_criptografico)
+        with self.instrumentacao.medir(ETAPA_KDF):
+            chave_derivada = derivador_chave.derive(senha.encode())
+        self.instrumentacao.contar('chaves_derivadas')
+        
+        if cache_chaves is not None:
+            return cache_chaves.armazenar(senha, sal_criptografico, identificador_kdf, chave_derivada)
+        return chave_derivada
+    
+    def criar_obter_chave(self, senha, cache_chaves=None):
+        """Cria a função obter_chave(sal, parâmetros do cabeçalho) usada na leitura dos arquivos;
+        sem parâmetros no cabeçalho, vale o PBKDF2 com 100.000 iterações das versões anteriores"""
+        def obter_chave(sal_criptografico, parametros_kdf=None):
+            return self.derivar_chave_da_senha(senha, sal_criptografico, cache_chaves, parametros_kdf or PARAMETROS_KDF_LEGADO)
+        return obter_chave
+    
+    def medir_derivacao(self, parametros_kdf):
+        """Mede, em segundos, uma derivação com os parâmetros informados"""
+        derivador_chave = self._criar_derivador(validar_parametros_kdf(parametros_kdf), secrets.token_bytes(32))
+        inicio = time.perf_counter()
+        derivador_chave.derive(b'calibracao')
+        return time.perf_counter() - inicio
+    
+    def calibrar_kdf(self, algoritmo=KDF_PBKDF2, tempo_alvo=TEMPO_ALVO_KDF_PADRAO):
+        """Escolhe o custo cuja derivação leva cerca de tempo_alvo segundos neste computador"""
+        if tempo_alvo <= 0:
+            raise ValueError("O tempo alvo da derivação deve ser positivo")
+        if algoritmo == KDF_PBKDF2:
+            # O tempo do PBKDF2 é proporcional às iterações: uma medição curta basta
+            tempo_medido = self.medir_derivacao(criar_parametros_kdf(KDF_PBKDF2, ITERACOES_CALIBRACAO))
+            iteracoes = int(ITERACOES_CALIBRACAO * tempo_alvo / max(tempo_medido, 1e-6))
+            iteracoes = min(max(iteracoes, ITERACOES_PBKDF2_MINIMAS), ITERACOES_PBKDF2_MAXIMAS)
+            return criar_parametros_kdf(KDF_PBKDF2, iteracoes)
+        if algoritmo == KDF_SCRYPT:
+            # n só pode ser potência de 2: dobrar enquanto a próxima derivação couber no tempo alvo
+            custo = CUSTO_SCRYPT_MINIMO
+            tempo_medido = self.medir_derivacao(criar_parametros_kdf(KDF_SCRYPT, custo))
+            while custo < CUSTO_SCRYPT_MAXIMO and tempo_medido * 2 <= tempo_alvo:
+                custo *= 2
+                tempo_medido = self.medir_derivacao(criar_parametros_kdf(KDF_SCRYPT, custo))
+            return criar_parametros_kdf(KDF_SCRYPT, custo)
+        raise ValueError(f"Algoritmo de derivação não suportado: {algoritmo}")
+    
+    def escolher_parametros_kdf(self, algoritmo=None, custo=None, tempo_alvo=None):
+        """Parâmetros de uma nova criptografia: custo fixo, calibrado para o tempo alvo ou os configurados"""
+        if algoritmo is None and custo is None and tempo_alvo is None:
+            return self.parametros_kdf
+        if custo is not None and tempo_alvo is not None:
+            raise ValueError("Informe o custo da derivação ou o tempo alvo, não ambos")
+        algoritmo = algoritmo or ALGORITMO_KDF_PADRAO
+        if tempo_alvo is not None:
+            return self.calibrar_kdf(algoritmo, tempo_alvo)
+        return criar_parametros_kdf(algoritmo, custo)
     
     def validar_senha(self, senha):
         """Valida se a senha atende aos critérios básicos"""
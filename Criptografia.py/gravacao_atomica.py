@@ -0,0 +1,60 @@
+# gravacao_atomica.py
+# Gravação atômica: cada saída é gravada com nome temporário e só recebe o nome final quando completa,
+# de modo que uma interrupção nunca deixa um arquivo final truncado
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+SUFIXO_TEMPORARIO = '.tmp'
+
+def caminho_temporario(caminho_final):
+    """Retorna o caminho temporário usado enquanto o arquivo final é gravado"""
+    caminho_final = Path(caminho_final)
+    return caminho_final.with_name(caminho_final.name + SUFIXO_TEMPORARIO)
+
+def abrir_temporario(caminho_final, buffering=-1):
+    """Abre para escrita o arquivo temporário correspondente ao caminho final"""
+    return open(caminho_temporario(caminho_final), 'wb', buffering=buffering)
+
+def sincronizar_pasta(caminho_pasta):
+    """Grava em disco a entrada de diretório (renomeação) da pasta, onde o sistema permitir"""
+    try:
+        descritor = os.open(caminho_pasta, os.O_RDONLY)
+    except OSError:
+        # Windows não abre diretórios com os.open; lá a renomeação já é durável
+        return
+    try:
+        os.fsync(descritor)
+    except OSError:
+        pass
+    finally:
+        os.close(descritor)
+
+def concluir_gravacao(arquivo, caminho_final):
+    """Grava em disco e fecha o arquivo temporário e o renomeia para o nome final (substituindo a versão anterior)"""
+    # Sem o fsync antes da renomeação, uma queda de energia pode deixar o nome final apontando para um arquivo vazio
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+    arquivo.close()
+    os.replace(caminho_temporario(caminho_final), caminho_final)
+    sincronizar_pasta(Path(caminho_final).parent)
+
+def descartar_gravacao(arquivo, caminho_final):
+    """Fecha e remove o arquivo temporário de uma gravação que falhou"""
+    arquivo.close()
+    try:
+        os.remove(caminho_temporario(caminho_final))
+    except OSError:
+        pass
+
+@contextmanager
+def gravacao_atomica(caminho_final, buffering=-1):
+    """Bloco de gravação atômica: o nome final só aparece se o bloco terminar sem erro"""
+    arquivo = abrir_temporario(caminho_final, buffering)
+    try:
+        yield arquivo
+        concluir_gravacao(arquivo, caminho_final)
+    except BaseException:
+        descartar_gravacao(arquivo, caminho_final)
+        raise
\ No newline at end of file
@@ -0,0 +1,81 @@
+# indice_sessoes.py
+# Índice de sessões da pasta de backup: sal, parâmetros de derivação e verificador de cada sessão
+#
+# Cada execução da criptografia é uma sessão com um único sal e uma única chave. O índice é gravado
+# uma vez por sessão na raiz do backup; os arquivos .enc apontam para a sua sessão pelo sal do
+# cabeçalho. Na descriptografia, a chave de cada sessão é derivada uma única vez, antes de qualquer
+# arquivo, e a senha é conferida pelo verificador. Os cabeçalhos continuam completos: um .enc
+# copiado para fora do backup ainda pode ser descriptografado sozinho.
+
+import hmac
+import json
+from datetime import datetime
+from pathlib import Path
+from gerenciador_senhas import calcular_verificador_chave
+from gravacao_atomica import gravacao_atomica
+
+NOME_INDICE_SESSOES = '.sessoes.json'
+VERSAO_INDICE_SESSOES = 1
+CONTEXTO_VERIFICADOR_SESSAO = b'sessao-criptografia'
+
+class IndiceSessoes:
+    def __init__(self, pasta_backup):
+        self.caminho_indice = Path(pasta_backup) / NOME_INDICE_SESSOES
+        # Sessões pelo sal (hexadecimal)
+        self.sessoes = {}
+    
+    def existe(self):
+        """Indica se a pasta tem um índice de sessões"""
+        return self.caminho_indice.exists()
+    
+    def carregar(self):
+        """Carrega o índice (vazio se ainda não existir)"""
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as arquivo:
+                conteudo = json.load(arquivo)
+        except FileNotFoundError:
+            self.sessoes = {}
+            return
+        if conteudo.get('versao') != VERSAO_INDICE_SESSOES:
+            raise ValueError(f"Versão de índice de sessões não suportada: {conteudo.get('versao')}")
+        self.sessoes = conteudo.get('sessoes', {})
+    
+    def salvar(self):
+        """Grava o índice de forma atômica"""
+        conteudo = json.dumps({'versao': VERSAO_INDICE_SESSOES, 'sessoes': self.sessoes}, indent=1, sort_keys=True)
+        with gravacao_atomica(self.caminho_indice) as arquivo:
+            arquivo.write(conteudo.encode('utf-8'))
+    
+    def registrar(self, sal_criptografico, parametros_kdf, chave_criptografia):
+        """Registra a sessão (uma vez: a retomada reaproveita a sessão interrompida)"""
+        identificador = bytes(sal_criptografico).hex()
+        if identificador in self.sessoes:
+            return
+        self.sessoes[identificador] = {
+            'kdf': dict(parametros_kdf),
+            'verificador': calcular_verificador_chave(chave_criptografia, CONTEXTO_VERIFICADOR_SESSAO),
+            'criada': datetime.now().isoformat(timespec='seconds')
+        }
+        self.salvar()
+    
+    def manter_somente(self, sal_criptografico):
+        """Remove do índice as outras sessões (todos os arquivos passaram para esta) e grava o índice"""
+        identificador = bytes(sal_criptografico).hex()
+        self.sessoes = {identificador: self.sessoes[identificador]}
+        self.salvar()
+    
+    def derivar_chaves(self, obter_chave):
+        """Deriva a chave de cada sessão uma única vez (obter_chave guarda as chaves no cache do lote);
+        retorna (sessões com a senha correta, sessões com outra senha)"""
+        validas = 0
+        invalidas = 0
+        for identificador, sessao in self.sessoes.items():
+            chave_criptografia = obter_chave(bytes.fromhex(identificador), sessao.get('kdf'))
+            verificador = calcular_verificador_chave(chave_criptografia, CONTEXTO_VERIFICADOR_SESSAO)
+            if hmac.compare_digest(verificador, sessao.get('verificador', '')):
+                validas += 1
+            else:
+                invalidas += 1
+        if invalidas and not validas:
+            raise ValueError("A senha não confere com nenhuma sessão do backup")
+        return validas, invalidas
\ No newline at end of file
@@ -0,0 +1,218 @@
+# instrumentacao.py
+# Métricas do processamento: tempo por etapa, bytes, profundidade de filas e eventos estruturados
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from fluxo_buffers import escrever_partes
+from gravacao_atomica import gravacao_atomica
+
+# Etapas medidas no caminho crítico
+ETAPA_LEITURA = 'leitura'
+ETAPA_KDF = 'kdf'
+ETAPA_CIFRA = 'cifra'
+ETAPA_COMPRESSAO = 'compressao'
+ETAPA_ESCRITA = 'escrita'
+
+class InstrumentacaoNula:
+    """Instrumentação desativada: mesma interface, sem custo"""
+    ativa = False
+    
+    def medir(self, etapa, bytes_processados=0):
+        return nullcontext()
+    
+    def registrar_tempo(self, etapa, segundos, bytes_processados=0):
+        pass
+    
+    def contar(self, nome, quantidade=1):
+        pass
+    
+    def registrar_fila(self, nome, profundidade):
+        pass
+    
+    def evento(self, tipo, **dados):
+        pass
+    
+    def medir_leitor(self, leitor):
+        return leitor
+    
+    def medir_escritor(self, escritor):
+        return escritor
+    
+    def mesclar(self, metricas_parciais):
+        pass
+    
+    def obter_metricas_parciais(self):
+        return None
+
+class LeitorMedido:
+    """Envolve um fluxo de leitura, registrando o tempo e os bytes de cada leitura"""
+    def __init__(self, leitor, instrumentacao):
+        self._leitor = leitor
+        self._instrumentacao = instrumentacao
+    
+    def read(self, quantidade=-1):
+        inicio = time.perf_counter()
+        dados = self._leitor.read(quantidade)
+        self._instrumentacao.registrar_tempo(ETAPA_LEITURA, time.perf_counter() - inicio, len(dados))
+        return dados
+    
+    def readinto(self, buffer):
+        inicio = time.perf_counter()
+        quantidade = self._leitor.readinto(buffer)
+        self._instrumentacao.registrar_tempo(ETAPA_LEITURA, time.perf_counter() - inicio, quantidade or 0)
+        return quantidade
+    
+    def __getattr__(self, nome):
+        return getattr(self._leitor, nome)
+
+class EscritorMedido:
+    """Envolve um fluxo de escrita, registrando o tempo e os bytes de cada escrita"""
+    def __init__(self, escritor, instrumentacao):
+        self._escritor = escritor
+        self._instrumentacao = instrumentacao
+    
+    def write(self, dados):
+        inicio = time.perf_counter()
+        quantidade = self._escritor.write(dados)
+        self._instrumentacao.registrar_tempo(ETAPA_ESCRITA, time.perf_counter() - inicio, quantidade or 0)
+        return quantidade
+    
+    def escrever_partes(self, partes):
+        inicio = time.perf_counter()
+        quantidade = escrever_partes(self._escritor, partes)
+        self._instrumentacao.registrar_tempo(ETAPA_ESCRITA, time.perf_counter() - inicio, quantidade)
+        return quantidade
+    
+    def __getattr__(self, nome):
+        return getattr(self._escritor, nome)
+
+class Instrumentacao:
+    ativa = True
+    
+    def __init__(self, caminho_eventos=None):
+        self._trava = threading.Lock()
+        self.inicio = time.monotonic()
+        self.tempos = {}
+        self.bytes = {}
+        self.chamadas = {}
+        self.contadores = {}
+        self.filas = {}
+        self._arquivo_eventos = open(caminho_eventos, 'a', encoding='utf-8') if caminho_eventos else None
+    
+    @contextmanager
+    def medir(self, etapa, bytes_processados=0):
+        """Mede o tempo de um bloco de código e o atribui a uma etapa"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tempo(etapa, time.perf_counter() - inicio, bytes_processados)
+    
+    def registrar_tempo(self, etapa, segundos, bytes_processados=0):
+        """Acumula tempo, bytes e número de chamadas de uma etapa"""
+        with self._trava:
+            self.tempos[etapa] = self.tempos.get(etapa, 0.0) + segundos
+            self.bytes[etapa] = self.bytes.get(etapa, 0) + bytes_processados
+            self.chamadas[etapa] = self.chamadas.get(etapa, 0) + 1
+    
+    def contar(self, nome, quantidade=1):
+        """Incrementa um contador (arquivos, erros, acertos de cache...)"""
+        with self._trava:
+            self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+    
+    def registrar_fila(self, nome, profundidade):
+        """Registra a profundidade atual de uma fila e mantém o máximo observado"""
+        with self._trava:
+            atual = self.filas.setdefault(nome, {'atual': 0, 'maxima': 0})
+            atual['atual'] = profundidade
+            atual['maxima'] = max(atual['maxima'], profundidade)
+    
+    def medir_leitor(self, leitor):
+        """Retorna o fluxo de leitura com tempo e bytes medidos"""
+        return LeitorMedido(leitor, self)
+    
+    def medir_escritor(self, escritor):
+        """Retorna o fluxo de escrita com tempo e bytes medidos"""
+        return EscritorMedido(escritor, self)
+    
+    def evento(self, tipo, **dados):
+        """Grava um evento estruturado (uma linha JSON) no arquivo de eventos, se houver"""
+        if self._arquivo_eventos is None:
+            return
+        linha = json.dumps({'tempo': time.time(), 'tipo': tipo, **dados}, default=str)
+        with self._trava:
+            self._arquivo_eventos.write(linha + '\n')
+    
+    def obter_metricas_parciais(self):
+        """Retorna as métricas acumuladas para envio a outro processo"""
+        with self._trava:
+            return {
+                'tempos': dict(self.tempos),
+                'bytes': dict(self.bytes),
+                'chamadas': dict(self.chamadas),
+                'contadores': dict(self.contadores)
+            }
+    
+    def mesclar(self, metricas_parciais):
+        """Soma as métricas coletadas num processo trabalhador"""
+        if not metricas_parciais:
+            return
+        with self._trava:
+            for nome_grupo in ('tempos', 'bytes', 'chamadas', 'contadores'):
+                grupo = getattr(self, nome_grupo)
+                for chave, valor in metricas_parciais[nome_grupo].items():
+                    grupo[chave] = grupo.get(chave, 0) + valor
+    
+    def obter_snapshot(self):
+        """Retorna um retrato das métricas, com vazão (MB/s) por etapa"""
+        with self._trava:
+            decorrido = time.monotonic() - self.inicio
+            etapas = {}
+            for etapa, segundos in self.tempos.items():
+                bytes_etapa = self.bytes.get(etapa, 0)
+                etapas[etapa] = {
+                    'segundos': segundos,
+                    'chamadas': self.chamadas.get(etapa, 0),
+                    'bytes': bytes_etapa,
+                    'mb_por_segundo': bytes_etapa / segundos / (1024 * 1024) if segundos > 0 else 0.0
+                }
+            return {
+                'segundos_decorridos': decorrido,
+                'etapas': etapas,
+                'contadores': dict(self.contadores),
+                'filas': {nome: dict(valores) for nome, valores in self.filas.items()}
+            }
+    
+    def exportar_json(self, caminho_arquivo):
+        """Grava o retrato das métricas em JSON"""
+        self._gravar_atomico(caminho_arquivo, json.dumps(self.obter_snapshot(), indent=2) + '\n')
+    
+    def exportar_prometheus(self, caminho_arquivo):
+        """Grava as métricas no formato texto do Prometheus (coletor de arquivos de texto)"""
+        retrato = self.obter_snapshot()
+        linhas = [
+            '# TYPE criptografia_etapa_segundos_total counter',
+            *[f'criptografia_etapa_segundos_total{{etapa="{etapa}"}} {dados["segundos"]:.6f}' for etapa, dados in retrato['etapas'].items()],
+            '# TYPE criptografia_etapa_bytes_total counter',
+            *[f'criptografia_etapa_bytes_total{{etapa="{etapa}"}} {dados["bytes"]}' for etapa, dados in retrato['etapas'].items()],
+            '# TYPE criptografia_contador_total counter',
+            *[f'criptografia_contador_total{{nome="{nome}"}} {valor}' for nome, valor in retrato['contadores'].items()],
+            '# TYPE criptografia_fila_profundidade_maxima gauge',
+            *[f'criptografia_fila_profundidade_maxima{{fila="{nome}"}} {dados["maxima"]}' for nome, dados in retrato['filas'].items()],
+            '# TYPE criptografia_segundos_decorridos gauge',
+            f'criptografia_segundos_decorridos {retrato["segundos_decorridos"]:.6f}'
+        ]
+        self._gravar_atomico(caminho_arquivo, '\n'.join(linhas) + '\n')
+    
+    def _gravar_atomico(self, caminho_arquivo, conteudo):
+        """Grava num arquivo temporário e renomeia (leitores nunca veem arquivo parcial)"""
+        with gravacao_atomica(caminho_arquivo) as arquivo:
+            arquivo.write(conteudo.encode('utf-8'))
+    
+    def fechar(self):
+        """Fecha o arquivo de eventos"""
+        if self._arquivo_eventos is not None:
+            self._arquivo_eventos.close()
+            self._arquivo_eventos = None
\ No newline at end of file
@@ -1,21 +1,346 @@
 # main.py
 # Arquivo principal - Menu e coordenação de todos os módulos
 
+import os
 import sys
+import threading
 from pathlib import Path
 
 # Importar nossos módulos
-from gerenciador_senhas import GerenciadorSenhas
+from armazem_deduplicado import ArmazemDeduplicado
+from arquivo_mapeado import LIMITE_ARQUIVO_MAPEADO
+from gerenciador_senhas import PARAMETROS_KDF_LEGADO, CacheChavesDerivadas, GerenciadorSenhas, descrever_parametros_kdf
 from gerenciador_arquivos import GerenciadorArquivos  
-from criptografia import MotorCriptografia
+from criptografia import MotorCriptografia, FORMATO_CONTEINER, FORMATO_PADRAO, MODO_ASSINCRONO, TAMANHO_BLOCO_FLUXO
+from compressao import CompressorSegmentos
+from diario_lote import DiarioLote
+from gravacao_atomica import gravacao_atomica
+from indice_sessoes import IndiceSessoes
+from conteiner_segmentado import escolher_algoritmo_aead
+from manifesto_incremental import ManifestoIncremental, NOME_MANIFESTO
+from pacote_criptografado import PREFIXO_NOME_PACOTE, PacoteCriptografado
+from primitivas import biblioteca_disponivel
 
 class SistemaCriptografiaArquivos:
-    def __init__(self):
-        self.gerenciador_senhas = GerenciadorSenhas()
-        self.gerenciador_arquivos = GerenciadorArquivos()
-        self.criptografia = MotorCriptografia()
+    def __init__(self, instrumentacao=None, silencioso=False, mapear_memoria=True):
+        # Instrumentação compartilhada (métricas por etapa); None: desativada
+        self.gerenciador_senhas = GerenciadorSenhas(instrumentacao)
+        self.gerenciador_arquivos = GerenciadorArquivos(instrumentacao, silencioso)
+        self.silencioso = silencioso
+        # mapear_memoria: arquivos grandes no formato contêiner usam E/S mapeada em memória
+        self.criptografia = MotorCriptografia(
+            instrumentacao=instrumentacao, silencioso=silencioso,
+            limite_mapeamento=LIMITE_ARQUIVO_MAPEADO if mapear_memoria else None
+        )
+        # Trabalhadores em paralelo no processamento em lote
+        self.numero_trabalhadores = min(32, os.cpu_count() or 1)
     
-    def processar_criptografia_completa(self):
+    def _exibir(self, mensagem):
+        """Exibe uma mensagem, exceto no modo silencioso"""
+        if not self.silencioso:
+            print(mensagem)
+    
+    def criptografar_pasta(self, pasta_origem, senha, pasta_destino=None, incremental=False,
+                           numero_trabalhadores=None, tamanho_bloco=TAMANHO_BLOCO_FLUXO, formato=FORMATO_PADRAO,
+                           padroes_inclusao=None, padroes_exclusao=None, empacotar=False,
+                           compressao=None, nivel_compressao=None, modo_paralelo='auto', retomar=False,
+                           kdf=None, custo_kdf=None, tempo_alvo_kdf=None, deduplicar=False, orcamento_memoria=None):
+        """API programática: criptografa uma pasta sem nenhuma pergunta ao usuário"""
+        senha_valida, mensagem = self.gerenciador_senhas.validar_senha(senha)
+        if not senha_valida:
+            raise ValueError(mensagem)
+        
+        compressor = self._criar_compressor(formato, compressao, nivel_compressao)
+        if modo_paralelo == MODO_ASSINCRONO and formato != FORMATO_CONTEINER:
+            raise ValueError("O pipeline assíncrono exige o formato contêiner")
+        # Deduplicação: blocos cifrados em contêineres num armazém do backup, arquivo a arquivo
+        if deduplicar and formato != FORMATO_CONTEINER:
+            raise ValueError("A deduplicação exige o formato contêiner")
+        if deduplicar and (empacotar or modo_paralelo == MODO_ASSINCRONO):
+            raise ValueError("A deduplicação não pode ser combinada com pacotes nem com o pipeline assíncrono")
+        
+        parametros_kdf = None
+        if not retomar:
+            parametros_kdf = self._escolher_parametros_kdf(formato, kdf, custo_kdf, tempo_alvo_kdf)
+        
+        if padroes_inclusao is not None:
+            self.gerenciador_arquivos.padroes_inclusao = list(padroes_inclusao)
+        if padroes_exclusao is not None:
+            self.gerenciador_arquivos.padroes_exclusao = list(padroes_exclusao)
+        lista_arquivos = self.gerenciador_arquivos.definir_pasta_origem(pasta_origem)
+        
+        return self._criptografar_arquivos(
+            lista_arquivos, senha, pasta_destino, incremental,
+            numero_trabalhadores or self.numero_trabalhadores, tamanho_bloco, formato, empacotar, compressor, modo_paralelo,
+            retomar, parametros_kdf, deduplicar, orcamento_memoria
+        )
+    
+    def criptografar_fluxo(self, leitor, escritor, senha, formato=FORMATO_PADRAO, tamanho_bloco=TAMANHO_BLOCO_FLUXO,
+                           compressao=None, nivel_compressao=None, kdf=None, custo_kdf=None, tempo_alvo_kdf=None):
+        """API programática: criptografa um fluxo binário (pipe, stdin, socket, arquivo aberto) para outro,
+        em memória constante e sem arquivos temporários"""
+        senha_valida, mensagem = self.gerenciador_senhas.validar_senha(senha)
+        if not senha_valida:
+            raise ValueError(mensagem)
+        compressor = self._criar_compressor(formato, compressao, nivel_compressao)
+        parametros_kdf = self._escolher_parametros_kdf(formato, kdf, custo_kdf, tempo_alvo_kdf)
+        
+        # Um sal e uma derivação por fluxo, gravados no cabeçalho da saída
+        sal_criptografico = self.criptografia.gerar_sal_criptografico()
+        chave_derivada = self.gerenciador_senhas.derivar_chave_da_senha(senha, sal_criptografico, parametros_kdf=parametros_kdf)
+        bytes_originais = self.criptografia.criptografar_entre_fluxos(
+            leitor, escritor, chave_derivada, sal_criptografico, tamanho_bloco, formato, compressor, parametros_kdf
+        )
+        return {'bytes_originais': bytes_originais}
+    
+    def descriptografar_fluxo(self, leitor, escritor, senha, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
+        """API programática: descriptografa um fluxo .enc para outro; com erro (ValueError), o que já foi
+        escrito não está autenticado e deve ser descartado"""
+        obter_chave = self.gerenciador_senhas.criar_obter_chave(senha)
+        bytes_escritos = self.criptografia.descriptografar_entre_fluxos(leitor, escritor, obter_chave, tamanho_bloco)
+        return {'bytes_escritos': bytes_escritos}
+    
+    def descriptografar_pasta(self, pasta_criptografada, senha, pasta_destino=None, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
+        """API programática: descriptografa uma pasta de arquivos .enc sem perguntas"""
+        pasta_criptografada = Path(pasta_criptografada)
+        if not pasta_criptografada.is_dir():
+            raise ValueError(f"Pasta não encontrada: {pasta_criptografada}")
+        
+        arquivos_criptografados = self.gerenciador_arquivos.iterar_arquivos(pasta_criptografada, ['*.enc'], [])
+        sucessos, erros, pasta_saida = self.criptografia.processar_descriptografia_em_lote(
+            pasta_criptografada, arquivos_criptografados, senha, self.gerenciador_senhas, self.gerenciador_arquivos,
+            pasta_destino=pasta_destino, tamanho_bloco=tamanho_bloco
+        )
+        return {'sucessos': sucessos, 'erros': erros, 'pasta_saida': pasta_saida}
+    
+    def verificar_pasta(self, pasta_criptografada, senha=None, numero_trabalhadores=None, ao_verificar=None):
+        """API programática: verifica em paralelo todos os arquivos .enc de uma pasta (só metadados);
+        com a senha, autentica também o conteúdo. ao_verificar(arquivo, válido, mensagem) recebe cada resultado"""
+        pasta_criptografada = Path(pasta_criptografada)
+        if not pasta_criptografada.is_dir():
+            raise ValueError(f"Pasta não encontrada: {pasta_criptografada}")
+        
+        obter_chave = None
+        cache_chaves = CacheChavesDerivadas()
+        if senha is not None:
+            trava_derivacao = threading.Lock()
+            obter_chave_do_cache = self.gerenciador_senhas.criar_obter_chave(senha, cache_chaves)
+            
+            def obter_chave(sal_criptografico, parametros_kdf=None):
+                """Deriva cada sal uma única vez, mesmo com vários trabalhadores pedindo a mesma chave"""
+                with trava_derivacao:
+                    return obter_chave_do_cache(sal_criptografico, parametros_kdf)
+        
+        validos = 0
+        invalidos = []
+        arquivos_criptografados = self.gerenciador_arquivos.iterar_arquivos(pasta_criptografada, ['*.enc'], [])
+        try:
+            if obter_chave is not None:
+                # Chaves das sessões derivadas antes dos arquivos; senha incorreta interrompe aqui
+                self.criptografia.derivar_chaves_das_sessoes(pasta_criptografada, obter_chave, cache_chaves)
+            for arquivo_criptografado, valido, mensagem in self.criptografia.verificar_em_lote(
+                    arquivos_criptografados, numero_trabalhadores or self.numero_trabalhadores, obter_chave):
+                if ao_verificar is not None:
+                    ao_verificar(arquivo_criptografado, valido, mensagem)
+                if valido:
+                    validos += 1
+                else:
+                    invalidos.append((arquivo_criptografado, mensagem))
+        finally:
+            cache_chaves.limpar()
+        return {'validos': validos, 'invalidos': invalidos}
+    
+    def recriptografar_pasta(self, pasta_criptografada, senha, nova_senha, numero_trabalhadores=None,
+                             kdf=None, custo_kdf=None, tempo_alvo_kdf=None, completo=False):
+        """API programática: troca a senha de um backup sem descriptografá-lo em disco. Arquivos com envelope
+        de chave só têm o cabeçalho regravado; os demais (ou todos, com completo=True) são cifrados de novo em memória"""
+        pasta_criptografada = Path(pasta_criptografada)
+        if not pasta_criptografada.is_dir():
+            raise ValueError(f"Pasta não encontrada: {pasta_criptografada}")
+        if ArmazemDeduplicado(pasta_criptografada).existe():
+            raise ValueError("A troca de senha ainda não é suportada em backups deduplicados")
+        if DiarioLote(pasta_criptografada).existe():
+            raise ValueError("Há uma execução interrompida neste backup: conclua-a com --retomar antes de trocar a senha")
+        senha_valida, mensagem = self.gerenciador_senhas.validar_senha(nova_senha)
+        if not senha_valida:
+            raise ValueError(mensagem)
+        parametros_kdf = self._escolher_parametros_kdf(FORMATO_CONTEINER, kdf, custo_kdf, tempo_alvo_kdf)
+        
+        cache_chaves = CacheChavesDerivadas()
+        trava_derivacao = threading.Lock()
+        obter_chave_do_cache = self.gerenciador_senhas.criar_obter_chave(senha, cache_chaves)
+        
+        def obter_chave(sal_criptografico, parametros_kdf_arquivo=None):
+            """Deriva cada sal antigo uma única vez, mesmo com vários trabalhadores pedindo a mesma chave"""
+            with trava_derivacao:
+                return obter_chave_do_cache(sal_criptografico, parametros_kdf_arquivo)
+        
+        try:
+            # Senha atual conferida pelas sessões antes de qualquer arquivo
+            self.criptografia.derivar_chaves_das_sessoes(pasta_criptografada, obter_chave, cache_chaves)
+            
+            # Nova sessão: um sal e uma derivação para todos os arquivos
+            sal_criptografico = self.criptografia.gerar_sal_criptografico()
+            chave_derivada = self.gerenciador_senhas.derivar_chave_da_senha(nova_senha, sal_criptografico, parametros_kdf=parametros_kdf)
+            self._exibir(f"Derivação da chave: {descrever_parametros_kdf(parametros_kdf)}")
+            indice_sessoes = IndiceSessoes(pasta_criptografada)
+            try:
+                indice_sessoes.carregar()
+            except (OSError, ValueError) as erro:
+                self._exibir(f"Índice de sessões ilegível, será recriado: {str(erro)}")
+            indice_sessoes.registrar(sal_criptografico, parametros_kdf, chave_derivada)
+            
+            # Lista fechada antes de começar: os arquivos são substituídos nas mesmas pastas durante a varredura
+            arquivos_criptografados = list(self.gerenciador_arquivos.iterar_arquivos(pasta_criptografada, ['*.enc'], []))
+            sucessos, erros, contagem = self.criptografia.processar_recriptografia_em_lote(
+                arquivos_criptografados, obter_chave, chave_derivada, sal_criptografico, parametros_kdf,
+                numero_trabalhadores or self.numero_trabalhadores, completo
+            )
+        finally:
+            cache_chaves.limpar()
+        
+        if erros == 0:
+            # Todos os arquivos estão na nova sessão: a senha antiga deixa de valer no índice
+            indice_sessoes.manter_somente(sal_criptografico)
+        return {'sucessos': sucessos, 'erros': erros, 'pasta_saida': pasta_criptografada, **contagem}
+    
+    def listar_pacote(self, caminho_pacote, senha):
+        """API programática: lista os membros de um pacote sem descriptografar os dados"""
+        return PacoteCriptografado(caminho_pacote).listar(self.gerenciador_senhas.criar_obter_chave(senha))
+    
+    def extrair_membro_pacote(self, caminho_pacote, caminho_membro, senha, arquivo_destino=None):
+        """API programática: descriptografa um único membro de um pacote (retorna os dados ou grava no destino)"""
+        dados_membro = PacoteCriptografado(caminho_pacote).extrair(caminho_membro, self.gerenciador_senhas.criar_obter_chave(senha))
+        if arquivo_destino is None:
+            return dados_membro
+        with gravacao_atomica(arquivo_destino) as arquivo:
+            arquivo.write(dados_membro)
+        return arquivo_destino
+    
+    def _criar_compressor(self, formato, compressao, nivel_compressao):
+        """Compressão antes da cifra ('zlib' ou 'lzma'), registrada no cabeçalho de cada arquivo"""
+        compressor = CompressorSegmentos(compressao, nivel_compressao) if compressao else None
+        if compressor is not None and formato != FORMATO_CONTEINER:
+            raise ValueError("A compressão exige o formato contêiner")
+        return compressor
+    
+    def _escolher_parametros_kdf(self, formato, kdf, custo_kdf, tempo_alvo_kdf):
+        """Derivação da chave ('pbkdf2-sha256' ou 'scrypt'): custo fixo ou calibrado para um tempo alvo, gravado no cabeçalho"""
+        parametros_kdf = self.gerenciador_senhas.escolher_parametros_kdf(kdf, custo_kdf, tempo_alvo_kdf)
+        if parametros_kdf != PARAMETROS_KDF_LEGADO and formato != FORMATO_CONTEINER:
+            raise ValueError("Parâmetros de derivação próprios exigem o formato contêiner")
+        return parametros_kdf
+    
+    def _criptografar_arquivos(self, lista_arquivos, senha_usuario, pasta_destino, incremental,
+                               numero_trabalhadores, tamanho_bloco, formato, empacotar=False, compressor=None,
+                               modo_paralelo='auto', retomar=False, parametros_kdf=None, deduplicar=False,
+                               orcamento_memoria=None):
+        """Cria o backup, deriva a chave da sessão e criptografa os arquivos (partes 3 e 4)"""
+        # Um membro alterado exigiria reescrever o pacote inteiro
+        if incremental and empacotar:
+            raise ValueError("O modo incremental não pode ser combinado com pacotes")
+        if retomar and empacotar:
+            raise ValueError("A retomada não pode ser combinada com pacotes")
+        
+        # Parte 4: Criar pasta de backup (a retomada reaproveita a pasta da execução interrompida)
+        pasta_backup = self.gerenciador_arquivos.criar_pasta_backup(incremental, pasta_destino, retomar)
+        if incremental and any(pasta_backup.glob(f"{PREFIXO_NOME_PACOTE}*")):
+            raise ValueError("Backup com pacotes não pode ser atualizado no modo incremental")
+        
+        # O diário registra cada arquivo concluído: uma execução interrompida pode ser retomada
+        diario = DiarioLote(pasta_backup, self.silencioso)
+        if retomar:
+            if not diario.existe():
+                raise ValueError(f"Nenhuma execução interrompida para retomar em {pasta_backup}")
+            diario.carregar()
+            # Mesmo sal e mesma derivação da execução interrompida: uma única chave para todo o backup
+            sal_criptografico = diario.obter_sal()
+            parametros_kdf = diario.obter_parametros_kdf() or PARAMETROS_KDF_LEGADO
+            chave_derivada = self.gerenciador_senhas.derivar_chave_da_senha(senha_usuario, sal_criptografico, parametros_kdf=parametros_kdf)
+            if not diario.verificar_chave(chave_derivada):
+                raise ValueError("A senha não confere com a da execução interrompida")
+            self.gerenciador_arquivos.remover_temporarios(pasta_backup)
+        else:
+            # Gerar sal criptográfico para esta sessão
+            sal_criptografico = self.criptografia.gerar_sal_criptografico()
+            
+            # Derivar chave da senha
+            parametros_kdf = parametros_kdf or self.gerenciador_senhas.parametros_kdf
+            chave_derivada = self.gerenciador_senhas.derivar_chave_da_senha(senha_usuario, sal_criptografico, parametros_kdf=parametros_kdf)
+        self._exibir(f"Derivação da chave: {descrever_parametros_kdf(parametros_kdf)}")
+        
+        # O armazém confere a senha antes de a sessão ser registrada no índice
+        armazem = None
+        if deduplicar:
+            armazem = self._abrir_armazem(pasta_backup, senha_usuario, sal_criptografico, parametros_kdf, chave_derivada)
+        
+        # Índice de sessões do backup: sal, derivação e verificador gravados uma vez por sessão
+        indice_sessoes = IndiceSessoes(pasta_backup)
+        try:
+            indice_sessoes.carregar()
+        except (OSError, ValueError) as erro:
+            self._exibir(f"Índice de sessões ilegível, será recriado: {str(erro)}")
+        indice_sessoes.registrar(sal_criptografico, parametros_kdf, chave_derivada)
+        
+        # O manifesto é sempre gravado para permitir a próxima execução incremental
+        manifesto = ManifestoIncremental(pasta_backup, self.silencioso)
+        if incremental:
+            lista_arquivos = manifesto.filtrar_alterados(lista_arquivos, self.gerenciador_arquivos.pasta_origem)
+        if retomar:
+            # Arquivos já concluídos (saída íntegra) entram no manifesto sem serem refeitos
+            lista_arquivos = diario.filtrar_pendentes(
+                lista_arquivos, self.gerenciador_arquivos.pasta_origem,
+                lambda arquivo_saida: self.criptografia.verificar_integridade_arquivo_criptografado(arquivo_saida)[0],
+                lambda arquivo, arquivo_saida: manifesto.registrar(arquivo, self.gerenciador_arquivos.pasta_origem, arquivo_saida)
+            )
+        
+        # Parte 3: Processar criptografia de todos os arquivos
+        diario.iniciar(sal_criptografico, chave_derivada, parametros_kdf)
+        try:
+            sucessos, erros, _ = self.criptografia.processar_criptografia_em_lote(
+                lista_arquivos, chave_derivada, self.gerenciador_arquivos, sal_criptografico,
+                numero_trabalhadores=numero_trabalhadores, modo_paralelo=modo_paralelo, tamanho_bloco=tamanho_bloco,
+                formato=formato, manifesto=manifesto, empacotar=empacotar, compressor=compressor, diario=diario,
+                parametros_kdf=parametros_kdf, armazem=armazem, orcamento_memoria=orcamento_memoria
+            )
+        finally:
+            diario.fechar()
+        if erros == 0:
+            # Lote completo: nada a retomar
+            diario.remover()
+        if incremental and erros == 0 and self.gerenciador_arquivos.erros_varredura == 0:
+            # Somente com a origem percorrida por completo e sem erros
+            manifesto.remover_excluidos()
+        manifesto.salvar()
+        
+        if erros == 0:
+            # Backup completo sobre um anterior: só agora a nova versão toma o lugar dele
+            pasta_backup = self.gerenciador_arquivos.concluir_pasta_backup()
+        elif self.gerenciador_arquivos.pasta_backup_final is not None:
+            self._exibir(f"Lote com erros: o backup anterior em {self.gerenciador_arquivos.pasta_backup_final} foi mantido "
+                         f"(use --retomar para concluir a nova versão)")
+        
+        return {'sucessos': sucessos, 'erros': erros, 'pasta_saida': pasta_backup}
+    
+    def _abrir_armazem(self, pasta_backup, senha_usuario, sal_criptografico, parametros_kdf, chave_derivada):
+        """Abre o armazém de blocos do backup (criado com a chave desta sessão se ainda não existir)"""
+        armazem = ArmazemDeduplicado(pasta_backup)
+        if not armazem.existe():
+            armazem.criar(sal_criptografico, parametros_kdf, chave_derivada)
+            armazem.abrir(chave_derivada)
+            return armazem
+        
+        # Armazém de uma sessão anterior: a chave dele é derivada do sal dele (uma derivação a mais)
+        armazem.carregar()
+        chave_armazem = chave_derivada
+        if armazem.obter_sal() != bytes(sal_criptografico):
+            chave_armazem = self.gerenciador_senhas.derivar_chave_da_senha(
+                senha_usuario, armazem.obter_sal(), parametros_kdf=armazem.obter_parametros_kdf()
+            )
+        armazem.abrir(chave_armazem)
+        return armazem
+    
+    def processar_criptografia_completa(self, incremental=None):
         """Processo principal de criptografia - coordena todas as partes"""
         print("\n=== INICIANDO CRIPTOGRAFIA ===")
         
@@ -26,29 +351,26 @@ class SistemaCriptografiaArquivos:
             # Parte 2: Acessar pasta
             lista_arquivos = self.gerenciador_arquivos.acessar_pasta_origem()
             
-            # Parte 4: Criar pasta de backup
-            self.gerenciador_arquivos.criar_pasta_backup()
+            # Backup anterior com manifesto: oferecer atualização incremental
+            if incremental is None:
+                incremental = self.perguntar_modo_incremental()
             
-            # Gerar sal criptográfico para esta sessão
-            sal_criptografico = self.criptografia.gerar_sal_criptografico()
-            
-            # Derivar chave da senha
-            chave_derivada = self.gerenciador_senhas.derivar_chave_da_senha(senha_usuario, sal_criptografico)
-            
-            # Parte 3: Processar criptografia de todos os arquivos
-            sucessos, erros, sal_usado = self.criptografia.processar_criptografia_em_lote(
-                lista_arquivos, chave_derivada, self.gerenciador_arquivos
+            # Partes 3 e 4: backup e criptografia
+            resultado = self._criptografar_arquivos(
+                lista_arquivos, senha_usuario, None, incremental,
+                self.numero_trabalhadores, TAMANHO_BLOCO_FLUXO, FORMATO_PADRAO
             )
+            sucessos, erros = resultado['sucessos'], resultado['erros']
             
             # Relatório final
             print(f"\nCriptografia concluída!")
             print(f"Sucessos: {sucessos} | Erros: {erros}")
             
             if sucessos > 0:
-                print(f"Arquivos criptografados salvos em: {self.gerenciador_arquivos.pasta_backup}")
+                print(f"Arquivos criptografados salvos em: {resultado['pasta_saida']}")
                 print("Guarde bem sua senha - ela será necessária para descriptografar!")
             
-            return sucessos > 0
+            return sucessos > 0 or (incremental and erros == 0)
             
         except KeyboardInterrupt:
             print("\nOperação cancelada pelo usuário.")
@@ -57,6 +379,15 @@ class SistemaCriptografiaArquivos:
             print(f"Erro durante criptografia: {str(erro)}")
             return False
     
+    def perguntar_modo_incremental(self):
+        """Pergunta se um backup existente deve ser atualizado de forma incremental"""
+        pasta_backup = self.gerenciador_arquivos.obter_caminho_pasta_backup()
+        if not (pasta_backup / NOME_MANIFESTO).exists():
+            return False
+        
+        resposta = input("Backup anterior encontrado. Criptografar apenas arquivos novos/alterados? (s/n): ")
+        return resposta.strip().lower() == 's'
+    
     def processar_descriptografia_completa(self):
         """Processo principal de descriptografia - coordena todas as partes"""
         print("\n=== INICIANDO DESCRIPTOGRAFIA ===")
@@ -93,25 +424,24 @@ class SistemaCriptografiaArquivos:
     
     def verificar_bibliotecas_necessarias(self):
         """Verifica se todas as bibliotecas estão instaladas"""
-        try:
-            from cryptography.hazmat.primitives.ciphers import Cipher
+        # Só localiza a biblioteca: ela é importada na primeira cifra
+        if biblioteca_disponivel():
             print("Biblioteca 'cryptography' encontrada!")
             return True
-        except ImportError:
-            print("Biblioteca 'cryptography' não encontrada!")
-            print("Instale com: pip install cryptography")
-            return False
+        print("Biblioteca 'cryptography' não encontrada!")
+        print("Instale com: pip install cryptography")
+        return False
     
     def mostrar_informacoes_do_sistema(self):
         """Mostra informações sobre o sistema"""
         print("\n" + "="*60)
         print("SISTEMA DE CRIPTOGRAFIA PARA PROTEÇÃO DE ARQUIVOS")
         print("="*60)
-        print("Algoritmo: AES-256-CBC")
-        print("Derivação de chave: PBKDF2 com SHA-256 (100.000 iterações)")
+        print(f"Algoritmo: {escolher_algoritmo_aead()} (criptografia autenticada)")
+        print(f"Derivação de chave: {descrever_parametros_kdf(self.gerenciador_senhas.parametros_kdf)}")
         print("Sal único para cada sessão")
-        print("Vetor de inicialização único para cada arquivo")
-        print("Preenchimento: PKCS7")
+        print("Nonce único para cada segmento de arquivo")
+        print("Arquivos legados AES-256-CBC continuam sendo descriptografados")
         print("-"*60)
 
 def executar_programa_principal():
@@ -184,8 +514,9 @@ def mostrar_tela_ajuda():
     print("   • Cada sessão gera arquivos únicos")
     print()
     print("SEGURANÇA:")
-    print("   • AES-256: Criptografia de nível militar")
+    print("   • AES-256-GCM / ChaCha20-Poly1305: criptografia autenticada")
     print("   • Sem a senha correta, os arquivos são irrecuperáveis")
+    print("   • Senha incorreta ou arquivo alterado é detectado na descriptografia")
     print("   • Sal e vetor de inicialização únicos previnem ataques")
     print()
     print("ESTRUTURA DE PASTAS:")
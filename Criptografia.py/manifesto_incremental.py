@@ -0,0 +1,140 @@
+# manifesto_incremental.py
+# Criptografia incremental: manifesto com a impressão de cada arquivo já criptografado
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from gravacao_atomica import gravacao_atomica
+
+NOME_MANIFESTO = '.manifesto.json'
+VERSAO_MANIFESTO = 1
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+class ManifestoIncremental:
+    def __init__(self, pasta_backup, silencioso=False):
+        self.caminho_manifesto = Path(pasta_backup) / NOME_MANIFESTO
+        self.silencioso = silencioso
+        self.entradas = {}
+        self.pendentes = {}
+        self.caminhos_vistos = set()
+        # Saídas anteriores de arquivos que passaram a ser gravados com outro nome
+        self.saidas_substituidas = set()
+        self.carregar()
+    
+    def _exibir(self, mensagem):
+        """Exibe uma mensagem, exceto no modo silencioso"""
+        if not self.silencioso:
+            print(mensagem)
+    
+    def carregar(self):
+        """Carrega o manifesto da pasta de backup (vazio se ainda não existir)"""
+        try:
+            with open(self.caminho_manifesto, 'r', encoding='utf-8') as arquivo:
+                conteudo = json.load(arquivo)
+            if conteudo.get('versao') == VERSAO_MANIFESTO:
+                self.entradas = conteudo.get('arquivos', {})
+        except FileNotFoundError:
+            self.entradas = {}
+        except (OSError, ValueError) as erro:
+            self._exibir(f"Manifesto ilegível, todos os arquivos serão criptografados: {str(erro)}")
+            self.entradas = {}
+    
+    def salvar(self):
+        """Grava o manifesto de forma atômica (arquivo temporário + renomeação)"""
+        conteudo = json.dumps({'versao': VERSAO_MANIFESTO, 'arquivos': self.entradas}, indent=1, sort_keys=True)
+        with gravacao_atomica(self.caminho_manifesto) as arquivo:
+            arquivo.write(conteudo.encode('utf-8'))
+    
+    def calcular_hash(self, caminho_arquivo):
+        """Calcula o SHA-256 do conteúdo de um arquivo em blocos"""
+        resumo = hashlib.sha256()
+        with open(caminho_arquivo, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+                resumo.update(bloco)
+        return resumo.hexdigest()
+    
+    def filtrar_alterados(self, lista_arquivos, pasta_origem):
+        """Gera, sob demanda, somente os arquivos novos ou alterados desde a última execução"""
+        alterados = 0
+        inalterados = 0
+        
+        for arquivo in lista_arquivos:
+            caminho_relativo = Path(arquivo).relative_to(pasta_origem).as_posix()
+            self.caminhos_vistos.add(caminho_relativo)
+            informacoes = os.stat(arquivo)
+            entrada = self.entradas.get(caminho_relativo)
+            saida_existe = entrada is not None and (self.caminho_manifesto.parent / entrada['saida']).exists()
+            
+            # Mesmo tamanho e data de modificação: considerado inalterado sem ler o conteúdo
+            if saida_existe and entrada['tamanho'] == informacoes.st_size and entrada['mtime_ns'] == informacoes.st_mtime_ns:
+                inalterados += 1
+                continue
+            
+            # Arquivo novo: o hash só é útil para comparar com uma entrada existente
+            hash_conteudo = self.calcular_hash(arquivo) if saida_existe else None
+            if saida_existe and entrada['hash'] == hash_conteudo:
+                # Apenas a data mudou: manter o texto cifrado e atualizar a entrada
+                entrada['tamanho'] = informacoes.st_size
+                entrada['mtime_ns'] = informacoes.st_mtime_ns
+                inalterados += 1
+                continue
+            
+            self.pendentes[caminho_relativo] = {
+                'tamanho': informacoes.st_size,
+                'mtime_ns': informacoes.st_mtime_ns,
+                'hash': hash_conteudo
+            }
+            alterados += 1
+            yield arquivo
+        
+        self._exibir(f"Modo incremental: {alterados} novos/alterados | {inalterados} inalterados")
+    
+    def registrar(self, arquivo_original, pasta_origem, arquivo_saida):
+        """Registra no manifesto um arquivo criptografado com sucesso"""
+        caminho_relativo = Path(arquivo_original).relative_to(pasta_origem).as_posix()
+        entrada = self.pendentes.pop(caminho_relativo, None)
+        if entrada is None:
+            # Execução completa: tamanho e data bastam; o hash é calculado quando o arquivo mudar
+            informacoes = os.stat(arquivo_original)
+            entrada = {
+                'tamanho': informacoes.st_size,
+                'mtime_ns': informacoes.st_mtime_ns,
+                'hash': None
+            }
+        entrada['saida'] = Path(arquivo_saida).relative_to(self.caminho_manifesto.parent).as_posix()
+        anterior = self.entradas.get(caminho_relativo)
+        if anterior is not None and anterior['saida'] != entrada['saida']:
+            # Backup de uma versão que gravava a saída sem a extensão original (a.txt -> a.enc)
+            self.saidas_substituidas.add(anterior['saida'])
+        self.entradas[caminho_relativo] = entrada
+    
+    def remover_excluidos(self):
+        """Remove do backup as saídas de arquivos que não apareceram na origem (após filtrar_alterados) e as
+        saídas antigas de arquivos regravados com outro nome"""
+        caminhos_atuais = self.caminhos_vistos
+        saidas_em_uso = {
+            entrada['saida'] for caminho_relativo, entrada in self.entradas.items()
+            if caminho_relativo in caminhos_atuais
+        }
+        removidos = 0
+        
+        for caminho_relativo in list(self.entradas):
+            if caminho_relativo in caminhos_atuais:
+                continue
+            self.saidas_substituidas.add(self.entradas.pop(caminho_relativo)['saida'])
+        
+        for saida in self.saidas_substituidas:
+            # Em manifestos antigos, outra entrada pode apontar para a mesma saída (mesmo nome sem extensão)
+            if saida in saidas_em_uso:
+                continue
+            try:
+                os.remove(self.caminho_manifesto.parent / saida)
+                removidos += 1
+            except FileNotFoundError:
+                pass
+        self.saidas_substituidas.clear()
+        
+        if removidos:
+            self._exibir(f"Modo incremental: {removidos} saídas de arquivos excluídos removidas")
+        return removidos
\ No newline at end of file
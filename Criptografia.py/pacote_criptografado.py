@@ -0,0 +1,303 @@
+# pacote_criptografado.py
+# Pacote criptografado: muitos arquivos pequenos num único arquivo indexado
+#
+# Estrutura do arquivo:
+#   MAGIA_PACOTE (8) | versão (1) | tamanho do cabeçalho (4) | cabeçalho JSON
+#   membros: dados cifrados + tag (16) de cada arquivo, um após o outro
+#   diretório: lista JSON [caminho, deslocamento, tamanho armazenado, tamanho original, mtime_ns] cifrada
+#   rodapé: deslocamento do diretório (8) | tamanho do diretório (4) | nº de membros (4) | MAGIA_RODAPE_PACOTE (8)
+#
+# Cada membro e o diretório são cifrados de forma independente (AEAD) com o nonce
+# prefixo_nonce (8 bytes) + número do membro (4 bytes). O diretório pode ser listado
+# sem tocar nos dados, e a extração de um membro descriptografa somente esse membro.
+# Os parâmetros de derivação da chave ficam no cabeçalho ('kdf'), como no contêiner.
+
+import json
+import mmap
+import os
+import secrets
+import struct
+from pathlib import Path
+from conteiner_segmentado import TAMANHO_TAG, escolher_algoritmo_aead
+from fluxo_buffers import escrever_partes, ler_em, obter_buffer
+from gravacao_atomica import abrir_temporario, concluir_gravacao, descartar_gravacao, gravacao_atomica
+from primitivas import ALGORITMOS_AEAD, criar_aead
+
+MAGIA_PACOTE = b'CRIPACK\x00'
+MAGIA_RODAPE_PACOTE = b'CRPKDIR\x00'
+VERSAO_PACOTE = 1
+PREFIXO_NOME_PACOTE = '.pacote_'
+
+# Arquivos até este tamanho entram no pacote; o pacote é fechado ao atingir o tamanho máximo
+LIMITE_MEMBRO_PACOTE = 64 * 1024
+TAMANHO_MAXIMO_PACOTE = 256 * 1024 * 1024
+
+TIPO_MEMBRO = 0
+TIPO_DIRETORIO = 1
+NUMERO_DIRETORIO = 0xFFFFFFFF
+
+FORMATO_PREFIXO = '>8sBI'
+FORMATO_RODAPE = '>QII8s'
+TAMANHO_PREFIXO = struct.calcsize(FORMATO_PREFIXO)
+TAMANHO_RODAPE = struct.calcsize(FORMATO_RODAPE)
+
+class PacoteCriptografado:
+    def __init__(self, caminho_pacote, algoritmo=None, parametros_kdf=None):
+        self.caminho_pacote = Path(caminho_pacote)
+        self.algoritmo = algoritmo or escolher_algoritmo_aead()
+        if self.algoritmo not in ALGORITMOS_AEAD:
+            raise ValueError(f"Algoritmo não suportado: {self.algoritmo}")
+        # Parâmetros de derivação da chave gravados no cabeçalho (None: não gravar)
+        self.parametros_kdf = parametros_kdf
+        self.cabecalho = None
+        self.diretorio = []
+        self._arquivo = None
+        self._cifra = None
+        self._deslocamento = 0
+    
+    @staticmethod
+    def e_pacote(caminho_arquivo):
+        """Indica se o arquivo é um pacote (nome reservado e assinatura no início)"""
+        caminho_arquivo = Path(caminho_arquivo)
+        if not caminho_arquivo.name.startswith(PREFIXO_NOME_PACOTE):
+            return False
+        with open(caminho_arquivo, 'rb') as arquivo:
+            return arquivo.read(len(MAGIA_PACOTE)) == MAGIA_PACOTE
+    
+    def _dados_associados(self, tipo, numero):
+        """Monta os dados associados (autenticados, não cifrados) de um membro ou do diretório"""
+        return b''.join([
+            MAGIA_PACOTE,
+            bytes([VERSAO_PACOTE]),
+            self.cabecalho['algoritmo'].encode(),
+            bytes.fromhex(self.cabecalho['prefixo_nonce']),
+            struct.pack('>BI', tipo, numero)
+        ])
+    
+    def _nonce(self, numero):
+        """Gera o nonce de 12 bytes de um membro (ou do diretório)"""
+        return bytes.fromhex(self.cabecalho['prefixo_nonce']) + struct.pack('>I', numero)
+    
+    def criar(self, chave_criptografia, sal_criptografico):
+        """Cria o arquivo do pacote e grava o cabeçalho"""
+        self.cabecalho = {
+            'algoritmo': self.algoritmo,
+            'prefixo_nonce': secrets.token_bytes(8).hex(),
+            'sal': bytes(sal_criptografico).hex()
+        }
+        if self.parametros_kdf is not None:
+            self.cabecalho['kdf'] = dict(self.parametros_kdf)
+        cabecalho_serializado = json.dumps(self.cabecalho, sort_keys=True).encode()
+        self._cifra = criar_aead(self.algoritmo, chave_criptografia)
+        # Nome temporário até finalizar: um pacote interrompido nunca aparece com o nome final
+        self._arquivo = abrir_temporario(self.caminho_pacote, buffering=0)
+        self._deslocamento = escrever_partes(self._arquivo, [
+            struct.pack(FORMATO_PREFIXO, MAGIA_PACOTE, VERSAO_PACOTE, len(cabecalho_serializado)),
+            cabecalho_serializado
+        ])
+        self.diretorio = []
+    
+    def adicionar(self, caminho_arquivo, caminho_relativo):
+        """Cifra um arquivo pequeno como membro do pacote; retorna o tamanho gravado"""
+        if len(self.diretorio) >= NUMERO_DIRETORIO:
+            raise ValueError("Pacote cheio")
+        
+        with open(caminho_arquivo, 'rb') as arquivo:
+            informacoes = os.fstat(arquivo.fileno())
+            if informacoes.st_size > LIMITE_MEMBRO_PACOTE:
+                raise ValueError(f"Arquivo grande demais para o pacote: {caminho_arquivo}")
+            # Um byte a mais detecta arquivos que cresceram depois do fstat
+            dados = obter_buffer('membro', LIMITE_MEMBRO_PACOTE + 1)
+            tamanho_original = ler_em(arquivo, dados)
+            if tamanho_original > LIMITE_MEMBRO_PACOTE:
+                raise ValueError(f"Arquivo grande demais para o pacote: {caminho_arquivo}")
+        return self._gravar_membro(dados[:tamanho_original], caminho_relativo, informacoes.st_mtime_ns)
+        
+    def _gravar_membro(self, dados, caminho_relativo, mtime_ns):
+        """Cifra e grava os dados de um membro no fim do pacote; retorna o tamanho gravado"""
+        numero = len(self.diretorio)
+        if numero >= NUMERO_DIRETORIO:
+            raise ValueError("Pacote cheio")
+        tamanho_original = len(dados)
+        nonce = self._nonce(numero)
+        dados_associados = self._dados_associados(TIPO_MEMBRO, numero)
+        if hasattr(self._cifra, 'encrypt_into'):
+            dados_cifrados = obter_buffer('membro_cifrado', tamanho_original + TAMANHO_TAG)
+            self._cifra.encrypt_into(nonce, dados, dados_associados, dados_cifrados)
+        else:
+            dados_cifrados = self._cifra.encrypt(nonce, bytes(dados), dados_associados)
+        escrever_partes(self._arquivo, [dados_cifrados])
+        
+        self.diretorio.append([caminho_relativo, self._deslocamento, len(dados_cifrados), tamanho_original, mtime_ns])
+        self._deslocamento += len(dados_cifrados)
+        return len(dados_cifrados)
+    
+    def finalizar(self):
+        """Grava o diretório cifrado e o rodapé, fecha o pacote e lhe dá o nome final"""
+        try:
+            diretorio_serializado = json.dumps(self.diretorio, separators=(',', ':')).encode()
+            diretorio_cifrado = self._cifra.encrypt(
+                self._nonce(NUMERO_DIRETORIO), diretorio_serializado,
+                self._dados_associados(TIPO_DIRETORIO, len(self.diretorio))
+            )
+            escrever_partes(self._arquivo, [
+                diretorio_cifrado,
+                struct.pack(FORMATO_RODAPE, self._deslocamento, len(diretorio_cifrado), len(self.diretorio), MAGIA_RODAPE_PACOTE)
+            ])
+            concluir_gravacao(self._arquivo, self.caminho_pacote)
+        except BaseException:
+            descartar_gravacao(self._arquivo, self.caminho_pacote)
+            raise
+        finally:
+            self._arquivo = None
+    
+    def descartar(self):
+        """Abandona um pacote em criação: o arquivo temporário é removido e o nome final não muda"""
+        if self._arquivo is not None:
+            descartar_gravacao(self._arquivo, self.caminho_pacote)
+            self._arquivo = None
+    
+    @property
+    def tamanho_atual(self):
+        """Bytes já gravados no pacote"""
+        return self._deslocamento
+    
+    def _ler_estrutura(self, dados_pacote):
+        """Interpreta cabeçalho e rodapé; retorna (deslocamento, tamanho, membros) do diretório"""
+        if len(dados_pacote) < TAMANHO_PREFIXO + TAMANHO_RODAPE:
+            raise ValueError("Pacote truncado")
+        magia, versao, tamanho_cabecalho = struct.unpack_from(FORMATO_PREFIXO, dados_pacote)
+        if magia != MAGIA_PACOTE:
+            raise ValueError("Arquivo não é um pacote")
+        if versao != VERSAO_PACOTE:
+            raise ValueError(f"Versão de pacote não suportada: {versao}")
+        self.cabecalho = json.loads(bytes(dados_pacote[TAMANHO_PREFIXO:TAMANHO_PREFIXO + tamanho_cabecalho]).decode())
+        if self.cabecalho.get('algoritmo') not in ALGORITMOS_AEAD:
+            raise ValueError(f"Algoritmo não suportado: {self.cabecalho.get('algoritmo')}")
+        
+        deslocamento_diretorio, tamanho_diretorio, quantidade_membros, magia_rodape = struct.unpack(
+            FORMATO_RODAPE, dados_pacote[-TAMANHO_RODAPE:]
+        )
+        if (magia_rodape != MAGIA_RODAPE_PACOTE or deslocamento_diretorio < TAMANHO_PREFIXO + tamanho_cabecalho
+                or deslocamento_diretorio + tamanho_diretorio + TAMANHO_RODAPE != len(dados_pacote)):
+            raise ValueError("Diretório do pacote inválido")
+        return deslocamento_diretorio, tamanho_diretorio, quantidade_membros
+    
+    def _ler_diretorio(self, dados_pacote, obter_chave):
+        """Descriptografa somente o diretório do pacote"""
+        deslocamento_diretorio, tamanho_diretorio, quantidade_membros = self._ler_estrutura(dados_pacote)
+        chave_criptografia = obter_chave(bytes.fromhex(self.cabecalho['sal']), self.cabecalho.get('kdf'))
+        self._cifra = criar_aead(self.cabecalho['algoritmo'], chave_criptografia)
+        try:
+            diretorio_serializado = self._cifra.decrypt(
+                self._nonce(NUMERO_DIRETORIO),
+                bytes(dados_pacote[deslocamento_diretorio:deslocamento_diretorio + tamanho_diretorio]),
+                self._dados_associados(TIPO_DIRETORIO, quantidade_membros)
+            )
+        except Exception:
+            raise ValueError("Falha de autenticação no diretório do pacote (senha incorreta ou arquivo corrompido)")
+        
+        self.diretorio = json.loads(diretorio_serializado.decode())
+        if len(self.diretorio) != quantidade_membros:
+            raise ValueError("Diretório do pacote inválido")
+        return self.diretorio
+    
+    def _abrir_membro(self, dados_pacote, numero):
+        """Descriptografa e autentica um único membro a partir do pacote mapeado"""
+        caminho, deslocamento, tamanho_armazenado, tamanho_original, _ = self.diretorio[numero]
+        if tamanho_armazenado != tamanho_original + TAMANHO_TAG:
+            raise ValueError(f"Entrada inválida no diretório: {caminho}")
+        try:
+            return self._cifra.decrypt(
+                self._nonce(numero),
+                bytes(dados_pacote[deslocamento:deslocamento + tamanho_armazenado]),
+                self._dados_associados(TIPO_MEMBRO, numero)
+            )
+        except Exception:
+            raise ValueError(f"Falha de autenticação no membro {caminho} (arquivo corrompido)")
+    
+    def _com_pacote_mapeado(self, operacao):
+        """Executa a operação sobre o pacote mapeado em memória (somente leitura)"""
+        with open(self.caminho_pacote, 'rb') as arquivo:
+            try:
+                dados_pacote = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Arquivos vazios ou sistemas sem suporte a mmap
+                dados_pacote = arquivo.read()
+            try:
+                return operacao(dados_pacote)
+            finally:
+                if isinstance(dados_pacote, mmap.mmap):
+                    dados_pacote.close()
+    
+    def listar(self, obter_chave):
+        """Lista os membros (caminho, tamanho, mtime_ns) descriptografando somente o diretório"""
+        diretorio = self._com_pacote_mapeado(lambda dados_pacote: self._ler_diretorio(dados_pacote, obter_chave))
+        return [
+            {'caminho': caminho, 'tamanho': tamanho_original, 'mtime_ns': mtime_ns}
+            for caminho, _, _, tamanho_original, mtime_ns in diretorio
+        ]
+    
+    def extrair(self, caminho_membro, obter_chave):
+        """Retorna o conteúdo de um único membro, descriptografando apenas o diretório e esse membro"""
+        def extrair_mapeado(dados_pacote):
+            for numero, entrada in enumerate(self._ler_diretorio(dados_pacote, obter_chave)):
+                if entrada[0] == caminho_membro:
+                    return self._abrir_membro(dados_pacote, numero)
+            raise ValueError(f"Membro não encontrado no pacote: {caminho_membro}")
+        
+        return self._com_pacote_mapeado(extrair_mapeado)
+    
+    def recifrar(self, obter_chave, chave_criptografia, sal_criptografico, parametros_kdf=None):
+        """Regrava o pacote com outra chave (e outro sal): cada membro é aberto e cifrado de novo só em memória,
+        e o novo pacote substitui o atual quando completo; retorna o número de membros"""
+        def recifrar_mapeado(dados_pacote):
+            diretorio = self._ler_diretorio(dados_pacote, obter_chave)
+            novo_pacote = PacoteCriptografado(self.caminho_pacote, self.cabecalho['algoritmo'], parametros_kdf)
+            novo_pacote.criar(chave_criptografia, sal_criptografico)
+            try:
+                for numero, entrada in enumerate(diretorio):
+                    novo_pacote._gravar_membro(self._abrir_membro(dados_pacote, numero), entrada[0], entrada[4])
+            except BaseException:
+                novo_pacote.descartar()
+                raise
+            novo_pacote.finalizar()
+            return len(diretorio)
+        
+        return self._com_pacote_mapeado(recifrar_mapeado)
+    
+    def extrair_todos(self, obter_destino, obter_chave, relatar_erro=None):
+        """Extrai todos os membros; obter_destino(caminho) fornece o arquivo de saída; retorna (sucessos, erros)"""
+        def extrair_mapeado(dados_pacote):
+            sucessos = 0
+            erros = 0
+            for numero, entrada in enumerate(self._ler_diretorio(dados_pacote, obter_chave)):
+                try:
+                    dados_originais = self._abrir_membro(dados_pacote, numero)
+                    with gravacao_atomica(obter_destino(entrada[0])) as arquivo:
+                        arquivo.write(dados_originais)
+                    sucessos += 1
+                except (OSError, ValueError) as erro:
+                    mensagem = f"Erro ao extrair {entrada[0]}: {str(erro)}"
+                    if relatar_erro is not None:
+                        relatar_erro(entrada[0], mensagem)
+                    else:
+                        print(mensagem)
+                    erros += 1
+            return sucessos, erros
+        
+        return self._com_pacote_mapeado(extrair_mapeado)
+    
+    def verificar_estrutura(self):
+        """Verifica cabeçalho e rodapé do pacote sem a chave"""
+        return self._com_pacote_mapeado(self._ler_estrutura)
+    
+    def autenticar(self, obter_chave):
+        """Autentica o diretório e todos os membros (tags AEAD) sem gravar nada; retorna o número de membros"""
+        def autenticar_mapeado(dados_pacote):
+            diretorio = self._ler_diretorio(dados_pacote, obter_chave)
+            for numero in range(len(diretorio)):
+                self._abrir_membro(dados_pacote, numero)
+            return len(diretorio)
+        
+        return self._com_pacote_mapeado(autenticar_mapeado)
\ No newline at end of file
@@ -0,0 +1,213 @@
+# pipeline_assincrono.py
+# Pipeline assíncrono (asyncio): leitura, cifra e escrita sobrepostas, com filas limitadas entre as etapas
+#
+#   produtor -> fila de arquivos -> leitores -> fila de cifra -> despachante -> filas de escrita -> escritores
+#
+# asyncio não tem E/S de arquivo assíncrona: abrir, ler, gravar e fechar rodam num executor de
+# threads, e a cifra num executor próprio. Vários arquivos ficam em andamento ao mesmo tempo, o que
+# esconde a latência por arquivo de discos de rede (NFS/SMB). Cada arquivo é lido por um único
+# leitor e gravado por um único escritor, preservando a ordem dos segmentos, e as filas limitadas
+# seguram as etapas rápidas (contrapressão), mantendo a memória em poucos segmentos por trabalhador.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fluxo_buffers import escrever_partes, ler_em
+from gravacao_atomica import abrir_temporario, concluir_gravacao, descartar_gravacao
+from instrumentacao import InstrumentacaoNula
+
+# Marca de fim enviada por cada etapa à seguinte
+FIM_DA_FILA = None
+# Segmentos cifrados aguardando em cada escritor
+TAMANHO_FILA_ESCRITA = 2
+
+class PipelineAssincrono:
+    def __init__(self, conteiner, numero_trabalhadores=1, arquivos_simultaneos=None, segmentos_em_fila=None,
+                 instrumentacao=None):
+        self.conteiner = conteiner
+        self.numero_trabalhadores = max(1, numero_trabalhadores)
+        # Arquivos lidos ao mesmo tempo (cada leitor segura no máximo dois segmentos)
+        self.arquivos_simultaneos = arquivos_simultaneos or 4 * self.numero_trabalhadores
+        # Segmentos lidos aguardando a cifra
+        self.segmentos_em_fila = segmentos_em_fila or 2 * self.numero_trabalhadores
+        self.numero_escritores = self.numero_trabalhadores
+        self.instrumentacao = instrumentacao or InstrumentacaoNula()
+    
+    def executar(self, lista_arquivos, obter_destino, chave_criptografia, sal_criptografico, ao_concluir):
+        """Criptografa os arquivos no pipeline; ao_concluir(arquivo, destino, erro) é chamado para cada arquivo"""
+        asyncio.run(self._executar(lista_arquivos, obter_destino, chave_criptografia, sal_criptografico, ao_concluir))
+    
+    async def _executar(self, lista_arquivos, obter_destino, chave_criptografia, sal_criptografico, ao_concluir):
+        """Cria as filas e as etapas e espera o encerramento em cascata (ou a primeira falha inesperada)"""
+        self._laco = asyncio.get_running_loop()
+        self._gravacoes_abertas = {}
+        fila_arquivos = asyncio.Queue(self.arquivos_simultaneos)
+        fila_cifra = asyncio.Queue(self.segmentos_em_fila)
+        filas_escrita = [asyncio.Queue(TAMANHO_FILA_ESCRITA) for _ in range(self.numero_escritores)]
+        
+        with ThreadPoolExecutor(self.arquivos_simultaneos + self.numero_escritores + 1) as self._executor_es, \
+                ThreadPoolExecutor(self.numero_trabalhadores) as self._executor_cifra:
+            leitores = [
+                asyncio.create_task(self._ler_arquivos(fila_arquivos, fila_cifra, obter_destino, chave_criptografia, sal_criptografico))
+                for _ in range(self.arquivos_simultaneos)
+            ]
+            tarefas = [
+                asyncio.create_task(self._produzir(lista_arquivos, fila_arquivos)),
+                *leitores,
+                asyncio.create_task(self._encerrar_leitura(leitores, fila_cifra)),
+                asyncio.create_task(self._despachar(fila_cifra, filas_escrita)),
+                *[asyncio.create_task(self._escrever(fila_escrita, ao_concluir)) for fila_escrita in filas_escrita]
+            ]
+            try:
+                concluidas, _ = await asyncio.wait(tarefas, return_when=asyncio.FIRST_EXCEPTION)
+                for tarefa in concluidas:
+                    tarefa.result()
+            finally:
+                for tarefa in tarefas:
+                    tarefa.cancel()
+                await asyncio.gather(*tarefas, return_exceptions=True)
+                # Interrompido no meio: os arquivos ainda abertos ficam incompletos
+                for gravacao in list(self._gravacoes_abertas.values()):
+                    gravacao['erro'] = gravacao['erro'] or RuntimeError("Pipeline interrompido")
+                    await self._finalizar(gravacao, ao_concluir)
+    
+    def _em_es(self, funcao, *argumentos):
+        """Executa uma operação de E/S bloqueante no executor de E/S"""
+        return self._laco.run_in_executor(self._executor_es, funcao, *argumentos)
+    
+    async def _enfileirar(self, fila, nome_fila, item):
+        """Coloca um item na fila (esperando se estiver cheia) e registra a profundidade"""
+        await fila.put(item)
+        self.instrumentacao.registrar_fila(nome_fila, fila.qsize())
+    
+    async def _produzir(self, lista_arquivos, fila_arquivos):
+        """Percorre a lista de arquivos; a varredura pode bloquear, então cada passo roda no executor de E/S"""
+        iterador = iter(lista_arquivos)
+        numero_arquivo = 0
+        while True:
+            arquivo = await self._em_es(next, iterador, None)
+            if arquivo is None:
+                break
+            await self._enfileirar(fila_arquivos, 'fila_arquivos', (numero_arquivo, arquivo))
+            numero_arquivo += 1
+        for _ in range(self.arquivos_simultaneos):
+            await fila_arquivos.put(FIM_DA_FILA)
+    
+    async def _ler_arquivos(self, fila_arquivos, fila_cifra, obter_destino, chave_criptografia, sal_criptografico):
+        """Leitor: lê um arquivo por vez e envia seus segmentos, em ordem, para a fila de cifra"""
+        while True:
+            item = await fila_arquivos.get()
+            if item is FIM_DA_FILA:
+                return
+            numero_arquivo, arquivo = item
+            gravacao = {
+                'arquivo': arquivo,
+                'destino': None,
+                'estado': None,
+                'saida': None,
+                'erro': None,
+                # Sempre o mesmo escritor para o mesmo arquivo
+                'escritor': numero_arquivo % self.numero_escritores
+            }
+            try:
+                gravacao['destino'] = await self._em_es(obter_destino, arquivo)
+                await self._ler_segmentos(gravacao, fila_cifra, chave_criptografia, sal_criptografico)
+            except Exception as erro:
+                gravacao['erro'] = gravacao['erro'] or erro
+                # O escritor encerra o arquivo ao receber o item marcado como último
+                await self._enfileirar(fila_cifra, 'fila_cifra', (gravacao, None, 0, 0, True))
+    
+    async def _ler_segmentos(self, gravacao, fila_cifra, chave_criptografia, sal_criptografico):
+        """Lê os segmentos de um arquivo, um adiantado para saber qual é o último"""
+        reserva = self.conteiner.reserva_segmento
+        tamanho_segmento = self.conteiner.tamanho_segmento
+        arquivo_entrada = await self._em_es(open, gravacao['arquivo'], 'rb')
+        try:
+            entrada = self.instrumentacao.medir_leitor(arquivo_entrada)
+            # Buffers novos a cada segmento: eles atravessam filas e threads
+            segmento = bytearray(reserva + tamanho_segmento)
+            quantidade = await self._em_es(ler_em, entrada, memoryview(segmento)[reserva:])
+            gravacao['estado'] = await self._laco.run_in_executor(
+                self._executor_cifra, self.conteiner.iniciar_cifragem,
+                chave_criptografia, sal_criptografico, memoryview(segmento)[reserva:reserva + quantidade]
+            )
+            
+            numero_segmento = 0
+            while gravacao['erro'] is None:
+                proxima_quantidade = 0
+                if quantidade == tamanho_segmento:
+                    proximo_segmento = bytearray(reserva + tamanho_segmento)
+                    proxima_quantidade = await self._em_es(ler_em, entrada, memoryview(proximo_segmento)[reserva:])
+                ultimo_segmento = proxima_quantidade == 0
+                await self._enfileirar(fila_cifra, 'fila_cifra', (gravacao, segmento, quantidade, numero_segmento, ultimo_segmento))
+                if ultimo_segmento:
+                    return
+                segmento = proximo_segmento
+                quantidade = proxima_quantidade
+                numero_segmento += 1
+            
+            # O escritor já registrou um erro neste arquivo: não ler o restante
+            await self._enfileirar(fila_cifra, 'fila_cifra', (gravacao, None, 0, numero_segmento, True))
+        finally:
+            arquivo_entrada.close()
+    
+    async def _encerrar_leitura(self, leitores, fila_cifra):
+        """Envia o fim da fila de cifra depois que todos os leitores terminarem"""
+        await asyncio.gather(*leitores)
+        await fila_cifra.put(FIM_DA_FILA)
+    
+    async def _despachar(self, fila_cifra, filas_escrita):
+        """Envia cada segmento ao executor de cifra sem esperar o resultado; o escritor do arquivo aguarda"""
+        while True:
+            item = await fila_cifra.get()
+            if item is FIM_DA_FILA:
+                break
+            gravacao, segmento, quantidade, numero_segmento, ultimo_segmento = item
+            dados_cifrados = None
+            if segmento is not None and gravacao['erro'] is None:
+                dados_cifrados = self._laco.run_in_executor(
+                    self._executor_cifra, self.conteiner.cifrar_segmento,
+                    gravacao['estado'], numero_segmento, memoryview(segmento), quantidade, ultimo_segmento
+                )
+            await self._enfileirar(filas_escrita[gravacao['escritor']], 'fila_escrita', (gravacao, dados_cifrados, quantidade, ultimo_segmento))
+        
+        for fila_escrita in filas_escrita:
+            await fila_escrita.put(FIM_DA_FILA)
+    
+    async def _escrever(self, fila_escrita, ao_concluir):
+        """Escritor: grava os segmentos cifrados na ordem de cada arquivo e finaliza os arquivos concluídos"""
+        while True:
+            item = await fila_escrita.get()
+            if item is FIM_DA_FILA:
+                return
+            gravacao, cifragem, quantidade, ultimo_segmento = item
+            try:
+                # Mesmo num arquivo com erro, a cifra já enviada é aguardada (e descartada)
+                dados_cifrados = await cifragem if cifragem is not None else None
+                if dados_cifrados is not None and gravacao['erro'] is None:
+                    if gravacao['saida'] is None:
+                        # Saída sem buffer, com nome temporário até o arquivo ficar completo
+                        arquivo_saida = await self._em_es(abrir_temporario, gravacao['destino'], 0)
+                        gravacao['saida'] = self.instrumentacao.medir_escritor(arquivo_saida)
+                        self._gravacoes_abertas[id(gravacao)] = gravacao
+                    partes = self.conteiner.partes_segmento(gravacao['estado'], dados_cifrados, quantidade, ultimo_segmento)
+                    await self._em_es(escrever_partes, gravacao['saida'], partes)
+            except Exception as erro:
+                gravacao['erro'] = gravacao['erro'] or erro
+            
+            if ultimo_segmento:
+                await self._finalizar(gravacao, ao_concluir)
+    
+    async def _finalizar(self, gravacao, ao_concluir):
+        """Fecha a saída e lhe dá o nome final, ou a descarta se houve erro, e contabiliza o arquivo
+        (no executor: em discos de rede o fechamento grava os dados)"""
+        self._gravacoes_abertas.pop(id(gravacao), None)
+        if gravacao['saida'] is not None:
+            try:
+                if gravacao['erro'] is None:
+                    await self._em_es(concluir_gravacao, gravacao['saida'], gravacao['destino'])
+            except Exception as erro:
+                gravacao['erro'] = erro
+            if gravacao['erro'] is not None:
+                await self._em_es(descartar_gravacao, gravacao['saida'], gravacao['destino'])
+            gravacao['saida'] = None
+        ao_concluir(gravacao['arquivo'], gravacao['destino'], gravacao['erro'])
\ No newline at end of file
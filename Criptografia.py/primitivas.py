@@ -0,0 +1,71 @@
+# primitivas.py
+# Primitivas criptográficas carregadas sob demanda
+#
+# Importar a biblioteca cryptography (camada hazmat e OpenSSL) custa dezenas de milissegundos a cada
+# processo. Os demais módulos pedem cifras e derivadores por aqui, e a biblioteca só é importada na
+# primeira vez que uma chave é derivada ou um dado é cifrado: `--version` e o `verify` sem
+# `--profundo` terminam sem carregá-la. Backend e classes ficam em cache depois da primeira importação.
+
+import importlib.util
+from functools import lru_cache
+
+ALGORITMO_AES_GCM = 'AES-256-GCM'
+ALGORITMO_CHACHA20 = 'ChaCha20-Poly1305'
+ALGORITMOS_AEAD = (ALGORITMO_AES_GCM, ALGORITMO_CHACHA20)
+
+def biblioteca_disponivel():
+    """Indica se a biblioteca cryptography está instalada, sem importá-la"""
+    return importlib.util.find_spec('cryptography') is not None
+
+@lru_cache(maxsize=None)
+def obter_backend():
+    """Backend da biblioteca (criado uma única vez por processo)"""
+    from cryptography.hazmat.backends import default_backend
+    return default_backend()
+
+@lru_cache(maxsize=None)
+def _classe_aead(algoritmo):
+    """Classe da cifra AEAD do algoritmo"""
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    return {ALGORITMO_AES_GCM: AESGCM, ALGORITMO_CHACHA20: ChaCha20Poly1305}[algoritmo]
+
+def criar_aead(algoritmo, chave_criptografia):
+    """Cria a cifra AEAD (AES-256-GCM ou ChaCha20-Poly1305) com a chave"""
+    if algoritmo not in ALGORITMOS_AEAD:
+        raise ValueError(f"Algoritmo não suportado: {algoritmo}")
+    return _classe_aead(algoritmo)(bytes(chave_criptografia))
+
+@lru_cache(maxsize=None)
+def _primitivas_cbc():
+    """Classes da cifra AES-CBC do formato legado"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    return Cipher, algorithms, modes
+
+def criar_cifra_aes_cbc(chave_criptografia, vetor_inicializacao):
+    """Cria a cifra AES-CBC do formato legado (use encryptor() ou decryptor())"""
+    Cipher, algorithms, modes = _primitivas_cbc()
+    return Cipher(algorithms.AES(chave_criptografia), modes.CBC(vetor_inicializacao), backend=obter_backend())
+
+@lru_cache(maxsize=None)
+def _primitivas_kdf():
+    """Classes dos derivadores de chave"""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+    return hashes, PBKDF2HMAC, Scrypt
+
+def criar_pbkdf2_sha256(sal_criptografico, tamanho_chave, iteracoes):
+    """Cria um derivador PBKDF2-HMAC-SHA256 (um uso por derivador)"""
+    hashes, PBKDF2HMAC, _ = _primitivas_kdf()
+    return PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=tamanho_chave,
+        salt=bytes(sal_criptografico),
+        iterations=iteracoes,
+        backend=obter_backend()
+    )
+
+def criar_scrypt(sal_criptografico, tamanho_chave, n, r, p):
+    """Cria um derivador scrypt (um uso por derivador)"""
+    _, _, Scrypt = _primitivas_kdf()
+    return Scrypt(salt=bytes(sal_criptografico), length=tamanho_chave, n=n, r=r, p=p, backend=obter_backend())
\ No newline at end of file
@@ -0,0 +1,92 @@
+# progresso_lote.py
+# Progresso do processamento em lote numa única linha atualizada periodicamente
+
+import sys
+import time
+
+class ProgressoLote:
+    def __init__(self, descricao, total=None, intervalo_segundos=0.5, saida=None, silencioso=False):
+        self.descricao = descricao
+        # Modo silencioso: apenas contabiliza, sem escrever nada
+        self.silencioso = silencioso
+        self.total = total
+        self.saida = saida or sys.stdout
+        self.processados = 0
+        self.erros = 0
+        self.bytes_processados = 0
+        self.inicio = time.monotonic()
+        # Terminal: reescrever a mesma linha; arquivo de log: uma linha a cada poucos segundos
+        self.terminal = hasattr(self.saida, 'isatty') and self.saida.isatty()
+        self.intervalo_segundos = intervalo_segundos if self.terminal else max(intervalo_segundos, 5.0)
+        self._ultima_exibicao = 0.0
+        # Volume total conhecido: estimativa do tempo restante pela vazão medida
+        self.total_bytes = None
+        self._inicio_volume = self.inicio
+        self._bytes_no_inicio_volume = 0
+    
+    def definir_total_bytes(self, total_bytes):
+        """Informa o volume a processar a partir de agora; a vazão da estimativa é medida desde este ponto"""
+        self.total_bytes = self.bytes_processados + total_bytes
+        self._inicio_volume = time.monotonic()
+        self._bytes_no_inicio_volume = self.bytes_processados
+    
+    def registrar(self, sucesso, bytes_processados=0, quantidade=1):
+        """Contabiliza arquivos processados e atualiza a exibição se o intervalo passou"""
+        if not quantidade:
+            return
+        self.processados += quantidade
+        self.bytes_processados += bytes_processados
+        if not sucesso:
+            self.erros += quantidade
+        
+        if self.silencioso:
+            return
+        agora = time.monotonic()
+        if agora - self._ultima_exibicao >= self.intervalo_segundos:
+            self._ultima_exibicao = agora
+            self._exibir(agora)
+    
+    def finalizar(self):
+        """Exibe o estado final e encerra a linha de progresso"""
+        if self.silencioso:
+            return
+        self._exibir(time.monotonic())
+        if self.terminal:
+            self.saida.write('\n')
+        self.saida.flush()
+    
+    def _exibir(self, agora):
+        """Escreve a linha de progresso"""
+        decorrido = max(agora - self.inicio, 1e-9)
+        quantidade = f"{self.processados}/{self.total}" if self.total is not None else f"{self.processados}"
+        linha = f"{self.descricao}: {quantidade} arquivos | Erros: {self.erros} | {self.processados / decorrido:.1f} arquivos/s"
+        if self.bytes_processados:
+            linha += f" | {self.bytes_processados / decorrido / (1024 * 1024):.1f} MB/s"
+        restante = self._estimar_restante(agora)
+        if restante is not None:
+            linha += f" | Restante: {formatar_duracao(restante)}"
+        if self.terminal:
+            self.saida.write('\r' + linha)
+        else:
+            self.saida.write(linha + '\n')
+        self.saida.flush()
+    
+    def _estimar_restante(self, agora):
+        """Segundos restantes pela vazão em bytes medida até agora (None sem volume ou sem medida)"""
+        if self.total_bytes is None:
+            return None
+        bytes_medidos = self.bytes_processados - self._bytes_no_inicio_volume
+        decorrido = agora - self._inicio_volume
+        bytes_restantes = self.total_bytes - self.bytes_processados
+        if bytes_restantes <= 0 or bytes_medidos <= 0 or decorrido <= 0:
+            return None
+        return bytes_restantes / (bytes_medidos / decorrido)
+
+def formatar_duracao(segundos):
+    """Formata uma duração como 1h02m, 3m05s ou 42s"""
+    segundos = int(round(segundos))
+    if segundos >= 3600:
+        return f"{segundos // 3600}h{segundos % 3600 // 60:02d}m"
+    if segundos >= 60:
+        return f"{segundos // 60}m{segundos % 60:02d}s"
+    return f"{segundos}s"
\ No newline at end of file